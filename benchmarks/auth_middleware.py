@@ -0,0 +1,123 @@
+"""
+Бенчмарк пропускной способности AuthMiddleware.
+
+Сравнивает ASGI реализацию AuthMiddleware с прежней реализацией на
+BaseHTTPMiddleware. Обращение к базе данных заменяется заглушкой, поэтому
+измеряется только накладной расход самого middleware.
+
+Запуск:
+    python -m benchmarks.auth_middleware [количество запросов]
+    python benchmarks/auth_middleware.py [количество запросов]
+
+Вариант с -m запускается из корня репозитория.
+"""
+from types import SimpleNamespace
+import asyncio
+import os
+import sys
+import time
+
+if __package__ in (None, ""):
+    # Запуск как скрипта (python benchmarks/<имя>.py): импорт модулей проекта из корня репозитория
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from web_api.dependencies import auth_middleware
+from web_api.dependencies.auth_middleware import AuthMiddleware, PUBLIC_PATHS
+from web_api.dependencies.cookies_auth import create_jwt_token, get_jwt_payload
+
+
+async def fake_resolve_auth_context(payload, access_token):
+    """Заглушка вместо запроса к базе данных."""
+    return SimpleNamespace(payload=payload, access_token=access_token, user=None, rules=frozenset())
+
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    """Прежняя реализация AuthMiddleware на BaseHTTPMiddleware."""
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in PUBLIC_PATHS:
+            return await call_next(request)
+
+        access_token = request.cookies.get("access_token")
+        if not access_token:
+            return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Access token required"})
+
+        payload = get_jwt_payload(access_token)
+        if payload is None:
+            response = JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Invalid or expired access token"})
+            response.delete_cookie(key="access_token", path="/", domain=None)
+            return response
+
+        auth_context = await fake_resolve_auth_context(payload=payload, access_token=access_token)
+        if auth_context is None:
+            response = JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "Expired access token"})
+            response.delete_cookie(key="access_token", path="/", domain=None)
+            return response
+
+        request.state.auth = auth_context
+        return await call_next(request)
+
+
+def build_app(middleware_class) -> FastAPI:
+    """Создает минимальное приложение с одним защищенным эндпоинтом."""
+    app = FastAPI()
+    app.add_middleware(middleware_class)
+
+    @app.get("/user-panel/")
+    async def user_panel():
+        return JSONResponse(status_code=status.HTTP_200_OK, content=dict(success=True))
+
+    return app
+
+
+async def run(app: FastAPI, access_token: str, count: int) -> float:
+    """
+    Прогоняет count запросов через ASGI приложение без сетевого сервера.
+
+    Returns:
+        Количество запросов в секунду
+    """
+    headers = [(b"host", b"localhost"), (b"cookie", f"access_token={access_token}".encode())]
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message["status"]
+
+    started_at = time.perf_counter()
+    for _ in range(count):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/user-panel/",
+            "raw_path": b"/user-panel/",
+            "root_path": "",
+            "query_string": b"",
+            "headers": headers,
+            "client": ("127.0.0.1", 1),
+            "server": ("localhost", 8000),
+            "state": {},
+        }
+        await app(scope, receive, send)
+    return count / (time.perf_counter() - started_at)
+
+
+async def main(count: int):
+    auth_middleware.resolve_auth_context = fake_resolve_auth_context
+    access_token = create_jwt_token(user_id=1)
+
+    for name, middleware_class in [("BaseHTTPMiddleware", LegacyAuthMiddleware), ("ASGI", AuthMiddleware)]:
+        app = build_app(middleware_class)
+        await run(app, access_token, min(count, 200))
+        print(f"{name:<20} {await run(app, access_token, count):>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
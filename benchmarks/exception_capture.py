@@ -0,0 +1,91 @@
+"""
+Бенчмарк стоимости записи исключения по уровням детализации.
+
+Для каждого уровня (standard, capped, full) измеряет время формирования записи
+исключения (get_traceback) и ее размер. Отдельно измеряется время
+capture_exception для повторяющегося исключения - стоимость обработки в самом
+запросе (отпечаток, дедупликация, формирование записи и постановка в очередь;
+после EXCEPTIONS_DEDUP_MAX_DUMPS записей за окно - без формирования).
+
+Исключение возникает в стеке с крупными локальными переменными, как при
+ошибке запроса к базе данных с данными пачки записей.
+
+Запуск:
+    python -m benchmarks.exception_capture [количество исключений]
+    python benchmarks/exception_capture.py [количество исключений]
+
+Вариант с -m запускается из корня репозитория.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+if __package__ in (None, ""):
+    # Запуск как скрипта (python benchmarks/<имя>.py): импорт модулей проекта из корня репозитория
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.exception_handler.handler import get_traceback, capture_exception, exception_writer, exception_aggregator
+
+
+def fail(depth: int):
+    """Поднимает исключение на глубине depth с крупными локальными переменными."""
+    payload = "x" * 100000
+    rows = [dict(id=index, email=f"user{index}@example.com", password="$2b$12$" + "a" * 53) for index in range(1000)]
+    if depth == 0:
+        raise ValueError(f"Failed to insert {len(rows)} rows ({len(payload)} bytes)")
+    fail(depth - 1)
+
+
+def make_exception() -> Exception:
+    """Возвращает перехваченное исключение с трейсбеком."""
+    try:
+        fail(depth=5)
+    except ValueError as ex_:
+        return ex_
+
+
+def measure_render(detail_level: str, count: int) -> tuple:
+    """
+    Измеряет формирование записи исключения.
+
+    Returns:
+        Кортеж (среднее время в миллисекундах, размер записи в байтах)
+    """
+    exception = make_exception()
+    size = len(json.dumps(get_traceback(exception, "benchmark", "fail", detail_level=detail_level), ensure_ascii=False).encode())
+    started_at = time.perf_counter()
+    for _ in range(count):
+        get_traceback(exception, "benchmark", "fail", detail_level=detail_level)
+    return (time.perf_counter() - started_at) / count * 1000, size
+
+
+def measure_capture(count: int) -> float:
+    """
+    Измеряет capture_exception для одного повторяющегося исключения.
+
+    Returns:
+        Среднее время в микросекундах
+    """
+    exception = make_exception()
+    started_at = time.perf_counter()
+    for _ in range(count):
+        capture_exception("benchmark", "fail", exception)
+    return (time.perf_counter() - started_at) / count * 1000000
+
+
+def main(count: int):
+    # Записи исключений бенчмарка не попадают в assets/exceptions
+    with tempfile.TemporaryDirectory() as directory:
+        exception_writer.directory = exception_aggregator.directory = Path(directory)
+        for detail_level in ("standard", "capped", "full"):
+            milliseconds, size = measure_render(detail_level, count)
+            print(f"render {detail_level:<10} {milliseconds:>10.2f} ms/exception {size:>12} bytes")
+        print(f"capture_exception {measure_capture(count * 100):>10.2f} us/exception")
+        exception_writer.stop()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
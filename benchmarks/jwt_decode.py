@@ -0,0 +1,46 @@
+"""
+Микробенчмарк проверки JWT токенов.
+
+Измеряет стоимость одного вызова проверки токена python-jose и
+get_jwt_payload с кешем payload (промах и попадание).
+
+Запуск:
+    python -m benchmarks.jwt_decode [количество вызовов]
+    python benchmarks/jwt_decode.py [количество вызовов]
+
+Вариант с -m запускается из корня репозитория.
+"""
+import os
+import sys
+import timeit
+
+if __package__ in (None, ""):
+    # Запуск как скрипта (python benchmarks/<имя>.py): импорт модулей проекта из корня репозитория
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web_api.dependencies import cookies_auth
+from web_api.dependencies.cookies_auth import create_jwt_token, get_jwt_payload, decode_jwt
+
+
+def report(name: str, function, count: int):
+    """Печатает среднее время одного вызова в микросекундах."""
+    function()
+    seconds = min(timeit.repeat(function, number=count, repeat=3))
+    print(f"{name:<28} {seconds / count * 1e6:>8.2f} us/call")
+
+
+def main(count: int):
+    token = create_jwt_token(user_id=1)
+
+    report("python-jose decode", lambda: decode_jwt(token), count)
+
+    def uncached():
+        cookies_auth.jwt_payload_cache.clear()
+        return get_jwt_payload(token)
+
+    report("get_jwt_payload (miss)", uncached, count)
+    report("get_jwt_payload (hit)", lambda: get_jwt_payload(token), count)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -2,14 +2,19 @@
 Модуль конфигурации путей к файлам и директориям.
 
 Определяет основные пути для хранения ассетов и логов исключений.
-Создает необходимые директории при импорте модуля.
+Директории создаются при первой записи в них, импорт модуля не изменяет
+файловую систему (например, при запуске бенчмарков).
 """
 from pathlib import Path
 
 # Основная директория для хранения ассетов приложения
 PATH_TO_ASSETS = Path("assets")
-PATH_TO_ASSETS.mkdir(parents=True, exist_ok=True)
 
 # Директория для хранения логов исключений
 PATH_TO_EXCEPTIONS = Path(PATH_TO_ASSETS, "exceptions")
-PATH_TO_EXCEPTIONS.mkdir(parents=True, exist_ok=True)
+
+# Директория снимков метрик воркеров
+PATH_TO_METRICS = Path(PATH_TO_ASSETS, "metrics")
+
+# Директория журнала HTTP запросов (access log)
+PATH_TO_ACCESS_LOGS = Path(PATH_TO_ASSETS, "access_logs")
@@ -4,6 +4,9 @@ from database.models.rules import RuleModel
 from database.models.users import UserModel
 from database.models.role_rules import RoleRuleModel
 from database.models.sessions import SessionModel
+from database.models.revoked_tokens import RevokedTokenModel
+from database.migrations import run_migrations
+from database.partitions import ensure_session_partitions
 
 
 
@@ -11,11 +14,14 @@ async def init_models():
     """
     Инициализирует все модели базы данных.
     
-    Создает все таблицы в базе данных на основе метаданных SQLAlchemy моделей.
+    Применяет миграции существующих таблиц, создает все таблицы в базе данных
+    на основе метаданных SQLAlchemy моделей и заранее создает секции таблицы sessions.
     Функция безопасна для повторного вызова - не создает таблицы, которые уже существуют.
     """
     async with engine.begin() as conn:
+        await run_migrations(conn)
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_session_partitions(conn)
 
 
 async def fill_database():
@@ -26,77 +32,34 @@ async def fill_database():
     from database.tools.role_rules import RoleRuleTool
 
     if not await RuleTool.get_all():
-        await RuleTool.create(data=dict(
-            name="admin_panel",
-            comment="User can see admin panel"
-        ))
-        await RuleTool.create(data=dict(
-            name="support_panel",
-            comment="User can see support panel"
-        ))
-        await RuleTool.create(data=dict(
-            name="user_panel",
-            comment="User can see user panel"
-        ))
+        await RuleTool.create_many(data=[
+            dict(name="admin_panel", comment="User can see admin panel"),
+            dict(name="support_panel", comment="User can see support panel"),
+            dict(name="user_panel", comment="User can see user panel"),
+        ])
     
     if not await RoleTool.get_all():
-        await RoleTool.create(data=dict(
-            name="admin",
-            comment="Admin role"
-        ))
-        await RoleTool.create(data=dict(
-            name="support",
-            comment="Support role"
-        ))
-        await RoleTool.create(data=dict(
-            name="user",
-            comment="User role"
-        ))
+        await RoleTool.create_many(data=[
+            dict(name="admin", comment="Admin role"),
+            dict(name="support", comment="Support role"),
+            dict(name="user", comment="User role"),
+        ])
     
     if not await RoleRuleTool.get_all():
-        await RoleRuleTool.create(data=dict(
-            role_name="admin",
-            rule_name="admin_panel"
-        ))
-        await RoleRuleTool.create(data=dict(
-            role_name="admin",
-            rule_name="support_panel"
-        ))
-        await RoleRuleTool.create(data=dict(
-            role_name="admin",
-            rule_name="user_panel"
-        ))
+        await RoleRuleTool.create_many(data=[
+            dict(role_name="admin", rule_name="admin_panel"),
+            dict(role_name="admin", rule_name="support_panel"),
+            dict(role_name="admin", rule_name="user_panel"),
 
-        await RoleRuleTool.create(data=dict(
-            role_name="support",
-            rule_name="support_panel"
-        ))
-        await RoleRuleTool.create(data=dict(
-            role_name="support",
-            rule_name="user_panel"
-        ))
+            dict(role_name="support", rule_name="support_panel"),
+            dict(role_name="support", rule_name="user_panel"),
 
-        await RoleRuleTool.create(data=dict(
-            role_name="user",
-            rule_name="user_panel"
-        ))
+            dict(role_name="user", rule_name="user_panel"),
+        ])
 
     if not await UserTool.get_all():
-        await UserTool.create(data=dict(
-            email="admin@example.com",
-            password=UserTool.hash_password("admin"),
-            role="admin",
-            is_active=True
-        ))
-        await UserTool.create(data=dict(
-            email="support@example.com",
-            password=UserTool.hash_password("support"),
-            role="support",
-            is_active=True
-        ))
-        await UserTool.create(data=dict(
-            email="user@example.com",
-            password=UserTool.hash_password("user"),
-            role="user",
-            is_active=True
-        ))
\ No newline at end of file
+        await UserTool.create_many(data=[
+            dict(email="admin@example.com", password=await UserTool.hash_password_async("admin"), role="admin", is_active=True),
+            dict(email="support@example.com", password=await UserTool.hash_password_async("support"), role="support", is_active=True),
+            dict(email="user@example.com", password=await UserTool.hash_password_async("user"), role="user", is_active=True),
+        ])
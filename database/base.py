@@ -3,26 +3,84 @@
 
 Содержит настройки подключения к PostgreSQL базе данных,
 создание асинхронного движка SQLAlchemy и базового класса для моделей.
+Параметры подключения и пула задаются в configuration.settings.
+Если задан DATABASE_READ_URL, создается отдельный движок реплики для чтения
+(маршрутизация чтений - в database.unit_of_work.read_session_scope).
+При SQL_INSTRUMENTATION к движкам подключается database.instrumentation.
 """
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.engine import URL
+from sqlalchemy.engine import URL, make_url
+from configuration.settings import (
+    DATABASE_URL,
+    DATABASE_HOST,
+    DATABASE_PORT,
+    DATABASE_USER,
+    DATABASE_PASSWORD,
+    DATABASE_NAME,
+    DATABASE_POOL_SIZE,
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_POOL_PRE_PING,
+    DATABASE_POOL_RECYCLE,
+    DATABASE_STATEMENT_CACHE_SIZE,
+    DATABASE_READ_URL,
+    SQL_INSTRUMENTATION
+)
+from database.pool import MeteredAsyncAdaptedQueuePool
+from database.instrumentation import install_instrumentation
 
 # URL подключения к PostgreSQL базе данных через asyncpg драйвер
-url = URL.create(
+url = make_url(DATABASE_URL) if DATABASE_URL else URL.create(
     drivername="postgresql+asyncpg",
-    username="postgres",
-    password="admin",
-    host="localhost",
-    port=5432,
-    database="test_task_effective_mobile",
+    username=DATABASE_USER,
+    password=DATABASE_PASSWORD,
+    host=DATABASE_HOST,
+    port=DATABASE_PORT,
+    database=DATABASE_NAME,
 )
 
-# Асинхронный движок SQLAlchemy с настройками пула подключений
-engine = create_async_engine(url, pool_size=25, max_overflow=50, pool_timeout=300)
+
+def create_engine(url: URL, name: str) -> AsyncEngine:
+    """
+    Создает асинхронный движок SQLAlchemy с настройками пула подключений.
+    
+    Args:
+        url: URL подключения
+        name: Имя пула для метрик (database.pool.pool_metrics)
+        
+    Returns:
+        AsyncEngine: Движок с пулом MeteredAsyncAdaptedQueuePool
+    """
+    engine = create_async_engine(
+        url,
+        poolclass=MeteredAsyncAdaptedQueuePool,
+        pool_logging_name=name,
+        pool_size=DATABASE_POOL_SIZE,
+        max_overflow=DATABASE_MAX_OVERFLOW,
+        pool_timeout=DATABASE_POOL_TIMEOUT,
+        pool_pre_ping=DATABASE_POOL_PRE_PING,
+        pool_recycle=DATABASE_POOL_RECYCLE,
+        connect_args=dict(
+            # Кеш подготовленных выражений SQLAlchemy и собственный кеш asyncpg
+            prepared_statement_cache_size=DATABASE_STATEMENT_CACHE_SIZE,
+            statement_cache_size=DATABASE_STATEMENT_CACHE_SIZE,
+        ),
+    )
+    if SQL_INSTRUMENTATION:
+        install_instrumentation(engine)
+    return engine
+
+
+# Асинхронный движок основной базы данных (чтение и запись)
+engine = create_engine(url, name="primary")
 
 # Фабрика для создания асинхронных сессий базы данных
 AsyncSessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, autocommit=False)
 
+# Движок и фабрика сессий реплики для чтения (None, если DATABASE_READ_URL не задан)
+read_engine = create_engine(make_url(DATABASE_READ_URL), name="replica") if DATABASE_READ_URL else None
+AsyncReadSessionLocal = async_sessionmaker(bind=read_engine, class_=AsyncSession, expire_on_commit=False, autocommit=False) if read_engine is not None else None
+
 # Базовый класс для всех ORM моделей
 Base = declarative_base()
@@ -1,9 +1,14 @@
 from abc import ABC, abstractmethod
-from typing import Any, Optional, List, Dict, TypeVar, Type
-from sqlalchemy import BinaryExpression, select, update, delete, inspect, and_, desc, asc
+from functools import wraps
+from typing import Any, Callable, Optional, List, Dict, TypeVar, Type, Iterator, Tuple, AsyncIterator
+from sqlalchemy import BinaryExpression, select, insert, update, delete, inspect, and_, desc, asc, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.base import AsyncSessionLocal
+from database.unit_of_work import session_scope, read_session_scope, commit, in_unit_of_work
+from database.pagination import encode_cursor, decode_cursor
 from utils.exception_handler.handler import handle_async
+from database.instrumentation import repository_call
 import random
 import string
 
@@ -11,6 +16,22 @@ import string
 T = TypeVar('T')
 
 
+def timed(function: Callable) -> Callable:
+    """
+    Выполняет raw_* метод репозитория как database.instrumentation.repository_call.
+
+    Длительность записывается в метрику db_query_duration_seconds, SQL запросы
+    метода относятся к инструменту (UserTool, SessionTool, ...): для
+    classmethod он берется из cls, для методов экземпляра - из класса self.
+    """
+    @wraps(function)
+    async def wrapper(owner: Any, *args, **kwargs) -> Any:
+        tool = owner.__name__ if isinstance(owner, type) else type(owner).__name__
+        with repository_call(tool=tool, method=function.__name__):
+            return await function(owner, *args, **kwargs)
+    return wrapper
+
+
 class AsyncAbstractRepository(ABC):
     """Абстрактный класс для работы с репозиториями."""
 
@@ -26,6 +47,53 @@ class AsyncAbstractRepository(ABC):
         """
         raise NotImplementedError
 
+    @classmethod
+    @abstractmethod
+    async def raw_create_many(cls, session: AsyncSession, data: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Создает несколько записей в базе данных за один запрос.
+        
+        Args:
+            session: Сессия базы данных
+            data: Список данных для создания записей
+            
+        Returns:
+            List[Any]: Созданные записи в порядке data
+        """
+        raise NotImplementedError
+
+    @classmethod
+    @abstractmethod
+    async def raw_update_many(cls, session: AsyncSession, data: List[Dict[str, Any]]) -> Any:
+        """
+        Обновляет несколько записей в базе данных по первичному ключу за один запрос.
+        
+        Args:
+            session: Сессия базы данных
+            data: Список данных для обновления, каждый элемент содержит первичный ключ
+            
+        Returns:
+            Any: Результат выполнения запроса
+        """
+        raise NotImplementedError
+
+    @classmethod
+    @abstractmethod
+    async def raw_upsert_many(cls, session: AsyncSession, data: List[Dict[str, Any]], index_elements: Optional[List[str]] = None, update_existing: bool = True) -> List[Any]:
+        """
+        Создает или обновляет несколько записей в базе данных за один запрос.
+        
+        Args:
+            session: Сессия базы данных
+            data: Список данных записей, каждый элемент содержит колонки index_elements
+            index_elements: Колонки уникального индекса для определения конфликта. По умолчанию field_id
+            update_existing: Обновлять ли существующие записи (False - оставить без изменений)
+            
+        Returns:
+            List[Any]: Созданные и обновленные записи в порядке data
+        """
+        raise NotImplementedError
+
     @abstractmethod
     async def raw_get(self, session: AsyncSession, filter_: BinaryExpression):
         """
@@ -79,6 +147,41 @@ class AsyncAbstractRepository(ABC):
         """
         raise NotImplementedError
 
+    @classmethod
+    @abstractmethod
+    async def raw_get_page(cls, session: AsyncSession, filters: Optional[List[Any]] = None, sort_by: Optional[Any] = None, sort_order: str = "asc", limit: int = 100, after: Optional[List[Any]] = None) -> List[Any]:
+        """
+        Получает страницу записей с keyset пагинацией.
+        
+        Args:
+            session: Сессия базы данных
+            filters: Список прямых условий SQLAlchemy
+            sort_by: Индексированное поле сортировки
+            sort_order: Порядок сортировки
+            limit: Количество записей на странице
+            after: Значения колонок сортировки последней записи предыдущей страницы
+            
+        Returns:
+            List[Any]: Записи страницы
+        """
+        raise NotImplementedError
+
+    @classmethod
+    @abstractmethod
+    def raw_iter_all(cls, session: AsyncSession, filters: Optional[List[Any]] = None, batch_size: int = 1000) -> AsyncIterator[Any]:
+        """
+        Последовательно возвращает записи из базы данных через серверный курсор.
+        
+        Args:
+            session: Сессия базы данных
+            filters: Список прямых условий SQLAlchemy
+            batch_size: Количество записей, получаемых из курсора за один раз
+            
+        Returns:
+            AsyncIterator[Any]: Асинхронный итератор записей
+        """
+        raise NotImplementedError
+
     @classmethod
     @abstractmethod
     async def raw_update_with_filters(cls, session: AsyncSession, data: Dict[str, Any], filters: Optional[List[Any]] = None) -> Any:
@@ -116,6 +219,7 @@ class AsyncSQLAlchemyRepository(AsyncAbstractRepository):
     model = None
 
     @classmethod
+    @timed
     async def raw_create(cls, session: AsyncSession, data: Dict[str, Any]) -> model: # type: ignore
         """
         Создает новую запись в базе данных.
@@ -129,10 +233,11 @@ class AsyncSQLAlchemyRepository(AsyncAbstractRepository):
         """
         u = cls.model(**data)
         session.add(u)
-        await session.commit()
+        await commit(session)
         await session.refresh(u)
         return u
 
+    @timed
     async def raw_get(self, session: AsyncSession, filter_: BinaryExpression) -> model: # type: ignore
         """
         Получает запись из базы данных по фильтру.
@@ -148,6 +253,83 @@ class AsyncSQLAlchemyRepository(AsyncAbstractRepository):
         return await session.scalar(query)
 
     @classmethod
+    @timed
+    async def raw_create_many(cls, session: AsyncSession, data: List[Dict[str, Any]]) -> List[model]: # type: ignore
+        """
+        Создает несколько записей в базе данных за один запрос.
+        
+        Использует INSERT ... RETURNING в режиме executemany: SQLAlchemy
+        объединяет строки в один многострочный INSERT (insertmanyvalues).
+        
+        Args:
+            session: Сессия базы данных
+            data: Список данных для создания записей
+            
+        Returns:
+            List[model]: Созданные записи в порядке data
+        """
+        query = insert(cls.model).returning(cls.model, sort_by_parameter_order=True)
+        result = list(await session.scalars(query, data))
+        await commit(session)
+        return result
+
+    @classmethod
+    @timed
+    async def raw_update_many(cls, session: AsyncSession, data: List[Dict[str, Any]]) -> Any:
+        """
+        Обновляет несколько записей в базе данных по первичному ключу за один запрос.
+        
+        Args:
+            session: Сессия базы данных
+            data: Список данных для обновления, каждый элемент содержит первичный ключ
+            
+        Returns:
+            Any: Результат выполнения запроса
+        """
+        result = await session.execute(update(cls.model), data)
+        await commit(session)
+        return result
+
+    @classmethod
+    @timed
+    async def raw_upsert_many(cls, session: AsyncSession, data: List[Dict[str, Any]], index_elements: Optional[List[str]] = None, update_existing: bool = True) -> List[model]: # type: ignore
+        """
+        Создает или обновляет несколько записей в базе данных за один запрос.
+        
+        Выполняет INSERT ... ON CONFLICT (index_elements) DO UPDATE ... RETURNING,
+        при конфликте обновляются все переданные поля, кроме колонок index_elements.
+        При update_existing=False или если в данных нет полей для обновления (только
+        колонки index_elements и field_id) выполняет ON CONFLICT DO NOTHING:
+        существующие записи не изменяются и не возвращаются, порядок результата
+        не гарантируется.
+        
+        Args:
+            session: Сессия базы данных
+            data: Список данных записей, каждый элемент содержит колонки index_elements
+            index_elements: Колонки уникального индекса для определения конфликта. По умолчанию field_id
+            update_existing: Обновлять ли существующие записи
+            
+        Returns:
+            List[model]: Созданные и обновленные записи в порядке data (при DO NOTHING - только созданные, без порядка)
+        """
+        index_elements = index_elements or [cls.field_id]
+        query = postgresql_insert(cls.model)
+        # Обновляем все поля, которые встречаются в данных, кроме колонок индекса
+        keys = {key for row in data for key in row if key not in index_elements and key != cls.field_id}
+        if keys and update_existing:
+            query = query.on_conflict_do_update(index_elements=index_elements, set_={key: query.excluded[key] for key in keys})
+            query = query.returning(cls.model, sort_by_parameter_order=True)
+        else:
+            # При DO NOTHING пропущенные записи не возвращаются, сопоставить результат с порядком data нельзя
+            query = query.on_conflict_do_nothing(index_elements=index_elements)
+            query = query.returning(cls.model)
+        # populate_existing обновляет объекты, уже загруженные в сессию
+        result = list(await session.scalars(query, data, execution_options={"populate_existing": True}))
+        await commit(session)
+        return result
+
+    @classmethod
+    @timed
     async def raw_get_all(cls, session: AsyncSession) -> List[model]: # type: ignore
         """
         Получает все записи из базы данных.
@@ -162,6 +344,7 @@ class AsyncSQLAlchemyRepository(AsyncAbstractRepository):
         return await session.scalars(query)
 
     @classmethod
+    @timed
     async def raw_get_all_with_filters(cls, session: AsyncSession, filters: Optional[List[Any]] = None, sort_by: Optional[Any] = None, sort_order: str = "asc", limit: Optional[int] = None, offset: Optional[int] = None) -> List[model]: # type: ignore
         """
         Получает записи из базы данных с динамической фильтрацией и сортировкой.
@@ -217,6 +400,102 @@ class AsyncSQLAlchemyRepository(AsyncAbstractRepository):
         return list(result)
 
     @classmethod
+    def get_keyset_columns(cls, sort_by: Optional[Any] = None) -> List[Any]:
+        """
+        Возвращает колонки сортировки для keyset пагинации.
+        
+        Сортировка возможна только по первичному ключу или по индексированной
+        колонке без NULL, первичный ключ добавляется для однозначного порядка.
+        
+        Args:
+            sort_by: Поле сортировки (строка с именем поля или атрибут модели). По умолчанию первичный ключ
+            
+        Returns:
+            List: Колонки сортировки (поле сортировки и первичный ключ)
+            
+        Raises:
+            ValueError: Если поле не существует или не подходит для keyset пагинации
+        """
+        mapper = inspect(cls.model)
+        primary_key = list(mapper.primary_key)
+        if sort_by is None:
+            return primary_key
+
+        key = sort_by if isinstance(sort_by, str) else getattr(sort_by, "key", None)
+        column = mapper.columns.get(key)
+        if column is None or column.nullable or not (column.primary_key or column.index or column.unique):
+            raise ValueError(f"{cls.model.__tablename__}.{key} can not be used for keyset pagination")
+        if column.primary_key:
+            return primary_key
+        return [column, *primary_key]
+
+    @classmethod
+    @timed
+    async def raw_get_page(cls, session: AsyncSession, filters: Optional[List[Any]] = None, sort_by: Optional[Any] = None, sort_order: str = "asc", limit: int = 100, after: Optional[List[Any]] = None) -> List[model]: # type: ignore
+        """
+        Получает страницу записей с keyset пагинацией.
+        
+        Вместо OFFSET использует условие (колонки сортировки) > (значения последней
+        записи), поэтому стоимость запроса не зависит от номера страницы.
+        
+        Args:
+            session: Сессия базы данных
+            filters: Список прямых условий SQLAlchemy
+            sort_by: Индексированное поле сортировки. По умолчанию первичный ключ
+            sort_order: Порядок сортировки ("asc" или "desc")
+            limit: Количество записей на странице
+            after: Значения колонок сортировки последней записи предыдущей страницы
+            
+        Returns:
+            List[model]: Записи страницы
+        """
+        columns = cls.get_keyset_columns(sort_by)
+        descending = sort_order.lower() == "desc"
+
+        query = select(cls.model)
+        if filters:
+            query = query.filter(and_(*filters))
+        if after is not None:
+            if descending:
+                query = query.filter(tuple_(*columns) < tuple_(*after))
+            else:
+                query = query.filter(tuple_(*columns) > tuple_(*after))
+        query = query.order_by(*[desc(column) if descending else asc(column) for column in columns]).limit(limit)
+
+        result = await session.scalars(query)
+        return list(result)
+
+    @classmethod
+    async def raw_iter_all(cls, session: AsyncSession, filters: Optional[List[Any]] = None, batch_size: int = 1000) -> AsyncIterator[model]: # type: ignore
+        """
+        Последовательно возвращает записи из базы данных через серверный курсор.
+        
+        Записи читаются частями по batch_size (yield_per), поэтому в памяти
+        одновременно находится не больше одной части. Записи упорядочены по
+        первичному ключу.
+        
+        Args:
+            session: Сессия базы данных
+            filters: Список прямых условий SQLAlchemy
+            batch_size: Количество записей, получаемых из курсора за один раз
+            
+        Returns:
+            AsyncIterator[model]: Асинхронный итератор записей
+        """
+        query = select(cls.model)
+        if filters:
+            query = query.filter(and_(*filters))
+        query = query.order_by(*inspect(cls.model).primary_key).execution_options(yield_per=batch_size)
+
+        result = await session.stream_scalars(query)
+        try:
+            async for instance in result:
+                yield instance
+        finally:
+            await result.close()
+
+    @classmethod
+    @timed
     async def raw_update_with_filters(cls, session: AsyncSession, data: Dict[str, Any], filters: Optional[List[Any]] = None) -> Any:
         """
         Обновляет записи в базе данных с динамической фильтрацией.
@@ -241,10 +520,11 @@ class AsyncSQLAlchemyRepository(AsyncAbstractRepository):
         
         # Выполняем запрос
         result = await session.execute(query)
-        await session.commit()
+        await commit(session)
         return result
 
     @classmethod
+    @timed
     async def raw_delete_with_filters(cls, session: AsyncSession, filters: Optional[List[Any]] = None) -> Any:
         """
         Удаляет записи из базы данных с динамической фильтрацией.
@@ -265,9 +545,10 @@ class AsyncSQLAlchemyRepository(AsyncAbstractRepository):
         
         # Выполняем запрос
         result = await session.execute(query)
-        await session.commit()
+        await commit(session)
         return result
 
+    @timed
     async def raw_update(self, session: AsyncSession, data: Dict[str, Any], filter_: BinaryExpression) -> Any:
         """
         Обновляет запись в базе данных.
@@ -282,9 +563,10 @@ class AsyncSQLAlchemyRepository(AsyncAbstractRepository):
         """
         query = update(self.model).filter(filter_).values(data)
         r_ = await session.execute(query)
-        await session.commit()
+        await commit(session)
         return r_
 
+    @timed
     async def raw_delete(self, session: AsyncSession, filter_: BinaryExpression) -> Any:
         """
         Удаляет запись из базы данных.
@@ -298,15 +580,23 @@ class AsyncSQLAlchemyRepository(AsyncAbstractRepository):
         """
         query = delete(self.model).filter(filter_)
         r_ = await session.execute(query)
-        await session.commit()
+        await commit(session)
         return r_
 
 
 class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
-    """Базовый класс для CRUD операций с моделями по ID."""
+    """
+    Базовый класс для CRUD операций с моделями по ID.
+    
+    Внутри unit of work (database.unit_of_work) все методы используют его сессию
+    и транзакцию и не повторяют операцию при ошибке, так как транзакция уже прервана.
+    Методы чтения (get, get_all, get_all_with_filters, get_page, iter_all) при
+    настроенной реплике читают с нее до первой записи в текущем контексте.
+    """
     model = None
     field_id = None
     count_attemps = 10
+    bulk_chunk_size = 500  # Количество строк в одном запросе create_many/update_many/upsert_many
 
     def __init__(self, __id: Any):
         """
@@ -318,9 +608,9 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
         self.custom_id = __id
     
     @classmethod
-    async def generate_unique_field_id(cls, *args, length: int = 12, return_type: Type = str) -> Any:
+    def generate_field_id(cls, *args, length: int = 12, return_type: Type = str) -> Any:
         """
-        Генерирует уникальный ID для записи.
+        Генерирует случайный ID без проверки уникальности.
         
         Args:
             *args: Списки символов для генерации ID. По умолчанию используются цифры, заглавные и строчные буквы
@@ -328,27 +618,40 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
             return_type: Тип возвращаемого значения (str, int, float)
             
         Returns:
-            Any: Уникальный ID указанного типа
+            Any: Случайный ID указанного типа
         """
         # Если не переданы списки символов, используем стандартные
         char_sets = args if args else [string.digits, string.ascii_uppercase, string.ascii_lowercase]
         # Объединяем все наборы символов
         all_chars = ''.join(char_sets)
+        # Генерируем строковый ID
+        str_id = "".join([random.choice(all_chars) for _ in range(length)])
         
+        # Преобразуем ID в нужный тип
+        if return_type == int:
+            return int(str_id)
+        elif return_type == float:
+            return float(str_id)
+        return str_id
+
+    @classmethod
+    async def generate_unique_field_id(cls, *args, length: int = 12, return_type: Type = str) -> Any:
+        """
+        Генерирует уникальный ID для записи.
+        
+        Args:
+            *args: Списки символов для генерации ID. По умолчанию используются цифры, заглавные и строчные буквы
+            length: Длина генерируемого ID
+            return_type: Тип возвращаемого значения (str, int, float)
+            
+        Returns:
+            Any: Уникальный ID указанного типа
+        """
         for attempt in range(cls.count_attemps):
             try:
-                async with AsyncSessionLocal() as session:
+                async with session_scope() as session:
                     while True:
-                        # Генерируем строковый ID
-                        str_id = "".join([random.choice(all_chars) for _ in range(length)])
-                        
-                        # Преобразуем ID в нужный тип
-                        if return_type == int:
-                            id_value = int(str_id)
-                        elif return_type == float:
-                            id_value = float(str_id)
-                        else:
-                            id_value = str_id
+                        id_value = cls.generate_field_id(*args, length=length, return_type=return_type)
                         
                         # Проверяем уникальность ID
                         instance = cls(id_value)
@@ -356,7 +659,53 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
                             return id_value
             except Exception as ex_:
                 await handle_async(function_category="database", function=f"{cls.model.__tablename__}  generate_id", exception=ex_)
-                if attempt == cls.count_attemps - 1:  # Вызываем raise только на последней попытке
+                if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
+                    raise
+
+    @classmethod
+    async def create_with_generated_id(cls, data: Dict[str, Any], *args, length: int = 12, return_type: Type = str) -> model: # type: ignore
+        """
+        Создает новую запись со случайным ID без блокировок и предварительных SELECT.
+        
+        Выполняет INSERT ... ON CONFLICT (field_id) DO NOTHING RETURNING и при
+        совпадении ID повторяет вставку с новым ID. Уникальность гарантирует
+        первичный ключ в базе данных, поэтому метод безопасен для параллельных
+        вызовов из любого количества воркеров.
+        
+        Args:
+            data: Данные для создания записи (без поля ID)
+            *args: Списки символов для генерации ID (см. generate_field_id)
+            length: Длина генерируемого ID
+            return_type: Тип ID (str, int, float)
+            
+        Returns:
+            model: Созданная запись
+            
+        Raises:
+            IntegrityError: При нарушении других ограничений (например, уникального email),
+                            такие ошибки не повторяются
+        """
+        for attempt in range(cls.count_attemps):
+            try:
+                async with session_scope() as session:
+                    while True:
+                        id_value = cls.generate_field_id(*args, length=length, return_type=return_type)
+                        query = (
+                            postgresql_insert(cls.model)
+                            .values({**data, cls.field_id: id_value})
+                            .on_conflict_do_nothing(index_elements=[cls.field_id])
+                            .returning(cls.model)
+                        )
+                        instance = await session.scalar(query)
+                        await commit(session)
+                        if instance is not None:
+                            return instance
+            except IntegrityError as ex_:
+                await handle_async(function_category="database", function=f"{cls.model.__tablename__}  create_with_generated_id", exception=ex_)
+                raise
+            except Exception as ex_:
+                await handle_async(function_category="database", function=f"{cls.model.__tablename__}  create_with_generated_id", exception=ex_)
+                if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
                     raise
 
     @classmethod
@@ -372,13 +721,115 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
         """
         for attempt in range(cls.count_attemps):
             try:
-                async with AsyncSessionLocal() as session:
+                async with session_scope() as session:
                     return await super().raw_create(session=session, data=data)
             except Exception as ex_:
                 await handle_async(function_category="database", function=f"{cls.model.__tablename__}  create", exception=ex_)
-                if attempt == cls.count_attemps - 1:  # Вызываем raise только на последней попытке
+                if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
                     raise
 
+    @classmethod
+    def iter_chunks(cls, data: List[Dict[str, Any]], chunk_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Разбивает данные для пакетных операций на части.
+        
+        Args:
+            data: Список данных записей
+            chunk_size: Размер части. По умолчанию bulk_chunk_size
+            
+        Returns:
+            Iterator: Части списка данных
+        """
+        chunk_size = chunk_size or cls.bulk_chunk_size
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    @classmethod
+    async def create_many(cls, data: List[Dict[str, Any]], chunk_size: Optional[int] = None) -> List[model]: # type: ignore
+        """
+        Создает несколько записей в базе данных с повторными попытками.
+        
+        Каждая часть данных создается одним запросом INSERT ... RETURNING и
+        фиксируется отдельно (внутри unit of work - в его транзакции).
+        Повторная попытка выполняется только для части, на которой произошла ошибка.
+        
+        Args:
+            data: Список данных для создания записей
+            chunk_size: Количество записей в одном запросе. По умолчанию bulk_chunk_size
+            
+        Returns:
+            List[model]: Созданные записи в порядке data
+        """
+        result = []
+        for chunk in cls.iter_chunks(data, chunk_size):
+            for attempt in range(cls.count_attemps):
+                try:
+                    async with session_scope() as session:
+                        result.extend(await super().raw_create_many(session=session, data=chunk))
+                    break
+                except Exception as ex_:
+                    await handle_async(function_category="database", function=f"{cls.model.__tablename__}  create_many", exception=ex_)
+                    if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
+                        raise
+        return result
+
+    @classmethod
+    async def update_many(cls, data: List[Dict[str, Any]], chunk_size: Optional[int] = None) -> int:
+        """
+        Обновляет несколько записей в базе данных по первичному ключу с повторными попытками.
+        
+        Каждая часть данных отправляется одним запросом UPDATE в режиме executemany.
+        
+        Args:
+            data: Список данных для обновления, каждый элемент содержит первичный ключ
+            chunk_size: Количество записей в одном запросе. По умолчанию bulk_chunk_size
+            
+        Returns:
+            int: Количество переданных на обновление записей
+        """
+        for chunk in cls.iter_chunks(data, chunk_size):
+            for attempt in range(cls.count_attemps):
+                try:
+                    async with session_scope() as session:
+                        await super().raw_update_many(session=session, data=chunk)
+                    break
+                except Exception as ex_:
+                    await handle_async(function_category="database", function=f"{cls.model.__tablename__}  update_many", exception=ex_)
+                    if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
+                        raise
+        return len(data)
+
+    @classmethod
+    async def upsert_many(cls, data: List[Dict[str, Any]], chunk_size: Optional[int] = None, index_elements: Optional[List[str]] = None, update_existing: bool = True) -> List[model]: # type: ignore
+        """
+        Создает или обновляет несколько записей по ID с повторными попытками.
+        
+        Каждая часть данных выполняется одним запросом
+        INSERT ... ON CONFLICT (index_elements) DO UPDATE ... RETURNING.
+        
+        Args:
+            data: Список данных записей, каждый элемент содержит колонки index_elements
+            chunk_size: Количество записей в одном запросе. По умолчанию bulk_chunk_size
+            index_elements: Колонки уникального индекса для определения конфликта. По умолчанию field_id
+            update_existing: Обновлять ли существующие записи (False - ON CONFLICT DO NOTHING)
+            
+        Returns:
+            List[model]: Созданные и обновленные записи в порядке data. Если update_existing=False
+            или в данных нет полей для обновления, только созданные записи без гарантии порядка
+        """
+        result = []
+        for chunk in cls.iter_chunks(data, chunk_size):
+            for attempt in range(cls.count_attemps):
+                try:
+                    async with session_scope() as session:
+                        result.extend(await super().raw_upsert_many(session=session, data=chunk, index_elements=index_elements, update_existing=update_existing))
+                    break
+                except Exception as ex_:
+                    await handle_async(function_category="database", function=f"{cls.model.__tablename__}  upsert_many", exception=ex_)
+                    if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
+                        raise
+        return result
+
     async def get(self) -> model: # type: ignore
         """
         Получает запись из базы данных по ID с повторными попытками.
@@ -388,11 +839,11 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
         """
         for attempt in range(self.__class__.count_attemps):
             try:
-                async with AsyncSessionLocal() as session:
+                async with read_session_scope() as session:
                     return await super().raw_get(session=session, filter_=(getattr(self.model, self.field_id) == self.custom_id))
             except Exception as ex_:
                 await handle_async(function_category="database", function=f"{self.model.__tablename__}  get", exception=ex_)
-                if attempt == self.__class__.count_attemps - 1:  # Вызываем raise только на последней попытке
+                if attempt == self.__class__.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
                     raise
 
     @classmethod
@@ -405,13 +856,41 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
         """
         for attempt in range(cls.count_attemps):
             try:
-                async with AsyncSessionLocal() as session:
+                async with read_session_scope() as session:
                     return list(await super().raw_get_all(session=session))
             except Exception as ex_:
                 await handle_async(function_category="database", function=f"{cls.model.__tablename__}  get_all", exception=ex_)
-                if attempt == cls.count_attemps - 1:  # Вызываем raise только на последней попытке
+                if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
                     raise
 
+    @classmethod
+    async def iter_all(cls, filters: Optional[List[Any]] = None, batch_size: int = 1000) -> AsyncIterator[model]: # type: ignore
+        """
+        Последовательно возвращает записи из базы данных с постоянным расходом памяти.
+        
+        Использует серверный курсор (stream_scalars), записи упорядочены по
+        первичному ключу. Повторная попытка не выполняется, так как часть записей
+        уже могла быть возвращена: ошибка логируется и передается вызывающему коду.
+        
+        Args:
+            filters: Список прямых условий SQLAlchemy (например, [Model.field > 5, Model.another_field == True])
+            batch_size: Количество записей, получаемых из курсора за один раз
+            
+        Returns:
+            AsyncIterator[model]: Асинхронный итератор записей
+            
+        Example:
+            async for dbUser in UserTool.iter_all(filters=[UserModel.is_active == False]):
+                ...
+        """
+        try:
+            async with read_session_scope() as session:
+                async for instance in super().raw_iter_all(session=session, filters=filters, batch_size=batch_size):
+                    yield instance
+        except Exception as ex_:
+            await handle_async(function_category="database", function=f"{cls.model.__tablename__}  iter_all", exception=ex_)
+            raise
+
     @classmethod
     async def get_all_with_filters(cls, filters: Optional[List[Any]] = None, sort_by: Optional[Any] = None, sort_order: str = "asc", limit: Optional[int] = None, offset: Optional[int] = None) -> List[model]: # type: ignore
         """
@@ -429,13 +908,55 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
         """
         for attempt in range(cls.count_attemps):
             try:
-                async with AsyncSessionLocal() as session:
+                async with read_session_scope() as session:
                     return await super().raw_get_all_with_filters(session=session, filters=filters, sort_by=sort_by, sort_order=sort_order, limit=limit, offset=offset)
             except Exception as ex_:
                 await handle_async(function_category="database", function=f"{cls.model.__tablename__}  get_all_with_filters", exception=ex_)
-                if attempt == cls.count_attemps - 1:  # Вызываем raise только на последней попытке
+                if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
+                    raise
+
+    @classmethod
+    async def get_page(cls, filters: Optional[List[Any]] = None, sort_by: Optional[str] = None, sort_order: str = "asc", limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[model], Optional[str]]: # type: ignore
+        """
+        Получает страницу записей с keyset пагинацией и повторными попытками.
+        
+        Args:
+            filters: Список прямых условий SQLAlchemy (например, [Model.field > 5, Model.another_field == True])
+            sort_by: Имя индексированного поля сортировки. По умолчанию первичный ключ
+            sort_order: Порядок сортировки ("asc" или "desc")
+            limit: Количество записей на странице
+            cursor: Курсор следующей страницы из предыдущего ответа
+            
+        Returns:
+            Tuple: Записи страницы и курсор следующей страницы (None на последней странице)
+            
+        Raises:
+            InvalidCursorError: Если курсор поврежден или выдан для другой сортировки
+            ValueError: Если поле сортировки не подходит для keyset пагинации
+        """
+        columns = cls.get_keyset_columns(sort_by)
+        sort_key = columns[0].key
+        sort_order = sort_order.lower()
+        after = decode_cursor(cursor, sort_key=sort_key, sort_order=sort_order, columns=columns) if cursor else None
+
+        for attempt in range(cls.count_attemps):
+            try:
+                async with read_session_scope() as session:
+                    # Запрашиваем на одну запись больше, чтобы узнать, есть ли следующая страница
+                    result = await super().raw_get_page(session=session, filters=filters, sort_by=sort_by, sort_order=sort_order, limit=limit + 1, after=after)
+                break
+            except Exception as ex_:
+                await handle_async(function_category="database", function=f"{cls.model.__tablename__}  get_page", exception=ex_)
+                if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
                     raise
 
+        if len(result) <= limit:
+            return result, None
+        result = result[:limit]
+        last = result[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns], sort_key=sort_key, sort_order=sort_order)
+        return result, next_cursor
+
     @classmethod
     async def update_with_filters(cls, data: Dict[str, Any], filters: Optional[List[Any]] = None) -> Any:
         """
@@ -450,11 +971,11 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
         """
         for attempt in range(cls.count_attemps):
             try:
-                async with AsyncSessionLocal() as session:
+                async with session_scope() as session:
                     return await super().raw_update_with_filters(session=session, data=data, filters=filters)
             except Exception as ex_:
                 await handle_async(function_category="database", function=f"{cls.model.__tablename__}  update_with_filters", exception=ex_)
-                if attempt == cls.count_attemps - 1:  # Вызываем raise только на последней попытке
+                if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
                     raise
 
     @classmethod
@@ -470,11 +991,11 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
         """
         for attempt in range(cls.count_attemps):
             try:
-                async with AsyncSessionLocal() as session:
+                async with session_scope() as session:
                     return await super().raw_delete_with_filters(session=session, filters=filters)
             except Exception as ex_:
                 await handle_async(function_category="database", function=f"{cls.model.__tablename__}  delete_with_filters", exception=ex_)
-                if attempt == cls.count_attemps - 1:  # Вызываем raise только на последней попытке
+                if attempt == cls.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
                     raise
 
     async def update(self, data: Dict[str, Any]) -> Any:
@@ -489,11 +1010,11 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
         """
         for attempt in range(self.__class__.count_attemps):
             try:
-                async with AsyncSessionLocal() as session:
+                async with session_scope() as session:
                     return await super().raw_update(session=session, data=data, filter_=(getattr(self.model, self.field_id) == self.custom_id))
             except Exception as ex_:
                 await handle_async(function_category="database", function=f"{self.model.__tablename__}  update", exception=ex_)
-                if attempt == self.__class__.count_attemps - 1:  # Вызываем raise только на последней попытке
+                if attempt == self.__class__.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
                     raise
 
     async def delete(self) -> Any:
@@ -505,9 +1026,9 @@ class AsyncBaseIdSQLAlchemyCRUD(AsyncSQLAlchemyRepository):
         """
         for attempt in range(self.__class__.count_attemps):
             try:
-                async with AsyncSessionLocal() as session:
+                async with session_scope() as session:
                     return await super().raw_delete(session=session, filter_=(getattr(self.model, self.field_id) == self.custom_id))
             except Exception as ex_:
                 await handle_async(function_category="database", function=f"{self.model.__tablename__}  delete", exception=ex_)
-                if attempt == self.__class__.count_attemps - 1:  # Вызываем raise только на последней попытке
+                if attempt == self.__class__.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
                     raise
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Модуль инструментирования SQL запросов.
+
+Включается настройкой SQL_INSTRUMENTATION: обработчики событий движка
+SQLAlchemy измеряют каждый выполненный запрос и записывают его отпечаток
+(текст запроса без значений параметров), длительность, количество строк и
+инструмент репозитория, из метода которого запрос выполнен (UserTool,
+SessionTool, ...), в метрики utils.metrics. Медленные запросы и HTTP запросы,
+выполнившие больше SQL_N_PLUS_ONE_THRESHOLD запросов к базе данных
+(признак N+1), записываются в лог.
+"""
+from collections import Counter as FingerprintCounter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional, Tuple
+import hashlib
+import re
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from configuration.settings import SQL_SLOW_QUERY_THRESHOLD, SQL_N_PLUS_ONE_THRESHOLD
+from utils.loggers import logger
+from utils.metrics import (
+    db_query_duration_seconds,
+    sql_query_duration_seconds,
+    sql_query_rows_total,
+    sql_slow_queries_total,
+    sql_n_plus_one_requests_total
+)
+
+
+# Инструмент и метод репозитория, выполняющие текущий запрос (None - вне репозитория)
+query_origin: ContextVar[Optional[Tuple[str, str]]] = ContextVar("query_origin", default=None)
+
+# Статистика запросов текущего HTTP запроса (None - вне track_request_queries)
+request_queries: ContextVar[Optional["RequestQueryStats"]] = ContextVar("request_queries", default=None)
+
+# Регулярные выражения нормализации текста запроса
+WHITESPACE_RE = re.compile(r"\s+")
+PARAMETER_RE = re.compile(r"\$\d+|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PARAMETER_LIST_RE = re.compile(r"\(\?(?:, \?)*\)")
+
+
+class RequestQueryStats:
+    """
+    Запросы к базе данных, выполненные в рамках одного HTTP запроса.
+
+    Attributes:
+        count: Количество запросов
+        duration: Суммарная длительность запросов (секунды)
+        fingerprints: Количество запросов по отпечатку
+        statements: Нормализованный текст запроса по отпечатку
+    """
+    __slots__ = ("count", "duration", "fingerprints", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints: FingerprintCounter = FingerprintCounter()
+        self.statements: Dict[str, str] = {}
+
+    def add(self, fingerprint: str, statement: str, duration: float) -> None:
+        """Учитывает выполненный запрос."""
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint] += 1
+        self.statements.setdefault(fingerprint, statement)
+
+
+@lru_cache(maxsize=1024)
+def get_fingerprint(statement: str) -> Tuple[str, str]:
+    """
+    Возвращает отпечаток запроса.
+
+    Значения параметров и литералы заменяются на "?", списки параметров
+    (например, IN ($1, $2, ...)) сворачиваются в "(...)", поэтому запросы,
+    отличающиеся только значениями, имеют один отпечаток.
+
+    Args:
+        statement: Текст запроса, отправленный драйверу
+
+    Returns:
+        Кортеж (короткий хеш отпечатка, нормализованный текст запроса)
+    """
+    normalized = WHITESPACE_RE.sub(" ", statement).strip()
+    normalized = PARAMETER_RE.sub("?", normalized)
+    normalized = PARAMETER_LIST_RE.sub("(...)", normalized)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+@contextmanager
+def repository_call(tool: str, method: str) -> Iterator[None]:
+    """
+    Выполняет блок как вызов метода репозитория.
+
+    Записывает длительность в db_query_duration_seconds и сохраняет
+    инструмент и метод, чтобы запросы внутри блока были отнесены к ним.
+
+    Args:
+        tool: Имя класса инструмента (UserTool, SessionTool, ...)
+        method: Имя метода
+    """
+    token = query_origin.set((tool, method))
+    try:
+        with db_query_duration_seconds.time(tool=tool, method=method):
+            yield
+    finally:
+        query_origin.reset(token)
+
+
+def observe_query(statement: str, duration: float, rows: int) -> None:
+    """
+    Учитывает выполненный запрос в метриках, статистике HTTP запроса и логе медленных запросов.
+
+    Args:
+        statement: Текст запроса
+        duration: Длительность выполнения (секунды)
+        rows: Количество возвращенных или измененных строк
+    """
+    fingerprint, normalized = get_fingerprint(statement)
+    tool, method = query_origin.get() or ("unknown", "unknown")
+    sql_query_duration_seconds.observe(duration, tool=tool, fingerprint=fingerprint)
+    sql_query_rows_total.inc(rows, tool=tool, fingerprint=fingerprint)
+
+    stats = request_queries.get()
+    if stats is not None:
+        stats.add(fingerprint, normalized, duration)
+
+    if duration >= SQL_SLOW_QUERY_THRESHOLD:
+        sql_slow_queries_total.inc(tool=tool)
+        logger.warning(f"Slow query {duration:.3f}s [{fingerprint}] {tool}.{method} rows={rows}: {normalized}")
+
+
+def before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    """Запоминает время начала запроса в контексте выполнения."""
+    if context is not None:
+        context.query_started_at = time.perf_counter()
+
+
+def after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    """Учитывает завершенный запрос."""
+    started_at = getattr(context, "query_started_at", None)
+    if started_at is None:
+        return
+    rowcount = getattr(cursor, "rowcount", -1)
+    observe_query(statement, time.perf_counter() - started_at, rowcount if rowcount and rowcount > 0 else 0)
+
+
+def install_instrumentation(engine: AsyncEngine) -> None:
+    """
+    Подключает обработчики событий выполнения запросов к движку.
+
+    Args:
+        engine: Асинхронный движок (события регистрируются на engine.sync_engine)
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+@contextmanager
+def track_request_queries(path: str, router: str) -> Iterator[RequestQueryStats]:
+    """
+    Собирает статистику запросов к базе данных за время HTTP запроса.
+
+    Если запросов больше SQL_N_PLUS_ONE_THRESHOLD, записывает в лог
+    предупреждение с самым повторяющимся запросом и увеличивает
+    sql_n_plus_one_requests_total.
+
+    Args:
+        path: Путь HTTP запроса для лога
+        router: Метка роутера для метрики
+
+    Yields:
+        Статистика запросов
+    """
+    stats = RequestQueryStats()
+    token = request_queries.set(stats)
+    try:
+        yield stats
+    finally:
+        request_queries.reset(token)
+        if stats.count > SQL_N_PLUS_ONE_THRESHOLD:
+            fingerprint, repeats = stats.fingerprints.most_common(1)[0]
+            sql_n_plus_one_requests_total.inc(router=router)
+            logger.warning(
+                f"Possible N+1: {path} issued {stats.count} queries in {stats.duration:.3f}s, "
+                f"most repeated [{fingerprint}] x{repeats}: {stats.statements[fingerprint]}"
+            )
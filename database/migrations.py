@@ -0,0 +1,167 @@
+"""
+Модуль миграций схемы базы данных.
+
+Base.metadata.create_all создает только отсутствующие таблицы и не изменяет
+существующие, поэтому изменения схемы существующих таблиц выполняются здесь.
+Каждая миграция идемпотентна и проверяет текущее состояние схемы перед изменением.
+"""
+from typing import Set
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from configuration.settings import ACCESS_TOKEN_LIFETIME
+from database.models.sessions import SessionModel
+from database.partitions import is_partitioned, ensure_session_partitions
+
+
+async def get_table_columns(conn: AsyncConnection, table_name: str) -> Set[str]:
+    """
+    Получает имена колонок таблицы.
+
+    Args:
+        conn: Подключение к базе данных
+        table_name: Имя таблицы
+
+    Returns:
+        Множество имен колонок или пустое множество, если таблицы нет
+    """
+    def get_columns(sync_conn) -> Set[str]:
+        inspector = inspect(sync_conn)
+        if not inspector.has_table(table_name):
+            return set()
+        return {column["name"] for column in inspector.get_columns(table_name)}
+
+    return await conn.run_sync(get_columns)
+
+
+async def migrate_sessions_access_token_hash(conn: AsyncConnection) -> None:
+    """
+    Переводит sessions с хранения JWT токена на хранение его SHA-256 хеша.
+
+    Заполняет access_token_hash для существующих сессий встроенной функцией
+    PostgreSQL sha256, создает уникальный индекс и удаляет колонку access_token.
+    Активные сессии пользователей при этом сохраняются.
+
+    Args:
+        conn: Подключение к базе данных
+    """
+    columns = await get_table_columns(conn, "sessions")
+    if "access_token" not in columns:
+        return
+
+    if "access_token_hash" not in columns:
+        await conn.execute(text("ALTER TABLE sessions ADD COLUMN access_token_hash BYTEA"))
+    await conn.execute(text("UPDATE sessions SET access_token_hash = sha256(convert_to(access_token, 'UTF8')) WHERE access_token_hash IS NULL"))
+    await conn.execute(text("ALTER TABLE sessions ALTER COLUMN access_token_hash SET NOT NULL"))
+    await conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_sessions_access_token_hash ON sessions (access_token_hash)"))
+    await conn.execute(text("ALTER TABLE sessions DROP COLUMN access_token"))
+
+
+async def migrate_sessions_jti(conn: AsyncConnection) -> None:
+    """
+    Добавляет в sessions колонку jti.
+
+    У сессий, созданных до миграции, jti остается пустым: их токены
+    выданы на полный срок и проверяются по таблице sessions.
+
+    Args:
+        conn: Подключение к базе данных
+    """
+    columns = await get_table_columns(conn, "sessions")
+    if columns and "jti" not in columns:
+        await conn.execute(text("ALTER TABLE sessions ADD COLUMN jti VARCHAR"))
+
+
+async def migrate_sessions_expires_at(conn: AsyncConnection) -> None:
+    """
+    Добавляет в sessions колонку expires_at с индексом.
+
+    Для существующих сессий срок окончания вычисляется от даты создания
+    и ACCESS_TOKEN_LIFETIME.
+
+    Args:
+        conn: Подключение к базе данных
+    """
+    columns = await get_table_columns(conn, "sessions")
+    if not columns or "expires_at" in columns:
+        return
+
+    await conn.execute(text("ALTER TABLE sessions ADD COLUMN expires_at TIMESTAMP WITHOUT TIME ZONE"))
+    await conn.execute(text(f"UPDATE sessions SET expires_at = creating_date + interval '{int(ACCESS_TOKEN_LIFETIME)} seconds'"))
+    await conn.execute(text("ALTER TABLE sessions ALTER COLUMN expires_at SET NOT NULL"))
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at)"))
+
+
+async def migrate_sessions_partitioning(conn: AsyncConnection) -> None:
+    """
+    Переводит sessions на секционирование по creating_date.
+
+    Обычная таблица переименовывается вместе с индексами и последовательностью id,
+    создается секционированная таблица с секциями для действующих сессий,
+    в нее переносятся неистекшие сессии, после чего старая таблица удаляется.
+    Последовательность id новой таблицы продолжает нумерацию старой.
+
+    Args:
+        conn: Подключение к базе данных
+    """
+    columns = await get_table_columns(conn, "sessions")
+    if not columns or await is_partitioned(conn, "sessions"):
+        return
+
+    await conn.execute(text("ALTER TABLE sessions RENAME TO sessions_unpartitioned"))
+    # Имена индексов и ограничений должны освободиться для новой таблицы
+    indexes = await conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = 'sessions_unpartitioned'"))
+    for index_name in indexes.scalars().all():
+        await conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_unpartitioned"'))
+    await conn.execute(text("ALTER SEQUENCE IF EXISTS sessions_id_seq RENAME TO sessions_unpartitioned_id_seq"))
+
+    await conn.run_sync(SessionModel.__table__.create)
+    partitions_start, partitions_end = await ensure_session_partitions(conn)
+
+    await conn.execute(
+        text(
+            "INSERT INTO sessions (id, user_id, access_token_hash, jti, creating_date, expires_at) "
+            "SELECT id, user_id, access_token_hash, jti, creating_date, expires_at FROM sessions_unpartitioned "
+            "WHERE expires_at > now() AND creating_date >= :partitions_start AND creating_date < :partitions_end"
+        ),
+        {"partitions_start": partitions_start, "partitions_end": partitions_end}
+    )
+    await conn.execute(text("SELECT setval(pg_get_serial_sequence('sessions', 'id'), (SELECT COALESCE(max(id), 0) + 1 FROM sessions_unpartitioned), false)"))
+    await conn.execute(text("DROP TABLE sessions_unpartitioned"))
+
+
+async def migrate_sessions_access_token_hash_unique(conn: AsyncConnection) -> None:
+    """
+    Заменяет индекс access_token_hash секционированной sessions уникальным индексом (access_token_hash, creating_date).
+
+    Уникальный индекс секционированной таблицы должен включать ключ секционирования,
+    поэтому уникальность проверяется для пары с creating_date.
+
+    Args:
+        conn: Подключение к базе данных
+    """
+    if not await is_partitioned(conn, "sessions"):
+        return
+
+    await conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_sessions_access_token_hash_creating_date ON sessions (access_token_hash, creating_date)"))
+    await conn.execute(text("DROP INDEX IF EXISTS ix_sessions_access_token_hash"))
+
+
+# Миграции в порядке применения
+MIGRATIONS = [
+    migrate_sessions_access_token_hash,
+    migrate_sessions_jti,
+    migrate_sessions_expires_at,
+    migrate_sessions_partitioning,
+    migrate_sessions_access_token_hash_unique,
+]
+
+
+async def run_migrations(conn: AsyncConnection) -> None:
+    """
+    Применяет все миграции по порядку.
+
+    Args:
+        conn: Подключение к базе данных
+    """
+    for migration in MIGRATIONS:
+        await migration(conn)
@@ -0,0 +1,41 @@
+"""
+Модель отозванных JWT токенов.
+"""
+from database.base import Base
+from sqlalchemy import Column, BigInteger, String, DateTime
+import datetime
+
+
+class RevokedTokenModel(Base):
+    """
+    Модель для хранения идентификаторов (jti) отозванных JWT токенов.
+    
+    Используется в режиме AUTH_STATELESS_MODE: короткоживущие токены проверяются
+    только по подписи, а выход из системы, смена пароля и удаление аккаунта
+    отзывают токены через эту таблицу.
+    
+    Attributes:
+        id: Уникальный идентификатор записи
+        jti: Идентификатор отозванного токена
+        expires_at: Момент, после которого токен истекает сам и запись можно удалить
+        creating_date: Дата отзыва (для инкрементальной синхронизации с окном перекрытия)
+    """
+    __tablename__ = "revoked_tokens"
+    
+    # Первичный ключ
+    id = Column(BigInteger, unique=True, primary_key=True)
+
+    # Идентификатор токена и срок хранения записи
+    jti = Column(String, nullable=False, unique=True, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    # Метаданные
+    creating_date = Column(DateTime, default=datetime.datetime.now, nullable=False)
+    
+    def __str__(self):
+        attributes = ", ".join(f"{column.name}={getattr(self, column.name)}" for column in self.__table__.columns)
+        return f"{self.__class__.__name__}: {attributes}"
+
+    def __repr__(self):
+        attributes = ", ".join(f"{column.name}={getattr(self, column.name)}" for column in self.__table__.columns)
+        return f"{self.__class__.__name__}: {attributes}"
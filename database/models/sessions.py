@@ -2,9 +2,10 @@
 Модель сессий пользователей для отслеживания JWT токенов.
 """
 from database.base import Base
-from sqlalchemy import Column, BigInteger, String, DateTime, Double, Boolean, ForeignKey
+from sqlalchemy import Column, BigInteger, String, DateTime, Double, Boolean, ForeignKey, LargeBinary, Index
 import datetime
 from database.models.users import UserModel
+from configuration.settings import ACCESS_TOKEN_LIFETIME
 
 
 class SessionModel(Base):
@@ -17,25 +18,52 @@ class SessionModel(Base):
     Attributes:
         id: Уникальный идентификатор сессии
         user_id: ID пользователя (внешний ключ на users.id)
-        access_token: JWT токен (уникальный)
+        access_token_hash: SHA-256 хеш JWT токена, 32 байта
+        jti: Идентификатор JWT токена (для отзыва в режиме AUTH_STATELESS_MODE)
         creating_date: Дата создания сессии
+        expires_at: Дата окончания сессии
     
     Note:
         Каждый активный JWT токен должен соответствовать записи в сессиях
-        для прохождения проверки в AuthMiddleware.
+        для прохождения проверки в AuthMiddleware. Сам токен не хранится,
+        поиск выполняется по его хешу (см. SessionTool.hash_access_token).
+        
+        Таблица секционирована по creating_date (см. database.partitions),
+        поэтому первичный ключ и уникальный индекс хеша токена включают
+        creating_date. Уникальность (access_token_hash, creating_date)
+        проверяется индексом, а глобальная уникальность хеша обеспечивается
+        случайным jti токена. Поиск по хешу токена ограничивается окном
+        действующих сессий (SessionModel.active_filter), чтобы PostgreSQL
+        просматривал только секции с неистекшими сессиями.
     """
     __tablename__ = "sessions"
+    __table_args__ = (
+        Index("ix_sessions_access_token_hash_creating_date", "access_token_hash", "creating_date", unique=True),
+        {"postgresql_partition_by": "RANGE (creating_date)"},
+    )
     
-    # Первичный ключ
-    id = Column(BigInteger, unique=True, primary_key=True)
+    # Первичный ключ (вместе с creating_date)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
 
     # Ссылка на пользователя и токен
     user_id = Column(BigInteger, ForeignKey(UserModel.id), nullable=False, index=True)
-    access_token = Column(String, nullable=False, unique=True, index=True)
+    access_token_hash = Column(LargeBinary(32), nullable=False)
+    jti = Column(String, nullable=True)
 
     # Метаданные
-    creating_date = Column(DateTime, default=datetime.datetime.now, nullable=False)
+    creating_date = Column(DateTime, default=datetime.datetime.now, nullable=False, primary_key=True)
+    expires_at = Column(DateTime, nullable=False)
     
+    @classmethod
+    def active_filter(cls):
+        """
+        Возвращает условие на creating_date для сессий, созданных не раньше ACCESS_TOKEN_LIFETIME назад.
+
+        Более старые сессии истекли (expires_at не позже creating_date + ACCESS_TOKEN_LIFETIME),
+        а условие на ключ секционирования позволяет исключить их секции из запроса.
+        """
+        return cls.creating_date > datetime.datetime.now() - datetime.timedelta(seconds=ACCESS_TOKEN_LIFETIME)
+
     def __str__(self):
         attributes = ", ".join(f"{column.name}={getattr(self, column.name)}" for column in self.__table__.columns)
         return f"{self.__class__.__name__}: {attributes}"
@@ -0,0 +1,67 @@
+"""
+Модуль курсоров для keyset пагинации.
+
+Курсор - непрозрачная для клиента строка (base64url от JSON), в которой
+хранятся значения колонок сортировки последней записи страницы, а также
+поле и порядок сортировки, для которых курсор был выдан.
+"""
+import base64
+import datetime
+import json
+from typing import Any, List, Sequence
+from sqlalchemy import Column, DateTime
+
+
+class InvalidCursorError(ValueError):
+    """Курсор поврежден или выдан для другой сортировки."""
+
+
+def encode_cursor(values: Sequence[Any], sort_key: str, sort_order: str) -> str:
+    """
+    Формирует курсор по значениям колонок сортировки последней записи.
+
+    Args:
+        values: Значения колонок сортировки (поле сортировки и первичный ключ)
+        sort_key: Имя поля сортировки
+        sort_order: Порядок сортировки ("asc" или "desc")
+
+    Returns:
+        str: Курсор следующей страницы
+    """
+    values = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    raw = json.dumps([sort_key, sort_order, values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort_key: str, sort_order: str, columns: Sequence[Column]) -> List[Any]:
+    """
+    Разбирает курсор и возвращает значения колонок сортировки.
+
+    Args:
+        cursor: Курсор, полученный от encode_cursor
+        sort_key: Имя поля сортировки текущего запроса
+        sort_order: Порядок сортировки текущего запроса
+        columns: Колонки сортировки в порядке значений курсора
+
+    Returns:
+        List[Any]: Значения колонок сортировки
+
+    Raises:
+        InvalidCursorError: Если курсор поврежден или выдан для другой сортировки
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort_key, cursor_sort_order, values = json.loads(raw)
+    except (ValueError, TypeError) as ex_:
+        raise InvalidCursorError("Invalid cursor") from ex_
+
+    if cursor_sort_key != sort_key or cursor_sort_order != sort_order or not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursorError("Invalid cursor")
+
+    try:
+        return [
+            datetime.datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError) as ex_:
+        raise InvalidCursorError("Invalid cursor") from ex_
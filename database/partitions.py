@@ -0,0 +1,152 @@
+"""
+Модуль секционирования таблицы sessions по дате создания.
+
+Таблица sessions секционирована по диапазонам creating_date (PARTITION BY RANGE),
+каждая секция хранит сессии за SESSION_PARTITION_DAYS дней. Секции создаются
+заранее на SESSION_PARTITIONS_AHEAD периодов вперед (при запуске и
+периодически, SESSION_PARTITION_MAINTENANCE_INTERVAL), а секции, все сессии
+которых старше ACCESS_TOKEN_LIFETIME, удаляются целиком (DROP TABLE) вместо
+построчного DELETE.
+
+Индексы, объявленные в SessionModel, PostgreSQL создает в каждой секции
+автоматически, поэтому поиск сессий остается индексным.
+"""
+import datetime
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from configuration.settings import ACCESS_TOKEN_LIFETIME, SESSION_PARTITION_DAYS, SESSION_PARTITIONS_AHEAD
+
+
+# Имя секционированной таблицы и префикс имен ее секций
+SESSIONS_TABLE = "sessions"
+PARTITION_NAME_FORMAT = f"{SESSIONS_TABLE}_p%Y%m%d"
+
+
+def get_partition_start(moment: datetime.datetime) -> datetime.datetime:
+    """
+    Возвращает начало периода секции, в который попадает момент времени.
+
+    Args:
+        moment: Момент времени
+
+    Returns:
+        datetime: Начало периода (полночь, кратная SESSION_PARTITION_DAYS дням)
+    """
+    day = moment.date()
+    day -= datetime.timedelta(days=day.toordinal() % SESSION_PARTITION_DAYS)
+    return datetime.datetime.combine(day, datetime.time.min)
+
+
+async def is_partitioned(conn: AsyncConnection, table_name: str = SESSIONS_TABLE) -> bool:
+    """
+    Проверяет, является ли таблица секционированной.
+
+    Args:
+        conn: Подключение к базе данных
+        table_name: Имя таблицы
+
+    Returns:
+        True, если таблица существует и секционирована
+    """
+    result = await conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table_name))"),
+        {"table_name": table_name}
+    )
+    return bool(result.scalar())
+
+
+async def create_session_partitions(conn: AsyncConnection, start: datetime.datetime, end: datetime.datetime) -> Tuple[datetime.datetime, datetime.datetime]:
+    """
+    Создает отсутствующие секции sessions, покрывающие диапазон [start, end].
+
+    Args:
+        conn: Подключение к базе данных
+        start: Начало диапазона
+        end: Конец диапазона
+
+    Returns:
+        Tuple: Начало первой и конец последней секции диапазона
+    """
+    period = datetime.timedelta(days=SESSION_PARTITION_DAYS)
+    first_start = partition_start = get_partition_start(start)
+    while partition_start <= end:
+        partition_end = partition_start + period
+        name = partition_start.strftime(PARTITION_NAME_FORMAT)
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {SESSIONS_TABLE} "
+            f"FOR VALUES FROM ('{partition_start.isoformat()}') TO ('{partition_end.isoformat()}')"
+        ))
+        partition_start = partition_end
+    return first_start, partition_start
+
+
+async def ensure_session_partitions(conn: AsyncConnection) -> Tuple[datetime.datetime, datetime.datetime]:
+    """
+    Создает секции для всех еще действующих сессий и SESSION_PARTITIONS_AHEAD периодов вперед.
+
+    Args:
+        conn: Подключение к базе данных
+
+    Returns:
+        Tuple: Начало самой старой действующей и конец последней созданной заранее секции
+    """
+    now = datetime.datetime.now()
+    return await create_session_partitions(
+        conn,
+        start=now - datetime.timedelta(seconds=ACCESS_TOKEN_LIFETIME),
+        end=now + datetime.timedelta(days=SESSION_PARTITION_DAYS * SESSION_PARTITIONS_AHEAD)
+    )
+
+
+async def drop_expired_session_partitions(conn: AsyncConnection) -> List[str]:
+    """
+    Удаляет секции sessions, все сессии которых уже истекли.
+
+    Сессия истекает через ACCESS_TOKEN_LIFETIME после создания, поэтому
+    секция удаляется, когда от конца ее периода прошло ACCESS_TOKEN_LIFETIME.
+
+    Args:
+        conn: Подключение к базе данных
+
+    Returns:
+        List[str]: Имена удаленных секций
+    """
+    result = await conn.execute(
+        text("SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid WHERE pg_inherits.inhparent = to_regclass(:table_name)"),
+        {"table_name": SESSIONS_TABLE}
+    )
+    expired_before = datetime.datetime.now() - datetime.timedelta(seconds=ACCESS_TOKEN_LIFETIME)
+    period = datetime.timedelta(days=SESSION_PARTITION_DAYS)
+
+    dropped = []
+    for name in result.scalars().all():
+        try:
+            partition_start = datetime.datetime.strptime(name, PARTITION_NAME_FORMAT)
+        except ValueError:
+            # Секция создана не этим модулем, ее срок неизвестен
+            continue
+        if partition_start + period <= expired_before:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    return dropped
+
+
+async def lock_session_partitions(conn: AsyncConnection) -> bool:
+    """
+    Захватывает транзакционную advisory блокировку обслуживания секций.
+
+    Блокировка не дает нескольким воркерам одновременно создавать и удалять
+    секции и освобождается при завершении транзакции.
+
+    Args:
+        conn: Подключение к базе данных
+
+    Returns:
+        True, если блокировка захвачена
+    """
+    result = await conn.execute(
+        text("SELECT pg_try_advisory_xact_lock(hashtext(:lock_name))"),
+        {"lock_name": f"{SESSIONS_TABLE}_partitions"}
+    )
+    return bool(result.scalar())
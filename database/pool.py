@@ -0,0 +1,130 @@
+"""
+Модуль пула подключений к базе данных с метриками.
+
+MeteredAsyncAdaptedQueuePool измеряет время получения подключения из пула
+(включая ожидание освобождения подключения и создание нового), метрики
+собираются в pool_metrics по имени пула (pool_logging_name движка) и вместе
+с текущим состоянием пула доступны через get_pool_status (для воркера,
+обработавшего запрос). Те же данные публикуются в реестре utils.metrics
+(db_pool_*), поэтому /metrics суммирует их по всем воркерам.
+"""
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from utils.metrics import (
+    registry,
+    db_pool_checkout_wait_seconds,
+    db_pool_timeouts_total,
+    db_pool_size,
+    db_pool_checked_out,
+    db_pool_checked_in,
+    db_pool_overflow
+)
+
+
+class PoolMetrics:
+    """
+    Накопленные метрики выдачи подключений из пула воркера.
+
+    Attributes:
+        checkouts: Количество выданных подключений
+        checkout_wait_total: Суммарное время получения подключений (секунды)
+        checkout_wait_max: Максимальное время получения подключения (секунды)
+        timeouts: Количество превышений DATABASE_POOL_TIMEOUT
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.timeouts = 0
+
+    def observe_checkout(self, seconds: float) -> None:
+        """
+        Учитывает успешное получение подключения.
+
+        Args:
+            seconds: Время получения подключения
+        """
+        self.checkouts += 1
+        self.checkout_wait_total += seconds
+        if seconds > self.checkout_wait_max:
+            self.checkout_wait_max = seconds
+
+    def observe_timeout(self) -> None:
+        """Учитывает превышение времени ожидания подключения."""
+        self.timeouts += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает метрики в виде словаря."""
+        return dict(
+            checkouts=self.checkouts,
+            checkout_wait_total=self.checkout_wait_total,
+            checkout_wait_avg=self.checkout_wait_total / self.checkouts if self.checkouts else 0.0,
+            checkout_wait_max=self.checkout_wait_max,
+            timeouts=self.timeouts,
+        )
+
+
+# Метрики пулов подключений воркера по имени пула
+pool_metrics: DefaultDict[str, PoolMetrics] = defaultdict(PoolMetrics)
+
+# Действующие пулы воркера по имени пула (пул, пересозданный при dispose, заменяет прежний)
+metered_pools: Dict[str, "MeteredAsyncAdaptedQueuePool"] = {}
+
+
+class MeteredAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool, записывающий время получения подключений в pool_metrics и реестр метрик."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        metered_pools[self.logging_name] = self
+
+    def _do_get(self):
+        metrics = pool_metrics[self.logging_name]
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            metrics.observe_timeout()
+            db_pool_timeouts_total.inc(pool=self.logging_name)
+            raise
+        seconds = time.perf_counter() - started_at
+        metrics.observe_checkout(seconds)
+        db_pool_checkout_wait_seconds.observe(seconds, pool=self.logging_name)
+        return connection
+
+
+def collect_pool_metrics() -> None:
+    """Записывает текущее состояние пулов воркера в gauge db_pool_* перед снимком метрик."""
+    for name, pool in metered_pools.items():
+        db_pool_size.set(pool.size(), pool=name)
+        db_pool_checked_out.set(pool.checkedout(), pool=name)
+        db_pool_checked_in.set(pool.checkedin(), pool=name)
+        db_pool_overflow.set(max(pool.overflow(), 0), pool=name)
+
+
+registry.add_collector(collect_pool_metrics)
+
+
+def get_pool_status(pool: AsyncAdaptedQueuePool) -> Dict[str, Any]:
+    """
+    Возвращает текущее состояние пула и накопленные метрики.
+
+    Args:
+        pool: Пул подключений движка (engine.pool)
+
+    Returns:
+        Словарь с размером пула, количеством занятых, свободных и
+        дополнительных подключений и метриками выдачи подключений
+    """
+    return dict(
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        checked_in=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        timeout=pool.timeout(),
+        **pool_metrics[pool.logging_name].to_dict(),
+    )
@@ -0,0 +1,515 @@
+"""
+Модуль хранилищ сессий пользователей.
+
+SessionTool хранит сессии через хранилище, выбранное настройкой SESSION_STORE.
+Кеш проверки сессий, инвалидация и отзыв токенов остаются в SessionTool,
+хранилище отвечает только за чтение и запись самих сессий.
+
+Доступные хранилища:
+    sqlalchemy - таблица sessions в PostgreSQL
+    key_value - Redis-совместимое key-value хранилище (SESSION_STORE_URL)
+"""
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Awaitable, Callable, FrozenSet, List, Optional, Tuple, Type
+import datetime
+import json
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncConnection
+from database.models.sessions import SessionModel
+from database.models.users import UserModel
+from database.models.role_rules import RoleRuleModel
+from database.unit_of_work import session_scope, read_session_scope, use_primary, has_read_replica, is_pinned_to_primary, commit, in_unit_of_work
+from database.partitions import lock_session_partitions, ensure_session_partitions, drop_expired_session_partitions
+from utils.cache.key_value import create_key_value_client
+from utils.exception_handler.handler import handle_async
+from database.instrumentation import repository_call
+
+
+class SessionStore(ABC):
+    """
+    Базовое хранилище сессий.
+
+    Сессии идентифицируются парой (ID пользователя, SHA-256 хеш токена) и
+    возвращаются как объекты SessionModel, поэтому код, использующий
+    SessionTool, не зависит от хранилища.
+
+    Attributes:
+        expires_sessions: Хранилище само удаляет истекшие сессии, фоновое
+            удаление (reap_expired) и подготовка хранилища (prepare_storage) не нужны
+    """
+    expires_sessions = False
+
+    @abstractmethod
+    async def create(self, user_id: int, access_token_hash: bytes, jti: Optional[str], expires_at: datetime.datetime) -> SessionModel:
+        """
+        Создает сессию.
+
+        Args:
+            user_id: Идентификатор пользователя
+            access_token_hash: SHA-256 хеш токена
+            jti: Идентификатор JWT токена
+            expires_at: Дата окончания сессии
+
+        Returns:
+            Созданная сессия
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get(self, user_id: int, access_token_hash: bytes) -> Optional[SessionModel]:
+        """
+        Получает сессию по ID пользователя и хешу токена.
+
+        Args:
+            user_id: Идентификатор пользователя
+            access_token_hash: SHA-256 хеш токена
+
+        Returns:
+            Сессия или None если не найдена
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_with_user_and_rules(self, user_id: int, access_token_hash: bytes) -> Optional[Tuple[SessionModel, UserModel, FrozenSet[str]]]:
+        """
+        Получает сессию, пользователя и права его роли.
+
+        Args:
+            user_id: Идентификатор пользователя
+            access_token_hash: SHA-256 хеш токена
+
+        Returns:
+            Кортеж (сессия, пользователь, frozenset имен прав) или None если сессия не найдена
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def replace_token(self, dbSession: SessionModel, old_access_token_hash: bytes, new_access_token_hash: bytes, jti: Optional[str]) -> None:
+        """
+        Переводит сессию на новый токен.
+
+        Args:
+            dbSession: Сессия, найденная по старому токену
+            old_access_token_hash: SHA-256 хеш старого токена
+            new_access_token_hash: SHA-256 хеш нового токена
+            jti: Идентификатор нового JWT токена
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, user_id: int, access_token_hash: bytes) -> List[Optional[str]]:
+        """
+        Удаляет сессию по ID пользователя и хешу токена.
+
+        Args:
+            user_id: Идентификатор пользователя
+            access_token_hash: SHA-256 хеш токена
+
+        Returns:
+            jti удаленных сессий
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_all(self, user_id: int, except_access_token_hash: Optional[bytes] = None) -> List[Optional[str]]:
+        """
+        Удаляет все сессии пользователя, кроме сессии с указанным хешем токена.
+
+        Args:
+            user_id: Идентификатор пользователя
+            except_access_token_hash: SHA-256 хеш токена сессии, которую нужно оставить
+
+        Returns:
+            jti удаленных сессий
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_all(self, batch_size: int = 1000) -> AsyncIterator[SessionModel]:
+        """
+        Последовательно возвращает действующие сессии с постоянным расходом памяти.
+
+        Args:
+            batch_size: Количество сессий, получаемых из хранилища за один раз
+
+        Returns:
+            Асинхронный итератор сессий
+        """
+        raise NotImplementedError
+
+    async def reap_expired(self) -> List[str]:
+        """
+        Удаляет истекшие сессии, если хранилище не делает этого само.
+
+        Returns:
+            Описание удаленных данных (например, имена секций)
+        """
+        return []
+
+    async def prepare_storage(self) -> None:
+        """Заранее подготавливает место для новых сессий, если хранилищу это нужно (например, секции таблицы)."""
+
+    async def close(self) -> None:
+        """Освобождает ресурсы хранилища."""
+
+
+class SQLAlchemySessionStore(SessionStore):
+    """
+    Хранилище сессий в таблице sessions PostgreSQL.
+
+    Операции выполняются через unit of work текущего запроса (database.unit_of_work).
+
+    Attributes:
+        tool: CRUD класс модели SessionModel (SessionTool), задает количество попыток
+    """
+
+    def __init__(self, tool: Type[Any]):
+        self.tool = tool
+
+    async def execute_with_retries(self, name: str, query: Any) -> Any:
+        """
+        Выполняет запрос и фиксирует изменения с повторными попытками.
+
+        Args:
+            name: Имя операции для логов
+            query: Запрос SQLAlchemy
+
+        Returns:
+            Все строки результата
+        """
+        for attempt in range(self.tool.count_attemps):
+            try:
+                with repository_call(tool=type(self).__name__, method=name):
+                    async with session_scope() as session:
+                        rows = (await session.execute(query)).all()
+                        await commit(session)
+                        return rows
+            except Exception as ex_:
+                await handle_async(function_category="database", function=f"{SessionModel.__tablename__}  {name}", exception=ex_)
+                if attempt == self.tool.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
+                    raise
+
+    async def create(self, user_id: int, access_token_hash: bytes, jti: Optional[str], expires_at: datetime.datetime) -> SessionModel:
+        return await self.tool.create(data=dict(
+            user_id=user_id,
+            access_token_hash=access_token_hash,
+            jti=jti,
+            expires_at=expires_at
+        ))
+
+    async def get(self, user_id: int, access_token_hash: bytes) -> Optional[SessionModel]:
+        dbSessions: list[SessionModel] = await self.tool.get_all_with_filters(filters=[SessionModel.user_id == user_id, SessionModel.access_token_hash == access_token_hash, SessionModel.active_filter()])
+        if len(dbSessions) == 0:
+            return None
+        return dbSessions[0]
+
+    async def get_with_user_and_rules(self, user_id: int, access_token_hash: bytes) -> Optional[Tuple[SessionModel, UserModel, FrozenSet[str]]]:
+        """
+        Получает сессию, пользователя и права его роли одним запросом.
+
+        Объединяет sessions, users и role_rules через JOIN и агрегирует права
+        роли в массив, чтобы аутентификация запроса стоила одного обращения к базе данных.
+        Запрос выполняется на реплике, если она настроена; не найденная на реплике
+        сессия перепроверяется на основной базе данных.
+        """
+        query = (
+            select(SessionModel, UserModel, func.array_remove(func.array_agg(RoleRuleModel.rule_name), None))
+            .join(UserModel, UserModel.id == SessionModel.user_id)
+            .outerjoin(RoleRuleModel, RoleRuleModel.role_name == UserModel.role)
+            .filter(SessionModel.user_id == user_id, SessionModel.access_token_hash == access_token_hash, SessionModel.active_filter())
+            .group_by(SessionModel.id, SessionModel.creating_date, UserModel.id)
+        )
+        for attempt in range(self.tool.count_attemps):
+            try:
+                with repository_call(tool=type(self).__name__, method="get_with_user_and_rules"):
+                    async with read_session_scope() as session:
+                        row = (await session.execute(query)).first()
+                    if row is None and has_read_replica() and not is_pinned_to_primary():
+                        # Сессия могла быть создана только что и еще не попасть на реплику
+                        async with use_primary():
+                            async with read_session_scope() as session:
+                                row = (await session.execute(query)).first()
+                if row is None:
+                    return None
+                dbSession, dbUser, rule_names = row
+                return dbSession, dbUser, frozenset(rule_names or ())
+            except Exception as ex_:
+                await handle_async(function_category="database", function=f"{SessionModel.__tablename__}  fetch_with_user_and_rules", exception=ex_)
+                if attempt == self.tool.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
+                    raise
+
+    async def iter_all(self, batch_size: int = 1000) -> AsyncIterator[SessionModel]:
+        async for dbSession in self.tool.iter_all(filters=[SessionModel.active_filter()], batch_size=batch_size):
+            yield dbSession
+
+    async def replace_token(self, dbSession: SessionModel, old_access_token_hash: bytes, new_access_token_hash: bytes, jti: Optional[str]) -> None:
+        await self.tool(dbSession.id).update(data=dict(
+            access_token_hash=new_access_token_hash,
+            jti=jti
+        ))
+
+    async def delete(self, user_id: int, access_token_hash: bytes) -> List[Optional[str]]:
+        query = delete(SessionModel).filter(SessionModel.user_id == user_id, SessionModel.access_token_hash == access_token_hash, SessionModel.active_filter()).returning(SessionModel.jti)
+        return [row.jti for row in await self.execute_with_retries("delete", query)]
+
+    async def delete_all(self, user_id: int, except_access_token_hash: Optional[bytes] = None) -> List[Optional[str]]:
+        query = delete(SessionModel).filter(SessionModel.user_id == user_id, SessionModel.active_filter())
+        if except_access_token_hash is not None:
+            query = query.filter(SessionModel.access_token_hash != except_access_token_hash)
+        query = query.returning(SessionModel.jti)
+        return [row.jti for row in await self.execute_with_retries("delete_all", query)]
+
+    async def maintain_partitions(self, name: str, maintenance: Callable[[AsyncConnection], Awaitable[Any]]) -> Any:
+        """
+        Выполняет обслуживание секций sessions под advisory блокировкой с повторными попытками.
+
+        Обслуживание выполняет только один воркер одновременно, остальные пропускают запуск.
+
+        Args:
+            name: Имя операции для логов
+            maintenance: Функция обслуживания, принимающая подключение
+
+        Returns:
+            Результат maintenance или None, если блокировка захвачена другим воркером
+        """
+        for attempt in range(self.tool.count_attemps):
+            try:
+                async with session_scope() as session:
+                    conn = await session.connection()
+                    result = None
+                    if await lock_session_partitions(conn):
+                        result = await maintenance(conn)
+                    await commit(session)
+                    return result
+            except Exception as ex_:
+                await handle_async(function_category="database", function=f"{SessionModel.__tablename__}  {name}", exception=ex_)
+                if attempt == self.tool.count_attemps - 1 or in_unit_of_work():  # Вызываем raise на последней попытке или внутри unit of work
+                    raise
+
+    async def reap_expired(self) -> List[str]:
+        """
+        Удаляет секции sessions с истекшими сессиями.
+
+        Истекшие сессии удаляются целиком вместе с секцией (DROP TABLE), без
+        построчного DELETE и последующего VACUUM.
+
+        Returns:
+            Имена удаленных секций
+        """
+        return await self.maintain_partitions("reap_expired", drop_expired_session_partitions) or []
+
+    async def prepare_storage(self) -> None:
+        """
+        Создает секции sessions наперед.
+
+        Выполняется по своему расписанию (SESSION_PARTITION_MAINTENANCE_INTERVAL),
+        независимо от удаления истекших секций, иначе после последней созданной
+        секции вставка новых сессий завершалась бы ошибкой.
+        """
+        await self.maintain_partitions("prepare_storage", ensure_session_partitions)
+
+
+class KeyValueSessionStore(SessionStore):
+    """
+    Хранилище сессий в Redis-совместимом key-value хранилище.
+
+    Сессия хранится в ключе session:<hex хеша токена> (JSON) со временем жизни
+    до expires_at, поэтому истекшие сессии удаляет само хранилище. Множество
+    user_sessions:<user_id> содержит хеши токенов пользователя для удаления
+    всех его сессий. Пользователь и права роли загружаются из PostgreSQL
+    (права - из индекса RoleRuleTool в памяти).
+
+    Note:
+        Изменения в key-value хранилище не входят в транзакцию unit of work
+        и применяются сразу. Изменения сессии и множества сессий пользователя
+        выполняются одной транзакцией MULTI/EXEC.
+
+    Attributes:
+        client: Клиент с асинхронным API redis-py (decode_responses=True)
+    """
+    expires_sessions = True
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    @staticmethod
+    def session_key(access_token_hash: bytes) -> str:
+        """Возвращает ключ сессии по хешу токена."""
+        return f"session:{access_token_hash.hex()}"
+
+    @staticmethod
+    def user_key(user_id: int) -> str:
+        """Возвращает ключ множества сессий пользователя."""
+        return f"user_sessions:{user_id}"
+
+    @staticmethod
+    def dump(dbSession: SessionModel) -> str:
+        """Сериализует сессию в JSON (без хеша токена, он хранится в ключе)."""
+        return json.dumps(dict(
+            id=dbSession.id,
+            user_id=dbSession.user_id,
+            jti=dbSession.jti,
+            creating_date=dbSession.creating_date.isoformat(),
+            expires_at=dbSession.expires_at.isoformat()
+        ))
+
+    @staticmethod
+    def load(value: str, access_token_hash: bytes) -> SessionModel:
+        """Восстанавливает сессию из JSON."""
+        data = json.loads(value)
+        return SessionModel(
+            id=data["id"],
+            user_id=data["user_id"],
+            access_token_hash=access_token_hash,
+            jti=data["jti"],
+            creating_date=datetime.datetime.fromisoformat(data["creating_date"]),
+            expires_at=datetime.datetime.fromisoformat(data["expires_at"])
+        )
+
+    @staticmethod
+    def get_ttl_ms(expires_at: datetime.datetime) -> int:
+        """Возвращает оставшееся время жизни сессии в миллисекундах (не меньше 1)."""
+        return max(1, int((expires_at - datetime.datetime.now()).total_seconds() * 1000))
+
+    def queue_save(self, pipe: Any, dbSession: SessionModel, extend_user_key: bool = True) -> None:
+        """
+        Добавляет в пайплайн сохранение сессии и ее добавление в множество сессий пользователя.
+
+        Args:
+            pipe: Пайплайн клиента
+            dbSession: Сессия
+            extend_user_key: Продлить множество сессий пользователя до истечения этой сессии
+        """
+        ttl_ms = self.get_ttl_ms(dbSession.expires_at)
+        user_key = self.user_key(dbSession.user_id)
+        pipe.set(self.session_key(dbSession.access_token_hash), self.dump(dbSession), px=ttl_ms)
+        pipe.sadd(user_key, dbSession.access_token_hash.hex())
+        if extend_user_key:
+            # Все сессии живут одинаковый срок, поэтому новая сессия истекает последней
+            pipe.pexpire(user_key, ttl_ms)
+
+    async def save(self, dbSession: SessionModel) -> None:
+        """Сохраняет сессию и добавляет ее в множество сессий пользователя одной транзакцией (MULTI/EXEC)."""
+        async with self.client.pipeline(transaction=True) as pipe:
+            self.queue_save(pipe, dbSession)
+            await pipe.execute()
+
+    async def create(self, user_id: int, access_token_hash: bytes, jti: Optional[str], expires_at: datetime.datetime) -> SessionModel:
+        dbSession = SessionModel(
+            id=await self.client.incr("session_id"),
+            user_id=int(user_id),
+            access_token_hash=access_token_hash,
+            jti=jti,
+            creating_date=datetime.datetime.now(),
+            expires_at=expires_at
+        )
+        await self.save(dbSession)
+        return dbSession
+
+    async def get(self, user_id: int, access_token_hash: bytes) -> Optional[SessionModel]:
+        value = await self.client.get(self.session_key(access_token_hash))
+        if value is None:
+            return None
+        dbSession = self.load(value, access_token_hash)
+        if dbSession.user_id != int(user_id):
+            return None
+        return dbSession
+
+    async def get_with_user_and_rules(self, user_id: int, access_token_hash: bytes) -> Optional[Tuple[SessionModel, UserModel, FrozenSet[str]]]:
+        from database.tools.users import UserTool
+        from database.tools.role_rules import RoleRuleTool
+
+        dbSession = await self.get(user_id, access_token_hash)
+        if dbSession is None:
+            return None
+        dbUser: UserModel = await UserTool(dbSession.user_id).get()
+        if dbUser is None:
+            return None
+        return dbSession, dbUser, await RoleRuleTool.get_rules_by_role_name(role_name=dbUser.role)
+
+    async def replace_token(self, dbSession: SessionModel, old_access_token_hash: bytes, new_access_token_hash: bytes, jti: Optional[str]) -> None:
+        new_session = SessionModel(
+            id=dbSession.id,
+            user_id=dbSession.user_id,
+            access_token_hash=new_access_token_hash,
+            jti=jti,
+            creating_date=dbSession.creating_date,
+            expires_at=dbSession.expires_at
+        )
+        async with self.client.pipeline(transaction=True) as pipe:
+            # Сессия создана раньше последней сессии пользователя, продление множества сократило бы его время жизни
+            self.queue_save(pipe, new_session, extend_user_key=False)
+            pipe.delete(self.session_key(old_access_token_hash))
+            pipe.srem(self.user_key(dbSession.user_id), old_access_token_hash.hex())
+            await pipe.execute()
+
+    async def delete(self, user_id: int, access_token_hash: bytes) -> List[Optional[str]]:
+        dbSession = await self.get(user_id, access_token_hash)
+        if dbSession is None:
+            return []
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self.session_key(access_token_hash))
+            pipe.srem(self.user_key(dbSession.user_id), access_token_hash.hex())
+            await pipe.execute()
+        return [dbSession.jti]
+
+    async def delete_all(self, user_id: int, except_access_token_hash: Optional[bytes] = None) -> List[Optional[str]]:
+        user_key = self.user_key(int(user_id))
+        digests = await self.client.smembers(user_key)
+        if except_access_token_hash is not None:
+            digests.discard(except_access_token_hash.hex())
+        if not digests:
+            return []
+
+        digests = list(digests)
+        session_keys = [f"session:{digest}" for digest in digests]
+        # Ключи истекших сессий уже удалены хранилищем, их jti не нужны
+        values = await self.client.mget(session_keys)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(*session_keys)
+            pipe.srem(user_key, *digests)
+            await pipe.execute()
+        return [json.loads(value)["jti"] for value in values if value is not None]
+
+    async def iter_all(self, batch_size: int = 1000) -> AsyncIterator[SessionModel]:
+        """Перебирает ключи session:* командой SCAN, порядок сессий не гарантируется."""
+        keys = []
+        async for key in self.client.scan_iter(match="session:*", count=batch_size):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                for dbSession in await self.load_many(keys):
+                    yield dbSession
+                keys = []
+        for dbSession in await self.load_many(keys):
+            yield dbSession
+
+    async def load_many(self, keys: List[str]) -> List[SessionModel]:
+        """Загружает сессии по ключам, пропуская истекшие после SCAN."""
+        if not keys:
+            return []
+        values = await self.client.mget(keys)
+        return [
+            self.load(value, bytes.fromhex(key.partition(":")[2]))
+            for key, value in zip(keys, values)
+            if value is not None
+        ]
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_session_store(name: str, tool: Type[Any], url: str) -> SessionStore:
+    """
+    Создает хранилище сессий по имени.
+
+    Args:
+        name: "sqlalchemy" или "key_value"
+        tool: CRUD класс модели SessionModel для хранилища "sqlalchemy"
+        url: Адрес key-value хранилища для "key_value"
+
+    Returns:
+        Хранилище сессий
+    """
+    if name == "key_value":
+        return KeyValueSessionStore(client=create_key_value_client(url))
+    return SQLAlchemySessionStore(tool=tool)
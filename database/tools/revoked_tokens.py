@@ -0,0 +1,147 @@
+"""
+Инструменты для работы со списком отозванных JWT токенов.
+
+Обеспечивает отзыв токенов по jti и синхронизацию списка отзыва
+в памяти воркера с базой данных.
+"""
+from database.basic_tools import AsyncBaseIdSQLAlchemyCRUD
+from database.models.revoked_tokens import RevokedTokenModel
+from configuration.settings import AUTH_STATELESS_MODE, STATELESS_ACCESS_TOKEN_LIFETIME, REVOCATION_SYNC_OVERLAP
+from utils.cache.channels import invalidation_channel
+from database.unit_of_work import on_commit
+from utils.exception_handler.handler import handle_async
+from typing import Any, Dict, Iterable, Optional
+from asyncio import Lock
+import asyncio
+import datetime
+import time
+
+
+class RevokedTokenTool(AsyncBaseIdSQLAlchemyCRUD):
+    """
+    Класс для управления отозванными токенами.
+
+    Каждый воркер хранит множество отозванных jti в памяти. Оно дополняется
+    сообщениями канала инвалидации сразу после отзыва и периодически
+    синхронизируется с таблицей revoked_tokens.
+
+    Синхронизация перечитывает записи, созданные за REVOCATION_SYNC_OVERLAP
+    секунд до предыдущей синхронизации: запись получает creating_date при
+    вставке, а становится видна только после фиксации транзакции запроса.
+    Раз в STATELESS_ACCESS_TOKEN_LIFETIME список загружается полностью.
+
+    Attributes:
+        model: Модель RevokedTokenModel
+        field_id: Поле "id" как первичный ключ
+        lock: Блокировка для потокобезопасной работы
+        revoked: Отозванные jti и моменты их истечения (unix time)
+        revoked_synced_at: Время начала последней синхронизации (None - до первой)
+        revoked_ready: Список загружен из базы данных хотя бы один раз
+        revoked_pruned_at: Время последней полной загрузки и удаления истекших записей (monotonic)
+    """
+    model = RevokedTokenModel
+    field_id = "id"
+    lock: Lock = Lock()
+
+    revoked: Dict[str, float] = {}
+    revoked_synced_at: Optional[datetime.datetime] = None
+    revoked_ready: bool = False
+    revoked_pruned_at: float = 0.0
+
+    @staticmethod
+    def is_revoked(jti: str) -> bool:
+        """
+        Проверяет, отозван ли токен, без обращения к базе данных.
+
+        Args:
+            jti: Идентификатор токена
+
+        Returns:
+            True, если токен отозван
+        """
+        return jti in RevokedTokenTool.revoked
+
+    @staticmethod
+    async def revoke(jtis: Iterable[str]) -> None:
+        """
+        Отзывает токены по jti во всех воркерах.
+
+        Запись хранится, пока токен с таким jti мог бы оставаться действительным
+        (STATELESS_ACCESS_TOKEN_LIFETIME). Вне режима AUTH_STATELESS_MODE
+        токены проверяются по таблице sessions и отзыв не выполняется.
+
+        Args:
+            jtis: Идентификаторы отзываемых токенов
+        """
+        if not AUTH_STATELESS_MODE:
+            return
+
+        jtis = [jti for jti in set(jtis) if jti and not RevokedTokenTool.is_revoked(jti)]
+        if not jtis:
+            return
+
+        # Токен мог быть отозван другим воркером или параллельным запросом, такие jti пропускаются
+        expires_at = datetime.datetime.now() + datetime.timedelta(seconds=STATELESS_ACCESS_TOKEN_LIFETIME)
+        await RevokedTokenTool.upsert_many(data=[dict(jti=jti, expires_at=expires_at) for jti in jtis], index_elements=["jti"], update_existing=False)
+        on_commit(lambda: invalidation_channel.publish(topic="revoked_tokens", action="add", jtis=jtis, expires_at=expires_at.timestamp()))
+
+    @staticmethod
+    def handle_invalidation(message: Dict[str, Any]) -> None:
+        """
+        Добавляет отозванные токены из сообщения канала инвалидации.
+
+        Args:
+            message: Сообщение с действием "add"
+        """
+        if message.get("action") == "add":
+            for jti in message["jtis"]:
+                RevokedTokenTool.revoked[jti] = message["expires_at"]
+
+    @staticmethod
+    async def sync() -> None:
+        """
+        Загружает новые записи revoked_tokens и удаляет истекшие записи из памяти.
+
+        Загружаются записи, созданные не раньше REVOCATION_SYNC_OVERLAP секунд до
+        предыдущей синхронизации, поэтому отзыв, зафиксированный позже записей
+        с большим id, не пропускается. Раз в STATELESS_ACCESS_TOKEN_LIFETIME
+        список загружается полностью и истекшие записи удаляются из базы данных.
+        """
+        now = datetime.datetime.now()
+        full_reload = RevokedTokenTool.revoked_synced_at is None or time.monotonic() - RevokedTokenTool.revoked_pruned_at >= STATELESS_ACCESS_TOKEN_LIFETIME
+        filters = [RevokedTokenModel.expires_at > now]
+        if not full_reload:
+            filters.append(RevokedTokenModel.creating_date >= RevokedTokenTool.revoked_synced_at - datetime.timedelta(seconds=REVOCATION_SYNC_OVERLAP))
+        dbRevokedTokens: list[RevokedTokenModel] = await RevokedTokenTool.get_all_with_filters(filters=filters)
+        for dbRevokedToken in dbRevokedTokens:
+            RevokedTokenTool.revoked[dbRevokedToken.jti] = dbRevokedToken.expires_at.timestamp()
+        RevokedTokenTool.revoked_synced_at = now
+
+        now_timestamp = now.timestamp()
+        for jti, expires_at in list(RevokedTokenTool.revoked.items()):
+            if expires_at <= now_timestamp:
+                del RevokedTokenTool.revoked[jti]
+
+        if full_reload:
+            await RevokedTokenTool.delete_with_filters(filters=[RevokedTokenModel.expires_at <= now])
+            RevokedTokenTool.revoked_pruned_at = time.monotonic()
+
+        RevokedTokenTool.revoked_ready = True
+
+    @staticmethod
+    async def run_sync_loop(interval: float) -> None:
+        """
+        Периодически синхронизирует список отозванных токенов.
+
+        Args:
+            interval: Интервал синхронизации (секунды)
+        """
+        while True:
+            try:
+                await RevokedTokenTool.sync()
+            except Exception as ex_:
+                await handle_async(function_category="database", function=f"{RevokedTokenTool.model.__tablename__}  sync", exception=ex_)
+            await asyncio.sleep(interval)
+
+
+invalidation_channel.subscribe("revoked_tokens", RevokedTokenTool.handle_invalidation)
@@ -5,7 +5,12 @@
 """
 from database.basic_tools import AsyncBaseIdSQLAlchemyCRUD
 from database.models.role_rules import RoleRuleModel
+from configuration.settings import ROLE_RULES_CACHE_TTL
+from utils.cache.channels import invalidation_channel
+from database.unit_of_work import on_commit
+from typing import Any, Dict, FrozenSet
 from asyncio import Lock
+import time
 
 
 class RoleRuleTool(AsyncBaseIdSQLAlchemyCRUD):
@@ -19,11 +24,19 @@ class RoleRuleTool(AsyncBaseIdSQLAlchemyCRUD):
         model: Модель RoleRuleModel
         field_id: Поле "id" как первичный ключ
         lock: Блокировка для потокобезопасной работы
+        rules_index: Индекс роль -> множество прав в памяти воркера
+        rules_index_version: Версия индекса, увеличивается при каждой инвалидации
+        rules_index_expires_at: Момент (time.monotonic), после которого индекс перечитывается
     """
     model = RoleRuleModel
     field_id = "id"
     lock: Lock = Lock()
 
+    rules_index: Dict[str, FrozenSet[str]] = None
+    rules_index_version: int = 0
+    rules_index_expires_at: float = 0.0
+    rules_index_lock: Lock = Lock()
+
     @staticmethod
     async def get_by_role_name_and_rule_name(role_name: str, rule_name: str) -> RoleRuleModel:
         """
@@ -44,3 +57,73 @@ class RoleRuleTool(AsyncBaseIdSQLAlchemyCRUD):
             return None
         return dbRoleRules[0]
 
+    @classmethod
+    def invalidate_rules_index(cls) -> None:
+        """
+        Сбрасывает индекс роль -> права во всех воркерах.
+        
+        Вызывается после любых изменений ролей, правил и связей между ними.
+        Публикует сообщение в канал инвалидации.
+        """
+        on_commit(lambda: invalidation_channel.publish(topic="role_rules", action="clear"))
+
+    @classmethod
+    def reset_rules_index(cls, message: Dict[str, Any] = None) -> None:
+        """
+        Сбрасывает индекс роль -> права в текущем воркере.
+        
+        Увеличение версии не дает загрузке, начатой до сброса,
+        сохранить устаревшие данные.
+        
+        Args:
+            message: Сообщение канала инвалидации
+        """
+        cls.rules_index_version += 1
+        cls.rules_index = None
+        cls.rules_index_expires_at = 0.0
+
+    @classmethod
+    async def get_rules_index(cls) -> Dict[str, FrozenSet[str]]:
+        """
+        Возвращает индекс роль -> множество прав.
+        
+        Индекс хранится в памяти воркера и перечитывается из базы данных
+        только после инвалидации или по истечении ROLE_RULES_CACHE_TTL.
+        
+        Returns:
+            Словарь, где ключ - имя роли, значение - frozenset имен прав
+        """
+        if cls.rules_index is not None and time.monotonic() < cls.rules_index_expires_at:
+            return cls.rules_index
+
+        async with cls.rules_index_lock:
+            # Индекс мог быть загружен, пока ожидали блокировку
+            if cls.rules_index is not None and time.monotonic() < cls.rules_index_expires_at:
+                return cls.rules_index
+
+            version = cls.rules_index_version
+            grouped: Dict[str, set] = {}
+            for dbRoleRule in await cls.get_all():
+                grouped.setdefault(dbRoleRule.role_name, set()).add(dbRoleRule.rule_name)
+            rules_index = {role_name: frozenset(rule_names) for role_name, rule_names in grouped.items()}
+
+            if version == cls.rules_index_version:
+                cls.rules_index = rules_index
+                cls.rules_index_expires_at = time.monotonic() + ROLE_RULES_CACHE_TTL
+            return rules_index
+
+    @classmethod
+    async def get_rules_by_role_name(cls, role_name: str) -> FrozenSet[str]:
+        """
+        Получает множество прав роли из индекса в памяти.
+        
+        Args:
+            role_name: Имя роли
+            
+        Returns:
+            frozenset имен прав роли (пустой, если роль не найдена)
+        """
+        return (await cls.get_rules_index()).get(role_name, frozenset())
+
+
+invalidation_channel.subscribe("role_rules", RoleRuleTool.reset_rules_index)
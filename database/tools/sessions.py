@@ -5,7 +5,56 @@
 """
 from database.basic_tools import AsyncBaseIdSQLAlchemyCRUD
 from database.models.sessions import SessionModel
+from database.models.users import UserModel
+from database.tools.revoked_tokens import RevokedTokenTool
+from database.session_stores import SessionStore, create_session_store
+from utils.exception_handler.handler import handle_async
+from utils.cache import LRUTTLCache, MISSING
+from utils.cache.channels import invalidation_channel
+from database.unit_of_work import on_commit
+from configuration.settings import SESSION_CACHE_MAX_SIZE, SESSION_CACHE_TTL, SESSION_CACHE_NEGATIVE_TTL, ACCESS_TOKEN_LIFETIME, SESSION_STORE, SESSION_STORE_URL
+from utils.loggers import logger
+from typing import Any, AsyncIterator, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
 from asyncio import Lock
+from jose import jwt
+import asyncio
+import datetime
+import hashlib
+import time
+
+
+class SessionIdentity(NamedTuple):
+    """
+    Неизменяемые данные проверенной сессии, которые хранятся в кеше проверки.
+
+    В кеше не хранятся объекты SessionModel и UserModel: они привязаны к
+    сессии базы данных другого запроса и устаревают при изменении пользователя.
+    is_active и expires_at проверяет resolve_auth_context при каждом запросе,
+    role и rules определяют права доступа.
+
+    Attributes:
+        user_id: Идентификатор пользователя
+        role: Роль пользователя
+        is_active: Активен ли пользователь
+        expires_at: Дата окончания сессии
+        rules: Права роли пользователя
+    """
+    user_id: int
+    role: str
+    is_active: bool
+    expires_at: datetime.datetime
+    rules: FrozenSet[str]
+
+    @classmethod
+    def from_models(cls, dbSession: SessionModel, dbUser: UserModel, rules: FrozenSet[str]) -> "SessionIdentity":
+        """Формирует данные сессии из загруженных моделей."""
+        return cls(
+            user_id=dbUser.id,
+            role=dbUser.role,
+            is_active=dbUser.is_active,
+            expires_at=dbSession.expires_at,
+            rules=rules
+        )
 
 
 class SessionTool(AsyncBaseIdSQLAlchemyCRUD):
@@ -13,16 +62,118 @@ class SessionTool(AsyncBaseIdSQLAlchemyCRUD):
     Класс для управления сессиями пользователей.
     
     Предоставляет методы для создания, поиска и удаления сессий
-    на основе пользователя и access_token.
+    на основе пользователя и access_token. Сессии хранятся в хранилище
+    store (см. database.session_stores), выбранном настройкой SESSION_STORE.
     
     Attributes:
         model: Модель SessionModel
         field_id: Поле "id" как первичный ключ
         lock: Блокировка для потокобезопасной работы
+        store: Хранилище сессий
+        validation_cache: Кеш результатов проверки сессий (SessionIdentity) по хешу токена, тег - str(user_id)
+        validation_cache_generation: Счетчик инвалидаций кеша
+    
+    Note:
+        Удаление сессий и изменения пользователей (тема "users", см. UserTool)
+        публикуются в канал инвалидации, чтобы кеш сбрасывался во всех
+        воркерах, а jti удаленных сессий отзываются для режима AUTH_STATELESS_MODE.
+        При нескольких воркерах нужен межпроцессный канал (INVALIDATION_CHANNEL).
     """
     model = SessionModel
     field_id = "id"
     lock: Lock = Lock()
+    store: SessionStore = None
+
+    validation_cache: LRUTTLCache = LRUTTLCache(max_size=SESSION_CACHE_MAX_SIZE, ttl=SESSION_CACHE_TTL)
+    validation_cache_generation: int = 0
+
+    @staticmethod
+    def hash_access_token(access_token: str) -> bytes:
+        """
+        Вычисляет хеш токена, который хранится в sessions.access_token_hash.
+        
+        Args:
+            access_token: JWT токен
+            
+        Returns:
+            SHA-256 хеш токена (32 байта)
+        """
+        return hashlib.sha256(access_token.encode()).digest()
+
+    @staticmethod
+    def get_token_digest(access_token: str) -> str:
+        """
+        Вычисляет ключ кеша для токена.
+        
+        Args:
+            access_token: JWT токен
+            
+        Returns:
+            SHA-256 хеш токена в шестнадцатеричном виде
+        """
+        return SessionTool.hash_access_token(access_token).hex()
+
+    @staticmethod
+    def handle_invalidation(message: Dict[str, Any]) -> None:
+        """
+        Применяет сообщение канала инвалидации к кешу проверки сессий.
+        
+        Args:
+            message: Сообщение с действием "invalidate_tokens", "invalidate_user",
+                     "invalidate_users" или "clear"
+        """
+        SessionTool.validation_cache_generation += 1
+        action = message.get("action")
+        if action == "invalidate_tokens":
+            for digest in message["digests"]:
+                SessionTool.validation_cache.delete(digest)
+        elif action == "invalidate_user":
+            SessionTool.validation_cache.delete_tag(str(message["user_id"]))
+        elif action == "invalidate_users":
+            for user_id in message["user_ids"]:
+                SessionTool.validation_cache.delete_tag(str(user_id))
+        else:
+            SessionTool.validation_cache.clear()
+
+    @staticmethod
+    async def create_by_user_id_and_access_token(user_id: int, access_token: str) -> SessionModel:
+        """
+        Создает сессию для выданного токена.
+        
+        Args:
+            user_id: Идентификатор пользователя
+            access_token: JWT токен
+            
+        Returns:
+            Созданная сессия
+        """
+        return await SessionTool.store.create(
+            user_id=user_id,
+            access_token_hash=SessionTool.hash_access_token(access_token),
+            jti=jwt.get_unverified_claims(access_token).get("jti"),
+            expires_at=datetime.datetime.now() + datetime.timedelta(seconds=ACCESS_TOKEN_LIFETIME)
+        )
+
+    @staticmethod
+    async def rotate_access_token(dbSession: SessionModel, old_access_token: str, new_access_token: str) -> None:
+        """
+        Заменяет токен сессии на новый и отзывает старый.
+        
+        Используется эндпоинтом обновления токена.
+        
+        Args:
+            dbSession: Сессия, найденная по старому токену
+            old_access_token: Старый JWT токен
+            new_access_token: Новый JWT токен
+        """
+        await SessionTool.store.replace_token(
+            dbSession=dbSession,
+            old_access_token_hash=SessionTool.hash_access_token(old_access_token),
+            new_access_token_hash=SessionTool.hash_access_token(new_access_token),
+            jti=jwt.get_unverified_claims(new_access_token).get("jti")
+        )
+        on_commit(lambda: invalidation_channel.publish(topic="sessions", action="invalidate_tokens", digests=[SessionTool.get_token_digest(old_access_token)]))
+        await RevokedTokenTool.revoke(jtis=[dbSession.jti])
 
     @staticmethod
     async def get_by_user_id_and_access_token(user_id: int, access_token: str) -> SessionModel:
@@ -36,10 +187,58 @@ class SessionTool(AsyncBaseIdSQLAlchemyCRUD):
         Returns:
             Объект сессии или None если не найдена
         """
-        dbSessions: list[SessionModel] = await SessionTool.get_all_with_filters(filters=[SessionModel.user_id == user_id, SessionModel.access_token == access_token])
-        if len(dbSessions) == 0:
+        return await SessionTool.store.get(user_id=user_id, access_token_hash=SessionTool.hash_access_token(access_token))
+
+    @staticmethod
+    async def get_session_identity(user_id: int, access_token: str) -> Tuple[Optional[SessionIdentity], Optional[UserModel]]:
+        """
+        Получает данные сессии, пользователя и права его роли с использованием кеша.
+        
+        Кеширует как найденные сессии, так и их отсутствие (на SESSION_CACHE_NEGATIVE_TTL).
+        Найденная сессия хранится в кеше не дольше SESSION_CACHE_TTL и не дольше
+        срока ее действия. Результат, загруженный во время инвалидации, в кеш не сохраняется.
+        При промахе кеша вместе с данными сессии возвращается пользователь,
+        загруженный тем же запросом, в кеш попадают только данные сессии.
+        
+        Args:
+            user_id: Идентификатор пользователя
+            access_token: JWT токен
+            
+        Returns:
+            Кортеж (данные сессии или None если сессия не найдена, пользователь или None при попадании в кеш)
+        """
+        digest = SessionTool.get_token_digest(access_token)
+        cached = SessionTool.validation_cache.get(digest)
+        if cached is not MISSING:
+            return cached, None
+
+        generation = SessionTool.validation_cache_generation
+        result = await SessionTool.fetch_session_identity(user_id=user_id, access_token=access_token)
+        identity, dbUser = result if result is not None else (None, None)
+        if generation == SessionTool.validation_cache_generation:
+            if identity is None:
+                ttl = SESSION_CACHE_NEGATIVE_TTL
+            else:
+                ttl = min(SESSION_CACHE_TTL, max((identity.expires_at - datetime.datetime.now()).total_seconds(), 0.0))
+            SessionTool.validation_cache.set(digest, identity, ttl=ttl, tag=str(user_id))
+        return identity, dbUser
+
+    @staticmethod
+    async def fetch_session_identity(user_id: int, access_token: str) -> Optional[Tuple[SessionIdentity, UserModel]]:
+        """
+        Получает данные сессии, пользователя и права его роли из хранилища без кеша.
+        
+        Args:
+            user_id: Идентификатор пользователя
+            access_token: JWT токен
+            
+        Returns:
+            Кортеж (данные сессии, пользователь) или None если сессия не найдена
+        """
+        result = await SessionTool.store.get_with_user_and_rules(user_id=user_id, access_token_hash=SessionTool.hash_access_token(access_token))
+        if result is None:
             return None
-        return dbSessions[0]
+        return SessionIdentity.from_models(*result), result[1]
 
     @staticmethod
     async def delete_by_user_id_and_access_token(user_id: int, access_token: str):
@@ -52,7 +251,9 @@ class SessionTool(AsyncBaseIdSQLAlchemyCRUD):
             user_id: Идентификатор пользователя
             access_token: JWT токен для удаления
         """
-        await SessionTool.delete_with_filters(filters=[SessionModel.user_id == user_id, SessionModel.access_token == access_token])
+        jtis = await SessionTool.store.delete(user_id=user_id, access_token_hash=SessionTool.hash_access_token(access_token))
+        await RevokedTokenTool.revoke(jtis=jtis)
+        on_commit(lambda: invalidation_channel.publish(topic="sessions", action="invalidate_tokens", digests=[SessionTool.get_token_digest(access_token)]))
 
     @staticmethod
     async def delete_all_instead_of_current_user_id_and_access_token(user_id: int, access_token: str):
@@ -66,7 +267,9 @@ class SessionTool(AsyncBaseIdSQLAlchemyCRUD):
             user_id: Идентификатор пользователя
             access_token: Токен, который нужно оставить активным
         """
-        await SessionTool.delete_with_filters(filters=[SessionModel.user_id == user_id, SessionModel.access_token != access_token])
+        jtis = await SessionTool.store.delete_all(user_id=user_id, except_access_token_hash=SessionTool.hash_access_token(access_token))
+        await RevokedTokenTool.revoke(jtis=jtis)
+        on_commit(lambda: invalidation_channel.publish(topic="sessions", action="invalidate_user", user_id=user_id))
     
     @staticmethod
     async def delete_all_by_user_id(user_id: int):
@@ -79,4 +282,80 @@ class SessionTool(AsyncBaseIdSQLAlchemyCRUD):
         Args:
             user_id: Идентификатор пользователя
         """
-        await SessionTool.delete_with_filters(filters=[SessionModel.user_id == user_id])
\ No newline at end of file
+        jtis = await SessionTool.store.delete_all(user_id=user_id)
+        await RevokedTokenTool.revoke(jtis=jtis)
+        on_commit(lambda: invalidation_channel.publish(topic="sessions", action="invalidate_user", user_id=user_id))
+
+    @staticmethod
+    async def iter_sessions(batch_size: int = 1000) -> AsyncIterator[SessionModel]:
+        """
+        Последовательно возвращает действующие сессии из хранилища SESSION_STORE.
+        
+        В отличие от iter_all (таблица sessions) работает с любым хранилищем.
+        
+        Args:
+            batch_size: Количество сессий, получаемых из хранилища за один раз
+            
+        Returns:
+            AsyncIterator[SessionModel]: Асинхронный итератор сессий
+        """
+        async for dbSession in SessionTool.store.iter_all(batch_size=batch_size):
+            yield dbSession
+
+    @staticmethod
+    async def reap_expired() -> Tuple[List[str], float]:
+        """
+        Удаляет истекшие сессии средствами хранилища.
+        
+        Для таблицы sessions удаляет секции с истекшими сессиями (новые секции
+        создает run_storage_loop), key-value хранилище удаляет истекшие сессии само.
+        Кеш проверки сессий не сбрасывается: токены истекших сессий уже
+        не проходят проверку срока действия JWT.
+        
+        Returns:
+            Кортеж (описание удаленных данных, затраченное время в секундах)
+        """
+        started_at = time.perf_counter()
+        removed = await SessionTool.store.reap_expired()
+        return removed, time.perf_counter() - started_at
+
+    @staticmethod
+    async def run_reaper_loop(interval: float) -> None:
+        """
+        Периодически удаляет истекшие сессии.
+        
+        Args:
+            interval: Интервал запуска (секунды)
+        """
+        while True:
+            try:
+                removed, elapsed = await SessionTool.reap_expired()
+                if removed:
+                    logger.info(f"Session reaper removed {', '.join(removed)} in {elapsed:.3f}s")
+            except Exception as ex_:
+                await handle_async(function_category="database", function=f"{SessionTool.model.__tablename__}  reap_expired", exception=ex_)
+            await asyncio.sleep(interval)
+
+    @staticmethod
+    async def run_storage_loop(interval: float) -> None:
+        """
+        Периодически подготавливает хранилище для новых сессий (создает секции sessions наперед).
+        
+        Args:
+            interval: Интервал запуска (секунды)
+        """
+        while True:
+            try:
+                await SessionTool.store.prepare_storage()
+            except Exception as ex_:
+                await handle_async(function_category="database", function=f"{SessionTool.model.__tablename__}  prepare_storage", exception=ex_)
+            await asyncio.sleep(interval)
+
+
+SessionTool.store = create_session_store(SESSION_STORE, tool=SessionTool, url=SESSION_STORE_URL)
+
+invalidation_channel.subscribe("sessions", SessionTool.handle_invalidation)
+# Кешированные результаты содержат права роли, поэтому изменение прав сбрасывает кеш
+invalidation_channel.subscribe("role_rules", SessionTool.handle_invalidation)
+# Кешированные результаты содержат роль и статус пользователя
+invalidation_channel.subscribe("users", SessionTool.handle_invalidation)
@@ -9,8 +9,12 @@ from asyncio import Lock
 import random
 import string
 import hashlib
-import bcrypt
 from utils.exception_handler.handler import handle_async
+from utils.cache.channels import invalidation_channel
+from database.unit_of_work import on_commit, release_idle_connection, standalone
+from typing import Any, Dict, Iterable, List, Optional
+from utils.password_hashing import password_hashing_pool, bcrypt_hash, bcrypt_check
+from configuration.settings import PASSWORD_HASHING_ROUNDS
 
 
 class UserTool(AsyncBaseIdSQLAlchemyCRUD):
@@ -27,11 +31,63 @@ class UserTool(AsyncBaseIdSQLAlchemyCRUD):
     
     Note:
         Поддерживает миграцию паролей с SHA-256 на bcrypt для обратной совместимости.
+        Изменение и удаление пользователей публикуется в канал инвалидации
+        (тема "users"), чтобы кеш проверки сессий не возвращал устаревшие
+        роль и статус пользователя.
     """
     model = UserModel
     field_id = "id"
     lock: Lock = Lock()
 
+    @staticmethod
+    def invalidate_users(user_ids: Optional[Iterable[Any]] = None) -> None:
+        """
+        Сбрасывает кеши данных пользователей во всех воркерах после фиксации транзакции.
+        
+        Args:
+            user_ids: Идентификаторы измененных пользователей (None - изменены неизвестные пользователи, кеши сбрасываются целиком)
+        """
+        if user_ids is None:
+            on_commit(lambda: invalidation_channel.publish(topic="users", action="clear"))
+            return
+        user_ids = [str(user_id) for user_id in user_ids]
+        if user_ids:
+            on_commit(lambda: invalidation_channel.publish(topic="users", action="invalidate_users", user_ids=user_ids))
+
+    async def update(self, data: Dict[str, Any]) -> Any:
+        result = await super().update(data=data)
+        UserTool.invalidate_users([self.custom_id])
+        return result
+
+    async def delete(self) -> Any:
+        result = await super().delete()
+        UserTool.invalidate_users([self.custom_id])
+        return result
+
+    @classmethod
+    async def update_many(cls, data: List[Dict[str, Any]], chunk_size: Optional[int] = None) -> int:
+        result = await super().update_many(data=data, chunk_size=chunk_size)
+        cls.invalidate_users(row[cls.field_id] for row in data)
+        return result
+
+    @classmethod
+    async def upsert_many(cls, data: List[Dict[str, Any]], chunk_size: Optional[int] = None, index_elements: Optional[List[str]] = None, update_existing: bool = True) -> List[UserModel]:
+        result = await super().upsert_many(data=data, chunk_size=chunk_size, index_elements=index_elements, update_existing=update_existing)
+        cls.invalidate_users(dbUser.id for dbUser in result)
+        return result
+
+    @classmethod
+    async def update_with_filters(cls, data: Dict[str, Any], filters: Optional[List[Any]] = None) -> Any:
+        result = await super().update_with_filters(data=data, filters=filters)
+        cls.invalidate_users()
+        return result
+
+    @classmethod
+    async def delete_with_filters(cls, filters: Optional[List[Any]] = None) -> Any:
+        result = await super().delete_with_filters(filters=filters)
+        cls.invalidate_users()
+        return result
+
     @staticmethod
     async def get_by_email(email: str) -> UserModel:
         """
@@ -53,25 +109,23 @@ class UserTool(AsyncBaseIdSQLAlchemyCRUD):
         """
         Хеширует пароль с использованием bcrypt и секретного ключа
         
+        Блокирует вызывающий поток, в async коде используйте hash_password_async.
+        
         Args:
             password: Пароль для хеширования
             
         Returns:
             str: Хешированный пароль
         """
-        
-        # Генерируем соль и хешируем пароль
-        salt = bcrypt.gensalt(rounds=12)  # Настройка сложности (12 раундов)
-        hashed = bcrypt.hashpw(password.encode(), salt)
-        
-        # Возвращаем хеш в виде строки
-        return hashed.decode('utf-8')
+        return bcrypt_hash(password, PASSWORD_HASHING_ROUNDS)
 
     @staticmethod
     def check_password(provided_password: str, stored_password: str) -> bool:
         """
         Проверяет пароль по хешу
         
+        Блокирует вызывающий поток, в async коде используйте check_password_async.
+        
         Args:
             provided_password: Предоставленный пароль
             stored_password: Хешированный пароль из базы данных
@@ -79,19 +133,55 @@ class UserTool(AsyncBaseIdSQLAlchemyCRUD):
         Returns:
             bool: True, если пароль верный
         """
+        return bcrypt_check(provided_password, stored_password)
+
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """
+        Хеширует пароль с использованием bcrypt в пуле хеширования, не блокируя event loop
         
-        # Проверяем пароль
-        try:
-            return bcrypt.checkpw(provided_password.encode(), stored_password.encode())
-        except Exception as ex_:
-            # Обработка ошибок (например, неверный формат хеша)
-            return False
+        На время хеширования подключение unit of work без записи возвращается в пул.
+        
+        Args:
+            password: Пароль для хеширования
+            
+        Returns:
+            str: Хешированный пароль
+            
+        Raises:
+            HashingQueueFullError: Если очередь пула хеширования заполнена
+        """
+        await release_idle_connection()
+        return await password_hashing_pool.hash_password(password)
+
+    @staticmethod
+    async def check_password_async(provided_password: str, stored_password: str) -> bool:
+        """
+        Проверяет пароль по хешу в пуле хеширования, не блокируя event loop
+        
+        На время проверки подключение unit of work без записи возвращается в пул.
+        
+        Args:
+            provided_password: Предоставленный пароль
+            stored_password: Хешированный пароль из базы данных
+            
+        Returns:
+            bool: True, если пароль верный
+            
+        Raises:
+            HashingQueueFullError: Если очередь пула хеширования заполнена
+        """
+        await release_idle_connection()
+        return await password_hashing_pool.check_password(provided_password, stored_password)
 
     @staticmethod
     async def migrate_password_if_needed(user_id: int, password: str) -> None:
         """
         Проверяет, нужно ли мигрировать пароль на новую систему хеширования
         
+        Новый хеш сохраняется вне unit of work запроса (standalone) и не
+        откатывается, если запрос завершится ошибкой.
+        
         Args:
             user_id: ID пользователя
             password: Пароль в открытом виде
@@ -105,14 +195,19 @@ class UserTool(AsyncBaseIdSQLAlchemyCRUD):
         # SHA-256 хеш имеет длину 64 символа и состоит только из шестнадцатеричных символов
         if len(user.password) == 64 and all(c in '0123456789abcdef' for c in user.password.lower()):
             # Это старый хеш, нужно мигрировать на bcrypt
-            new_hash = UserTool.hash_password(password)
-            await UserTool(user_id).update(data={"password": new_hash})
+            new_hash = await UserTool.hash_password_async(password)
+            async with standalone():
+                await UserTool(user_id).update(data={"password": new_hash})
             
     @classmethod
     async def verify_and_migrate_password(cls, user: UserModel, provided_password: str) -> bool:
         """
         Проверяет пароль и при необходимости мигрирует его на новую систему хеширования
         
+        Миграция сохраняется вне unit of work запроса (standalone): вход может
+        завершиться ответом 401 (например, неактивный пользователь), откат
+        которого не должен отменять перехеширование пароля.
+        
         Args:
             user: Модель пользователя
             provided_password: Предоставленный пароль
@@ -126,10 +221,11 @@ class UserTool(AsyncBaseIdSQLAlchemyCRUD):
             old_hash = hashlib.sha256(provided_password.encode()).hexdigest()
             if old_hash == user.password:
                 # Пароль верный, мигрируем на новую систему
-                new_hash = cls.hash_password(provided_password)
-                await UserTool(user.id).update(data={"password": new_hash})
+                new_hash = await cls.hash_password_async(provided_password)
+                async with standalone():
+                    await UserTool(user.id).update(data={"password": new_hash})
                 return True
             return False
         else:
             # Проверяем по новой системе
-            return cls.check_password(provided_password, user.password)
+            return await cls.check_password_async(provided_password, user.password)
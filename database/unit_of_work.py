@@ -0,0 +1,218 @@
+"""
+Модуль unit of work для базы данных.
+
+Unit of work - одна сессия SQLAlchemy (одно подключение и одна транзакция),
+которую все методы репозиториев используют внутри контекста unit_of_work.
+Вне контекста каждый метод, как и раньше, открывает собственную сессию и
+сразу фиксирует изменения.
+
+Если настроена реплика для чтения (DATABASE_READ_URL), методы чтения
+репозиториев используют read_session_scope: чтение выполняется с реплики до
+первой записи в unit of work (или в текущем контексте вне unit of work),
+после записи - с основной базы данных, чтобы видеть собственные изменения.
+
+Example:
+    async with unit_of_work():
+        dbUser = await UserTool.get_by_email(email)
+        await UserTool(dbUser.id).update(data=dict(is_active=False))
+"""
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.base import AsyncSessionLocal, AsyncReadSessionLocal
+
+
+# Сессия текущего unit of work (None - вне unit of work)
+current_session: ContextVar[Optional[AsyncSession]] = ContextVar("current_session", default=None)
+
+# Чтение с основной базы данных вне unit of work (после записи в текущем контексте или use_primary)
+primary_pinned: ContextVar[bool] = ContextVar("primary_pinned", default=False)
+
+
+def in_unit_of_work() -> bool:
+    """Проверяет, выполняется ли код внутри unit of work."""
+    return current_session.get() is not None
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """
+    Возвращает сессию для одной операции репозитория.
+
+    Внутри unit of work возвращает его сессию и не закрывает ее,
+    иначе открывает и закрывает новую сессию.
+    """
+    session = current_session.get()
+    if session is not None:
+        yield session
+        return
+
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def has_read_replica() -> bool:
+    """Проверяет, настроена ли реплика для чтения."""
+    return AsyncReadSessionLocal is not None
+
+
+def is_pinned_to_primary() -> bool:
+    """Проверяет, должны ли чтения в текущем контексте выполняться с основной базы данных."""
+    session = current_session.get()
+    if session is not None and session.info.get("pinned_to_primary"):
+        return True
+    return primary_pinned.get()
+
+
+def pin_to_primary() -> None:
+    """
+    Направляет последующие чтения текущего контекста на основную базу данных.
+
+    Внутри unit of work действует до его завершения, вне unit of work -
+    до конца текущей задачи asyncio (например, обработки запроса).
+    """
+    session = current_session.get()
+    if session is not None:
+        session.info["pinned_to_primary"] = True
+    else:
+        primary_pinned.set(True)
+
+
+@asynccontextmanager
+async def read_session_scope() -> AsyncIterator[AsyncSession]:
+    """
+    Возвращает сессию для операции чтения репозитория.
+
+    Использует реплику, если она настроена и в текущем контексте еще не было
+    записи, иначе работает как session_scope.
+    """
+    if not has_read_replica() or is_pinned_to_primary():
+        async with session_scope() as session:
+            yield session
+        return
+
+    async with AsyncReadSessionLocal() as session:
+        yield session
+
+
+@asynccontextmanager
+async def use_primary() -> AsyncIterator[None]:
+    """Временно направляет чтения на основную базу данных (например, при отставании реплики)."""
+    token = primary_pinned.set(True)
+    try:
+        yield
+    finally:
+        primary_pinned.reset(token)
+
+
+async def commit(session: AsyncSession) -> None:
+    """
+    Фиксирует изменения операции репозитория.
+
+    Внутри unit of work только отправляет изменения в базу данных (flush),
+    транзакция фиксируется при завершении unit of work. Последующие чтения
+    текущего контекста выполняются с основной базы данных (read-your-writes).
+
+    Args:
+        session: Сессия, полученная из session_scope
+    """
+    pin_to_primary()
+    if session.info.get("unit_of_work"):
+        session.info["has_writes"] = True
+        await session.flush()
+    else:
+        await session.commit()
+
+
+def on_commit(callback: Callable[[], None]) -> None:
+    """
+    Выполняет действие после фиксации транзакции.
+
+    Используется для инвалидации кешей: внутри unit of work действие
+    откладывается до commit и отменяется при rollback, вне unit of work
+    выполняется сразу (изменения уже зафиксированы).
+
+    Args:
+        callback: Синхронная функция без аргументов
+    """
+    session = current_session.get()
+    if session is None:
+        callback()
+    else:
+        session.info["after_commit"].append(callback)
+
+
+async def release_idle_connection() -> None:
+    """
+    Возвращает подключение unit of work в пул перед долгой операцией без обращений к базе данных.
+
+    Сессия берет подключение из пула при первом запросе и держит его до конца
+    транзакции. Если в unit of work еще не было записи, транзакция (только
+    чтение) фиксируется и подключение освобождается, следующий запрос возьмет
+    его заново. После записи транзакцию нельзя завершить раньше unit of work,
+    и подключение остается занятым. Вне unit of work ничего не делает.
+    """
+    session = current_session.get()
+    if session is None or session.info.get("has_writes") or not session.in_transaction():
+        return
+    await session.commit()
+
+
+async def commit_unit_of_work(session: AsyncSession) -> None:
+    """Фиксирует транзакцию unit of work и выполняет отложенные действия."""
+    await session.commit()
+    callbacks, session.info["after_commit"] = session.info["after_commit"], []
+    for callback in callbacks:
+        callback()
+
+
+async def rollback_unit_of_work(session: AsyncSession) -> None:
+    """Откатывает транзакцию unit of work и отменяет отложенные действия."""
+    await session.rollback()
+    session.info["after_commit"] = []
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    """
+    Открывает unit of work: все операции репозиториев внутри используют одну сессию.
+
+    При успешном выходе транзакция фиксируется, при исключении откатывается.
+    Вложенный вызов присоединяется к внешнему unit of work. Подключение
+    берется из пула при первом запросе к базе данных, а не при входе.
+    """
+    session = current_session.get()
+    if session is not None:
+        yield session
+        return
+
+    async with AsyncSessionLocal() as session:
+        session.info["unit_of_work"] = True
+        session.info["after_commit"] = []
+        token = current_session.set(session)
+        try:
+            yield session
+        except BaseException:
+            await rollback_unit_of_work(session)
+            raise
+        else:
+            await commit_unit_of_work(session)
+        finally:
+            current_session.reset(token)
+
+
+@asynccontextmanager
+async def standalone() -> AsyncIterator[None]:
+    """
+    Временно выходит из unit of work.
+
+    Операции репозиториев внутри используют собственные сессии и фиксируются
+    сразу, независимо от транзакции текущего запроса (например, запись аудита,
+    которая должна сохраниться даже при откате запроса).
+    """
+    token = current_session.set(None)
+    try:
+        yield
+    finally:
+        current_session.reset(token)
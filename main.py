@@ -1,19 +1,31 @@
 import asyncio
 from database import init_models, fill_database
+from configuration.settings import INVALIDATION_CHANNEL, INVALIDATION_PUBSUB_HOST, INVALIDATION_PUBSUB_PORT, LOG_LEVEL, WEB_API_WORKERS
+from utils.cache.channels import LocalPubSubBroker
+from utils.metrics import registry
 import uvicorn
 
 
 async def main():
+    # Кеши воркеров (сессии, права ролей) сбрасываются только через канал инвалидации
+    if WEB_API_WORKERS > 1 and INVALIDATION_CHANNEL == "in_process":
+        raise RuntimeError("INVALIDATION_CHANNEL=in_process does not reach other workers, use local_pubsub or WEB_API_WORKERS=1")
+
     await init_models()
     await fill_database()
+    registry.clear_worker_snapshots()
+
+    if INVALIDATION_CHANNEL == "local_pubsub":
+        broker = LocalPubSubBroker(host=INVALIDATION_PUBSUB_HOST, port=INVALIDATION_PUBSUB_PORT)
+        await broker.start()
 
     web_api_config = uvicorn.Config(
         app="web_api:app",
-        log_level="debug",
+        log_level=LOG_LEVEL.lower(),
         host="localhost",
         port=8000,
         reload=False,
-        workers=4,
+        workers=WEB_API_WORKERS,
         use_colors=True,
     )
     web_api_server = uvicorn.Server(web_api_config)
@@ -0,0 +1,76 @@
+"""
+Тесты проверки сессии в resolve_auth_context.
+"""
+import asyncio
+import datetime
+from typing import Any, FrozenSet, Optional, Tuple
+import pytest
+from database.models.sessions import SessionModel
+from database.models.users import UserModel
+from database.tools.sessions import SessionTool
+from web_api.dependencies.auth_resolver import resolve_auth_context
+
+
+class FakeStore:
+    """Хранилище сессий с одной сессией пользователя 1."""
+    def __init__(self, is_active: bool = True, expires_in: float = 60):
+        now = datetime.datetime.now()
+        self.session = SessionModel(id=1, user_id=1, creating_date=now, expires_at=now + datetime.timedelta(seconds=expires_in))
+        self.user = UserModel(id=1, email="user@example.com", role="user", is_active=is_active)
+        self.calls = 0
+
+    async def get_with_user_and_rules(self, user_id: int, access_token_hash: bytes) -> Optional[Tuple[SessionModel, UserModel, FrozenSet[str]]]:
+        self.calls += 1
+        return self.session, self.user, frozenset({"user_panel"})
+
+
+def install_store(monkeypatch, store: Any) -> None:
+    monkeypatch.setattr(SessionTool, "store", store)
+    SessionTool.validation_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    yield
+    SessionTool.validation_cache.clear()
+
+
+def resolve() -> Any:
+    return asyncio.run(resolve_auth_context(payload=dict(sub="1"), access_token="token"))
+
+
+def test_active_session_is_accepted(monkeypatch):
+    install_store(monkeypatch, FakeStore())
+
+    auth_context = resolve()
+
+    assert auth_context is not None
+    assert auth_context.rules == frozenset({"user_panel"})
+
+
+def test_inactive_user_is_rejected(monkeypatch):
+    install_store(monkeypatch, FakeStore(is_active=False))
+    assert resolve() is None
+
+
+def test_expired_cached_session_is_rejected(monkeypatch):
+    store = FakeStore(expires_in=0.05)
+    install_store(monkeypatch, store)
+
+    assert resolve() is not None
+    asyncio.run(asyncio.sleep(0.1))
+
+    assert resolve() is None
+
+
+def test_cache_miss_reuses_loaded_user(monkeypatch):
+    store = FakeStore()
+    install_store(monkeypatch, store)
+
+    first, second = resolve(), resolve()
+
+    # Промах кеша: пользователь из запроса проверки сессии, в кеше - только данные сессии
+    assert first.user is store.user
+    assert second.user is None
+    assert store.calls == 1
+    assert not isinstance(SessionTool.validation_cache.get(SessionTool.get_token_digest("token")), UserModel)
@@ -0,0 +1,49 @@
+"""
+Тесты построения запросов репозиториев без базы данных.
+"""
+import asyncio
+from typing import Any, Dict, List
+from sqlalchemy.dialects.postgresql.dml import OnConflictDoNothing, OnConflictDoUpdate
+from database.tools.revoked_tokens import RevokedTokenTool
+
+
+class FakeSession:
+    """Сессия, запоминающая выполненный запрос вместо обращения к базе данных."""
+    def __init__(self):
+        self.info = {}
+        self.query = None
+
+    async def scalars(self, query: Any, data: List[Dict[str, Any]], execution_options: Dict[str, Any]) -> List[Any]:
+        self.query = query
+        return []
+
+    async def commit(self) -> None:
+        return None
+
+
+def run_upsert(data: List[Dict[str, Any]], **kwargs: Any) -> Any:
+    session = FakeSession()
+    asyncio.run(RevokedTokenTool.raw_upsert_many(session=session, data=data, **kwargs))
+    return session.query
+
+
+def test_upsert_with_updatable_fields_keeps_data_order():
+    query = run_upsert([dict(id=1, jti="a")])
+
+    assert isinstance(query._post_values_clause, OnConflictDoUpdate)
+    assert query._sort_by_parameter_order
+
+
+def test_upsert_without_updatable_fields_does_nothing_unsorted():
+    # Только колонки индекса: обновлять нечего, DO NOTHING может пропустить строки
+    query = run_upsert([dict(id=1), dict(id=2)])
+
+    assert isinstance(query._post_values_clause, OnConflictDoNothing)
+    assert not query._sort_by_parameter_order
+
+
+def test_insert_only_does_nothing_unsorted():
+    query = run_upsert([dict(jti="a", expires_at=None)], index_elements=["jti"], update_existing=False)
+
+    assert isinstance(query._post_values_clause, OnConflictDoNothing)
+    assert not query._sort_by_parameter_order
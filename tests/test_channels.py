@@ -0,0 +1,54 @@
+"""
+Тесты канала инвалидации через локальный pub/sub брокер.
+"""
+import asyncio
+import socket
+from utils.cache import channels
+from utils.cache.channels import LocalPubSubBroker, LocalPubSubChannel
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_missing_broker_is_reported_once(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(channels.logger, "warning", warnings.append)
+    channel = LocalPubSubChannel("127.0.0.1", unused_port(), reconnect_delay=0.001, max_reconnect_delay=0.004)
+
+    async def scenario():
+        await channel.start()
+        await asyncio.sleep(0.05)
+        channel.publish("sessions", "clear")
+        channel.publish("sessions", "clear")
+        await channel.stop()
+
+    asyncio.run(scenario())
+
+    assert len(warnings) == 1
+    assert channel.unavailable
+
+
+def test_reconnect_resets_unavailable(monkeypatch):
+    monkeypatch.setattr(channels.logger, "warning", lambda message: None)
+    port = unused_port()
+    channel = LocalPubSubChannel("127.0.0.1", port, reconnect_delay=0.001, max_reconnect_delay=0.004)
+    broker = LocalPubSubBroker("127.0.0.1", port)
+
+    async def scenario():
+        await channel.start()
+        await asyncio.sleep(0.02)
+        assert channel.unavailable
+        await broker.start()
+        for _ in range(100):
+            if channel.writer is not None:
+                break
+            await asyncio.sleep(0.01)
+        await channel.stop()
+        await broker.stop()
+
+    asyncio.run(scenario())
+
+    assert not channel.unavailable
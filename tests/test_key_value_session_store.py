@@ -0,0 +1,133 @@
+"""
+Тесты хранилища сессий в key-value хранилище (InMemoryKeyValueClient).
+"""
+import asyncio
+import datetime
+import pytest
+from database.session_stores import KeyValueSessionStore
+from utils.cache.key_value import InMemoryKeyValueClient
+
+
+def expires_in(seconds: float) -> datetime.datetime:
+    return datetime.datetime.now() + datetime.timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def store():
+    return KeyValueSessionStore(client=InMemoryKeyValueClient())
+
+
+def test_create_and_get(store):
+    async def scenario():
+        created = await store.create(user_id=1, access_token_hash=b"\x01", jti="jti-1", expires_at=expires_in(60))
+        return created, await store.get(1, b"\x01"), await store.get(2, b"\x01")
+
+    created, found, other_user = asyncio.run(scenario())
+
+    assert (found.id, found.user_id, found.jti, found.access_token_hash) == (created.id, 1, "jti-1", b"\x01")
+    assert other_user is None
+
+
+def test_session_expires_with_ttl(store):
+    async def scenario():
+        await store.create(user_id=1, access_token_hash=b"\x01", jti=None, expires_at=expires_in(0.05))
+        before = await store.get(1, b"\x01")
+        await asyncio.sleep(0.1)
+        return before, await store.get(1, b"\x01"), await store.client.smembers(store.user_key(1))
+
+    before, after, digests = asyncio.run(scenario())
+
+    assert before is not None
+    assert after is None
+    # Множество сессий пользователя истекает вместе с последней сессией
+    assert digests == set()
+
+
+def test_delete_removes_session_from_user_set(store):
+    async def scenario():
+        await store.create(user_id=1, access_token_hash=b"\x01", jti="jti-1", expires_at=expires_in(60))
+        await store.create(user_id=1, access_token_hash=b"\x02", jti="jti-2", expires_at=expires_in(60))
+        jtis = await store.delete(1, b"\x01")
+        return jtis, await store.get(1, b"\x01"), await store.client.smembers(store.user_key(1))
+
+    jtis, deleted, digests = asyncio.run(scenario())
+
+    assert jtis == ["jti-1"]
+    assert deleted is None
+    assert digests == {b"\x02".hex()}
+
+
+def test_delete_all_keeps_excepted_session(store):
+    async def scenario():
+        for digest in (b"\x01", b"\x02", b"\x03"):
+            await store.create(user_id=1, access_token_hash=digest, jti=f"jti-{digest.hex()}", expires_at=expires_in(60))
+        await store.create(user_id=2, access_token_hash=b"\x04", jti="jti-04", expires_at=expires_in(60))
+        jtis = await store.delete_all(1, except_access_token_hash=b"\x02")
+        return (
+            jtis,
+            [await store.get(1, digest) is not None for digest in (b"\x01", b"\x02", b"\x03")],
+            await store.client.smembers(store.user_key(1)),
+            await store.get(2, b"\x04") is not None,
+        )
+
+    jtis, alive, digests, other_user_alive = asyncio.run(scenario())
+
+    assert sorted(jtis) == ["jti-01", "jti-03"]
+    assert alive == [False, True, False]
+    assert digests == {b"\x02".hex()}
+    assert other_user_alive
+
+
+def test_delete_all_skips_expired_sessions(store):
+    async def scenario():
+        await store.create(user_id=1, access_token_hash=b"\x01", jti="jti-01", expires_at=expires_in(0.05))
+        await store.create(user_id=1, access_token_hash=b"\x02", jti="jti-02", expires_at=expires_in(60))
+        await asyncio.sleep(0.1)
+        jtis = await store.delete_all(1)
+        return jtis, await store.client.smembers(store.user_key(1))
+
+    assert asyncio.run(scenario()) == (["jti-02"], set())
+
+
+def test_replace_token_keeps_user_set_lifetime(store):
+    async def scenario():
+        first = await store.create(user_id=1, access_token_hash=b"\x01", jti="jti-01", expires_at=expires_in(0.05))
+        await store.create(user_id=1, access_token_hash=b"\x02", jti="jti-02", expires_at=expires_in(60))
+        await store.replace_token(first, b"\x01", b"\x03", "jti-03")
+        replaced = await store.get(1, b"\x03"), await store.get(1, b"\x01")
+        await asyncio.sleep(0.1)
+        return replaced, await store.client.smembers(store.user_key(1))
+
+    (new, old), digests = asyncio.run(scenario())
+
+    assert new.jti == "jti-03" and old is None
+    # Замена токена старой сессии не сокращает время жизни множества более новых сессий
+    assert b"\x02".hex() in digests
+
+
+def test_save_is_not_applied_partially(store, monkeypatch):
+    async def failing_execute(self):
+        raise ConnectionError("connection lost")
+
+    monkeypatch.setattr(type(store.client.pipeline()), "execute", failing_execute)
+
+    async def scenario():
+        with pytest.raises(ConnectionError):
+            await store.create(user_id=1, access_token_hash=b"\x01", jti=None, expires_at=expires_in(60))
+        return await store.get(1, b"\x01"), await store.client.smembers(store.user_key(1))
+
+    assert asyncio.run(scenario()) == (None, set())
+
+
+def test_iter_all_returns_live_sessions_in_batches(store):
+    async def scenario():
+        for index in range(5):
+            await store.create(user_id=index, access_token_hash=bytes([index]), jti=f"jti-{index}", expires_at=expires_in(60))
+        await store.create(user_id=9, access_token_hash=b"\x09", jti="jti-9", expires_at=expires_in(0.05))
+        await asyncio.sleep(0.1)
+        return [dbSession async for dbSession in store.iter_all(batch_size=2)]
+
+    sessions = asyncio.run(scenario())
+
+    assert sorted(dbSession.jti for dbSession in sessions) == [f"jti-{index}" for index in range(5)]
+    assert all(dbSession.access_token_hash == bytes([dbSession.user_id]) for dbSession in sessions)
@@ -0,0 +1,88 @@
+"""
+Тесты постановки записей логов в очередь.
+"""
+import io
+import logging
+import queue
+import sys
+from utils.loggers import BackgroundLogListener, ConsoleHandler, NonBlockingQueueHandler
+
+
+def make_record(msg, args=(), exc_info=None) -> logging.LogRecord:
+    return logging.LogRecord("test", logging.ERROR, __file__, 1, msg, args, exc_info)
+
+
+def test_prepare_merges_args_into_message():
+    items = ["a"]
+    handler = NonBlockingQueueHandler(queue.Queue())
+
+    prepared = handler.prepare(make_record("items: %s", (items,)))
+    items.append("b")
+
+    assert (prepared.msg, prepared.args) == ("items: ['a']", None)
+    assert prepared.getMessage() == "items: ['a']"
+
+
+def test_prepare_renders_exception_text():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = make_record("failed", exc_info=logging.sys.exc_info())
+
+    prepared = NonBlockingQueueHandler(queue.Queue()).prepare(record)
+
+    assert prepared.exc_info is None
+    assert "ValueError: boom" in prepared.exc_text
+    assert "ValueError: boom" in logging.Formatter().format(prepared)
+
+
+def test_prepare_keeps_dict_message():
+    message = dict(status=200)
+    prepared = NonBlockingQueueHandler(queue.Queue()).prepare(make_record(message))
+    assert prepared.msg is message
+
+
+def test_full_queue_drops_and_reports():
+    drops = []
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1), on_drop=lambda: drops.append(1))
+
+    handler.handle(make_record("first"))
+    handler.handle(make_record("second"))
+
+    assert handler.dropped == 1
+    assert drops == [1]
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_restart_after_fork_replaces_locked_queue():
+    records = queue.Queue(maxsize=10)
+    target = ListHandler()
+    listener = BackgroundLogListener(records, [target])
+    handler = NonBlockingQueueHandler(records)
+    # Мьютекс очереди, захваченный потоком родителя в момент fork
+    records.mutex.acquire()
+
+    listener.restart_after_fork(handler)
+    handler.handle(make_record("child"))
+    listener.stop()
+
+    assert handler.queue is listener.queue is not records
+    assert [record.msg for record in target.records] == ["child"]
+
+
+def test_console_handler_uses_current_stderr(monkeypatch):
+    handler = ConsoleHandler()
+    stream = io.StringIO()
+    monkeypatch.setattr(sys, "stderr", stream)
+
+    handler.handle(make_record("console"))
+
+    assert stream.getvalue() == "console\n"
@@ -0,0 +1,59 @@
+"""
+Тесты реестра метрик и агрегации снимков воркеров.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from utils.metrics import MetricsRegistry, registry
+
+
+def write_worker_snapshot(directory: Path, pid: int, snapshot: dict, age: float = 0.0) -> None:
+    path = Path(directory, f"worker_{pid}.json")
+    path.write_text(json.dumps(snapshot), encoding="utf-8")
+    modified_at = time.time() - age
+    os.utime(path, (modified_at, modified_at))
+
+
+def make_registry(directory: Path):
+    metrics = MetricsRegistry(directory=directory, stale_after=15)
+    requests = metrics.counter("requests_total", "Requests.")
+    in_use = metrics.gauge("in_use", "Connections in use.", labelnames=("pool",))
+    metrics.add_collector(lambda: in_use.set(2, pool="primary"))
+    requests.inc()
+    return metrics
+
+
+def test_gauges_are_collected_and_summed_across_live_workers(tmp_path):
+    metrics = make_registry(tmp_path)
+    write_worker_snapshot(tmp_path, 1, {"requests_total": [[[], 3.0]], "in_use": [[["primary"], 5.0]]})
+
+    text = metrics.render(metrics.snapshot())
+
+    assert "# TYPE in_use gauge" in text
+    assert 'in_use{pool="primary"} 7' in text
+    assert "requests_total 4" in text
+
+
+def test_stale_worker_keeps_counters_but_not_gauges(tmp_path):
+    metrics = make_registry(tmp_path)
+    write_worker_snapshot(tmp_path, 1, {"requests_total": [[[], 3.0]], "in_use": [[["primary"], 5.0]]}, age=60)
+
+    text = metrics.render(metrics.snapshot())
+
+    assert 'in_use{pool="primary"} 2' in text
+    assert "requests_total 4" in text
+
+
+def test_final_snapshot_excludes_gauges(tmp_path):
+    snapshot = make_registry(tmp_path).snapshot(include_gauges=False)
+    assert "in_use" not in snapshot and "requests_total" in snapshot
+
+
+def test_pool_state_is_exported():
+    import database.base  # Создает пул primary (и replica)
+
+    snapshot = registry.snapshot()
+
+    assert ["primary"] in [key for key, _ in snapshot["db_pool_size"]]
+    assert "db_pool_checked_out" in snapshot and "db_pool_checkout_wait_seconds" in snapshot
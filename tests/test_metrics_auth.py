@@ -0,0 +1,49 @@
+"""
+Тесты проверки доступа к /metrics.
+"""
+import asyncio
+from typing import List, Optional, Tuple
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+import web_api.dependencies.metrics_auth as metrics_auth
+from web_api.dependencies.metrics_auth import parse_networks, require_metrics_access
+
+
+def make_request(host: str, headers: Optional[List[Tuple[bytes, bytes]]] = None) -> Request:
+    return Request(dict(type="http", method="GET", path="/metrics", headers=headers or [], client=(host, 50000)))
+
+
+def check(request: Request) -> bool:
+    try:
+        asyncio.run(require_metrics_access(request))
+    except HTTPException as ex_:
+        assert ex_.status_code == 403
+        return False
+    return True
+
+
+@pytest.fixture(autouse=True)
+def metrics_access(monkeypatch):
+    monkeypatch.setattr(metrics_auth, "ALLOWED_NETWORKS", parse_networks("127.0.0.1,::1,10.0.0.0/8,invalid"))
+    monkeypatch.setattr(metrics_auth, "METRICS_TOKEN", "secret")
+
+
+def test_allowed_addresses():
+    assert check(make_request("127.0.0.1"))
+    assert check(make_request("::1"))
+    assert check(make_request("10.1.2.3"))
+
+
+def test_other_address_is_forbidden_without_token():
+    assert not check(make_request("192.168.0.1"))
+    assert not check(make_request("192.168.0.1", [(b"authorization", b"Bearer wrong")]))
+
+
+def test_token_allows_any_address():
+    assert check(make_request("192.168.0.1", [(b"authorization", b"Bearer secret")]))
+
+
+def test_empty_token_is_never_accepted(monkeypatch):
+    monkeypatch.setattr(metrics_auth, "METRICS_TOKEN", "")
+    assert not check(make_request("192.168.0.1", [(b"authorization", b"Bearer ")]))
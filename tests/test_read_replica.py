@@ -0,0 +1,147 @@
+"""
+Тесты маршрутизации чтений между репликой и основной базой данных.
+
+Вместо баз данных используются поддельные фабрики сессий: каждая сессия
+запоминает, к какой базе она относится, и отвечает заданными строками.
+"""
+import asyncio
+from typing import Any, List, Optional
+import pytest
+import database.unit_of_work as unit_of_work_module
+from database.session_stores import SQLAlchemySessionStore
+from database.unit_of_work import commit, read_session_scope, session_scope, unit_of_work, use_primary
+
+
+class FakeResult:
+    def __init__(self, rows: List[Any]):
+        self.rows = rows
+
+    def first(self) -> Optional[Any]:
+        return self.rows[0] if self.rows else None
+
+    def all(self) -> List[Any]:
+        return list(self.rows)
+
+
+class FakeSession:
+    def __init__(self, database: "FakeDatabase"):
+        self.database = database
+        self.info = {}
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+    async def execute(self, query: Any) -> FakeResult:
+        self.database.queries += 1
+        return FakeResult(self.database.rows)
+
+    async def flush(self) -> None:
+        return None
+
+    async def commit(self) -> None:
+        return None
+
+    async def rollback(self) -> None:
+        return None
+
+
+class FakeDatabase:
+    """Фабрика сессий одной базы данных (аналог async_sessionmaker)."""
+    def __init__(self, name: str, rows: Optional[List[Any]] = None):
+        self.name = name
+        self.rows = rows or []
+        self.queries = 0
+
+    def __call__(self) -> FakeSession:
+        return FakeSession(self)
+
+
+class FakeTool:
+    count_attemps = 1
+
+
+@pytest.fixture
+def databases(monkeypatch):
+    primary, replica = FakeDatabase("primary"), FakeDatabase("replica")
+    monkeypatch.setattr(unit_of_work_module, "AsyncSessionLocal", primary)
+    monkeypatch.setattr(unit_of_work_module, "AsyncReadSessionLocal", replica)
+    return primary, replica
+
+
+async def read_database_name() -> str:
+    async with read_session_scope() as session:
+        return session.database.name
+
+
+def test_reads_go_to_replica(databases):
+    assert asyncio.run(read_database_name()) == "replica"
+
+
+def test_reads_go_to_primary_without_replica(databases, monkeypatch):
+    monkeypatch.setattr(unit_of_work_module, "AsyncReadSessionLocal", None)
+    assert asyncio.run(read_database_name()) == "primary"
+
+
+def test_use_primary_forces_primary(databases):
+    async def scenario():
+        async with use_primary():
+            inside = await read_database_name()
+        return inside, await read_database_name()
+
+    assert asyncio.run(scenario()) == ("primary", "replica")
+
+
+def test_reads_after_write_are_pinned_to_primary(databases):
+    async def scenario():
+        before = await read_database_name()
+        async with session_scope() as session:
+            await commit(session)
+        return before, await read_database_name()
+
+    assert asyncio.run(scenario()) == ("replica", "primary")
+
+
+def test_reads_after_write_in_unit_of_work_use_its_session(databases):
+    async def scenario():
+        async with unit_of_work() as uow_session:
+            before = await read_database_name()
+            async with session_scope() as session:
+                await commit(session)
+            async with read_session_scope() as session:
+                after = session
+        return before, after is uow_session, await read_database_name()
+
+    # Закрепление за основной базой данных действует только до конца unit of work
+    assert asyncio.run(scenario()) == ("replica", True, "replica")
+
+
+def test_session_lookup_falls_back_to_primary_on_replica_miss(databases):
+    primary, replica = databases
+    row = ("session", "user", ["users:read"])
+    primary.rows = [row]
+
+    result = asyncio.run(SQLAlchemySessionStore(FakeTool).get_with_user_and_rules(1, b"hash"))
+
+    assert result == ("session", "user", frozenset({"users:read"}))
+    assert (replica.queries, primary.queries) == (1, 1)
+
+
+def test_session_lookup_replica_hit_skips_primary(databases):
+    primary, replica = databases
+    replica.rows = [("session", "user", None)]
+
+    result = asyncio.run(SQLAlchemySessionStore(FakeTool).get_with_user_and_rules(1, b"hash"))
+
+    assert result == ("session", "user", frozenset())
+    assert (replica.queries, primary.queries) == (1, 0)
+
+
+def test_session_lookup_miss_without_replica_queries_once(databases, monkeypatch):
+    primary, _ = databases
+    monkeypatch.setattr(unit_of_work_module, "AsyncReadSessionLocal", None)
+
+    assert asyncio.run(SQLAlchemySessionStore(FakeTool).get_with_user_and_rules(1, b"hash")) is None
+    assert primary.queries == 1
@@ -0,0 +1,142 @@
+"""
+Тесты освобождения подключения unit of work и фиксации записей запроса.
+"""
+import asyncio
+import hashlib
+from typing import Any, List
+import pytest
+import database.unit_of_work as unit_of_work_module
+from database.models.users import UserModel
+from database.tools.users import UserTool
+from database.unit_of_work import commit, release_idle_connection, session_scope, unit_of_work
+from web_api.dependencies.unit_of_work import UnitOfWorkMiddleware
+
+
+class FakeSession:
+    """Сессия, которая начинает транзакцию при первом запросе, как AsyncSession."""
+    def __init__(self):
+        self.info = {}
+        self.transaction = False
+        self.commits = 0
+
+    async def __aenter__(self) -> "FakeSession":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+    def in_transaction(self) -> bool:
+        return self.transaction
+
+    async def execute(self, query: Any) -> None:
+        self.transaction = True
+
+    async def flush(self) -> None:
+        self.transaction = True
+
+    async def commit(self) -> None:
+        self.transaction = False
+        self.commits += 1
+
+    async def rollback(self) -> None:
+        self.transaction = False
+
+
+@pytest.fixture(autouse=True)
+def fake_database(monkeypatch):
+    monkeypatch.setattr(unit_of_work_module, "AsyncSessionLocal", FakeSession)
+    monkeypatch.setattr(unit_of_work_module, "AsyncReadSessionLocal", None)
+
+
+def test_read_only_transaction_is_released():
+    async def scenario():
+        async with unit_of_work() as session:
+            async with session_scope() as scoped:
+                await scoped.execute("SELECT 1")
+            await release_idle_connection()
+            return session.in_transaction(), session.commits
+
+    assert asyncio.run(scenario()) == (False, 1)
+
+
+def test_transaction_with_writes_is_kept():
+    async def scenario():
+        async with unit_of_work() as session:
+            async with session_scope() as scoped:
+                await commit(scoped)
+            await release_idle_connection()
+            return session.in_transaction(), session.commits
+
+    assert asyncio.run(scenario()) == (True, 0)
+
+
+def test_release_without_transaction_does_nothing():
+    async def scenario():
+        await release_idle_connection()
+        async with unit_of_work() as session:
+            await release_idle_connection()
+            return session.commits
+
+    assert asyncio.run(scenario()) == 0
+
+
+class RecordingDatabase:
+    """Фабрика сессий, которая сохраняет SQL запросы зафиксированных транзакций."""
+    def __init__(self):
+        self.committed: List[str] = []
+
+    def __call__(self) -> "RecordingSession":
+        return RecordingSession(self)
+
+
+class RecordingSession(FakeSession):
+    def __init__(self, database: RecordingDatabase):
+        super().__init__()
+        self.database = database
+        self.pending: List[str] = []
+
+    async def execute(self, query: Any) -> None:
+        self.transaction = True
+        self.pending.append(str(query))
+
+    async def commit(self) -> None:
+        self.database.committed.extend(self.pending)
+        self.pending = []
+        await super().commit()
+
+    async def rollback(self) -> None:
+        self.pending = []
+        await super().rollback()
+
+
+def test_password_migration_survives_error_response(monkeypatch):
+    database = RecordingDatabase()
+    monkeypatch.setattr(unit_of_work_module, "AsyncSessionLocal", database)
+
+    async def hash_password_async(password: str) -> str:
+        return "bcrypt-hash"
+
+    monkeypatch.setattr(UserTool, "hash_password_async", staticmethod(hash_password_async))
+    monkeypatch.setattr(UserTool, "invalidate_users", classmethod(lambda cls, user_ids=None: None))
+
+    async def sign_in(scope, receive, send):
+        async with session_scope() as session:
+            await session.execute("UPDATE request_write")
+            await commit(session)
+        # Вход неактивного пользователя со старым хешем: пароль верный, ответ 401
+        dbUser = UserModel(id=1, password=hashlib.sha256(b"password").hexdigest(), is_active=False)
+        assert await UserTool.verify_and_migrate_password(dbUser, "password")
+        await send(dict(type="http.response.start", status=401, headers=[]))
+        await send(dict(type="http.response.body", body=b""))
+
+    async def receive():
+        return dict(type="http.request", body=b"", more_body=False)
+
+    async def send(message):
+        return None
+
+    asyncio.run(UnitOfWorkMiddleware(sign_in)(dict(type="http", method="POST", path="/users/sign-in", headers=[]), receive, send))
+
+    # Запись запроса откатывается вместе с ответом 401, миграция хеша пароля сохраняется
+    assert "UPDATE request_write" not in database.committed
+    assert [query for query in database.committed if query.startswith("UPDATE users SET password")]
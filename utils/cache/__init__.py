@@ -0,0 +1,107 @@
+"""
+Модуль кешей в памяти воркера.
+
+Предоставляет LRU кеш с ограничением времени жизни записей и группировкой
+записей по тегам для массовой инвалидации.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set
+import time
+
+
+# Маркер отсутствия записи, позволяет кешировать None как отрицательный результат
+MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    LRU кеш с временем жизни записей.
+
+    При превышении max_size вытесняется запись, к которой дольше всего не обращались.
+    Каждая запись может быть помечена тегом, чтобы удалить все записи тега разом.
+
+    Attributes:
+        max_size: Максимальное количество записей
+        ttl: Время жизни записи по умолчанию (секунды)
+        stats: Счетчики попаданий, промахов и вытеснений
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.tags: Dict[Hashable, Set[Hashable]] = {}
+        self.stats: Dict[str, int] = dict(hits=0, misses=0, evictions=0)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """
+        Получает значение записи.
+
+        Args:
+            key: Ключ записи
+            default: Значение, возвращаемое при отсутствии или истечении записи
+
+        Returns:
+            Значение записи или default
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return default
+
+        value, expires_at, tag = entry
+        if expires_at <= time.monotonic():
+            self.delete(key)
+            self.stats["misses"] += 1
+            return default
+
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, tag: Hashable = None) -> None:
+        """
+        Сохраняет значение записи.
+
+        Args:
+            key: Ключ записи
+            value: Значение (может быть None)
+            ttl: Время жизни записи, по умолчанию self.ttl
+            tag: Тег для массовой инвалидации
+        """
+        if key in self.entries:
+            self.delete(key)
+
+        self.entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), tag)
+        if tag is not None:
+            self.tags.setdefault(tag, set()).add(key)
+
+        while len(self.entries) > self.max_size:
+            oldest_key = next(iter(self.entries))
+            self.delete(oldest_key)
+            self.stats["evictions"] += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Удаляет запись, если она есть."""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+
+        tag = entry[2]
+        if tag is not None and tag in self.tags:
+            self.tags[tag].discard(key)
+            if not self.tags[tag]:
+                del self.tags[tag]
+
+    def delete_tag(self, tag: Hashable) -> None:
+        """Удаляет все записи с указанным тегом."""
+        for key in list(self.tags.get(tag, ())):
+            self.delete(key)
+
+    def clear(self) -> None:
+        """Удаляет все записи."""
+        self.entries.clear()
+        self.tags.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,229 @@
+"""
+Модуль каналов инвалидации кешей.
+
+Кеши хранятся в памяти каждого воркера uvicorn, поэтому изменение данных
+в одном воркере должно сбрасывать кеши во всех остальных. Канал доставляет
+сообщение локальным подписчикам и, если поддерживает, другим воркерам.
+
+Доступные каналы:
+    in_process - только текущий процесс
+    local_pubsub - локальный pub/sub брокер (LocalPubSubBroker) по TCP
+"""
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import json
+from configuration.settings import (
+    INVALIDATION_CHANNEL,
+    INVALIDATION_PUBSUB_HOST,
+    INVALIDATION_PUBSUB_PORT
+)
+from utils.loggers import logger
+
+
+class InvalidationChannel:
+    """
+    Базовый канал инвалидации.
+
+    Сообщение - словарь с ключами topic (например, "sessions"), action
+    и дополнительными данными. Действие "clear" означает полный сброс кеша темы.
+
+    Attributes:
+        subscribers: Обработчики сообщений по темам
+    """
+
+    def __init__(self):
+        self.subscribers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+
+    def subscribe(self, topic: str, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        Подписывает обработчик на сообщения темы.
+
+        Args:
+            topic: Тема сообщений
+            callback: Синхронный обработчик, получает словарь сообщения
+        """
+        self.subscribers.setdefault(topic, []).append(callback)
+
+    def deliver(self, message: Dict[str, Any]) -> None:
+        """Передает сообщение локальным подписчикам темы."""
+        for callback in self.subscribers.get(message.get("topic"), ()):
+            callback(message)
+
+    def clear_all(self) -> None:
+        """Сбрасывает кеши всех тем в текущем процессе."""
+        for topic in list(self.subscribers):
+            self.deliver(dict(topic=topic, action="clear"))
+
+    def publish(self, topic: str, action: str, **data: Any) -> None:
+        """
+        Публикует сообщение: применяет его локально и отправляет другим воркерам.
+
+        Args:
+            topic: Тема сообщения
+            action: Действие (например, "invalidate_user" или "clear")
+            **data: Дополнительные данные сообщения (должны сериализоваться в JSON)
+        """
+        message = dict(topic=topic, action=action, **data)
+        self.deliver(message)
+        self.send(message)
+
+    def send(self, message: Dict[str, Any]) -> None:
+        """Отправляет сообщение другим воркерам."""
+
+    async def start(self) -> None:
+        """Запускает канал, вызывается при старте приложения."""
+
+    async def stop(self) -> None:
+        """Останавливает канал, вызывается при остановке приложения."""
+
+
+class InProcessChannel(InvalidationChannel):
+    """Канал, доставляющий сообщения только внутри текущего процесса."""
+
+
+class LocalPubSubChannel(InvalidationChannel):
+    """
+    Канал поверх локального pub/sub брокера.
+
+    Сообщения передаются строками JSON через TCP соединение с LocalPubSubBroker.
+    При потере соединения канал переподключается и сбрасывает локальные кеши,
+    так как сообщения за время разрыва могли быть пропущены. Пауза между
+    неудачными попытками удваивается до max_reconnect_delay, недоступность
+    брокера (например, при запуске без main.py) записывается в лог один раз
+    до восстановления соединения.
+
+    Attributes:
+        host: Адрес брокера
+        port: Порт брокера
+        reconnect_delay: Пауза перед первым переподключением (секунды)
+        max_reconnect_delay: Максимальная пауза между переподключениями (секунды)
+        unavailable: Недоступность брокера уже записана в лог
+    """
+
+    def __init__(self, host: str, port: int, reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.task: Optional[asyncio.Task] = None
+        self.unavailable = False
+
+    def report_unavailable(self, reason: str) -> None:
+        """Записывает недоступность брокера в лог, если она еще не записана."""
+        if not self.unavailable:
+            self.unavailable = True
+            logger.warning(f"Invalidation broker {self.host}:{self.port} is unavailable, cache invalidation is applied locally only: {reason}")
+
+    def send(self, message: Dict[str, Any]) -> None:
+        if self.writer is None or self.writer.is_closing():
+            self.report_unavailable("not connected")
+            return
+        self.writer.write(json.dumps(message).encode() + b"\n")
+
+    async def listen(self) -> None:
+        """Поддерживает соединение с брокером и доставляет входящие сообщения."""
+        delay = self.reconnect_delay
+        while True:
+            try:
+                reader, self.writer = await asyncio.open_connection(self.host, self.port)
+                delay = self.reconnect_delay
+                if self.unavailable:
+                    self.unavailable = False
+                    logger.info(f"Invalidation broker {self.host}:{self.port} connection restored")
+                self.clear_all()
+                while line := await reader.readline():
+                    self.deliver(json.loads(line))
+            except (OSError, ValueError) as ex_:
+                self.report_unavailable(str(ex_))
+            finally:
+                if self.writer is not None:
+                    self.writer.close()
+                    self.writer = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.listen())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+class LocalPubSubBroker:
+    """
+    Локальный pub/sub брокер для каналов LocalPubSubChannel.
+
+    Пересылает каждую строку, полученную от клиента, всем остальным клиентам.
+    Заменяет внешний брокер (например, Redis pub/sub) при запуске на одной машине.
+
+    Attributes:
+        host: Адрес для прослушивания
+        port: Порт для прослушивания
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.clients: set = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Принимает сообщения клиента и рассылает их остальным клиентам."""
+        self.clients.add(writer)
+        try:
+            while line := await reader.readline():
+                for client in list(self.clients):
+                    if client is not writer and not client.is_closing():
+                        client.write(line)
+        except OSError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def start(self) -> None:
+        """Запускает брокер."""
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+
+    async def stop(self) -> None:
+        """Останавливает брокер и закрывает соединения клиентов."""
+        if self.server is not None:
+            self.server.close()
+            for client in list(self.clients):
+                client.close()
+            await self.server.wait_closed()
+            self.server = None
+
+
+def create_invalidation_channel(name: str) -> InvalidationChannel:
+    """
+    Создает канал инвалидации по имени.
+
+    Args:
+        name: "in_process" или "local_pubsub"
+
+    Returns:
+        Канал инвалидации
+    """
+    if name == "local_pubsub":
+        return LocalPubSubChannel(host=INVALIDATION_PUBSUB_HOST, port=INVALIDATION_PUBSUB_PORT)
+    return InProcessChannel()
+
+
+# Канал инвалидации кешей воркера
+invalidation_channel = create_invalidation_channel(INVALIDATION_CHANNEL)
+
+
+if __name__ == "__main__":
+    async def serve_broker():
+        broker = LocalPubSubBroker(host=INVALIDATION_PUBSUB_HOST, port=INVALIDATION_PUBSUB_PORT)
+        await broker.start()
+        await broker.server.serve_forever()
+
+    asyncio.run(serve_broker())
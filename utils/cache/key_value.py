@@ -0,0 +1,193 @@
+"""
+Модуль клиентов key-value хранилища.
+
+Поддерживается Redis-совместимый сервер (требует пакет redis) и хранилище
+в памяти процесса с тем же набором команд - для тестов и запуска с одним воркером.
+
+Адрес хранилища:
+    memory:// - хранилище в памяти процесса (InMemoryKeyValueClient)
+    redis://host:port/db - Redis-совместимый сервер
+"""
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+import fnmatch
+import time
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+
+class InMemoryKeyValueClient:
+    """
+    Key-value хранилище в памяти процесса с командами Redis.
+
+    Реализует подмножество асинхронного API redis-py (decode_responses=True),
+    которое используют хранилища приложения: строки, множества, счетчики и
+    время жизни ключей. Истекшие ключи удаляются при обращении к ним.
+
+    Attributes:
+        data: Значения ключей (строка или множество строк)
+        expires_at: Время истечения ключей по time.monotonic()
+    """
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.expires_at: Dict[str, float] = {}
+
+    def _alive(self, name: str) -> bool:
+        """Удаляет ключ, если его время жизни истекло, и проверяет его наличие."""
+        expires_at = self.expires_at.get(name)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(name, None)
+            self.expires_at.pop(name, None)
+        return name in self.data
+
+    async def get(self, name: str) -> Optional[str]:
+        """Возвращает строковое значение ключа или None."""
+        return self.data[name] if self._alive(name) else None
+
+    async def mget(self, names: Iterable[str]) -> List[Optional[str]]:
+        """Возвращает значения нескольких ключей."""
+        return [self.data[name] if self._alive(name) else None for name in names]
+
+    async def set(self, name: str, value: str, px: Optional[int] = None) -> bool:
+        """
+        Устанавливает значение ключа.
+
+        Args:
+            name: Ключ
+            value: Значение
+            px: Время жизни ключа в миллисекундах (None - без ограничения)
+        """
+        self.data[name] = value
+        if px is None:
+            self.expires_at.pop(name, None)
+        else:
+            self.expires_at[name] = time.monotonic() + px / 1000
+        return True
+
+    async def delete(self, *names: str) -> int:
+        """Удаляет ключи и возвращает количество удаленных."""
+        deleted = 0
+        for name in names:
+            if self._alive(name):
+                del self.data[name]
+                deleted += 1
+            self.expires_at.pop(name, None)
+        return deleted
+
+    async def incr(self, name: str) -> int:
+        """Увеличивает счетчик на 1 и возвращает новое значение."""
+        value = int(self.data[name]) + 1 if self._alive(name) else 1
+        self.data[name] = str(value)
+        return value
+
+    async def pexpire(self, name: str, time_ms: int) -> bool:
+        """Устанавливает время жизни ключа в миллисекундах."""
+        if not self._alive(name):
+            return False
+        self.expires_at[name] = time.monotonic() + time_ms / 1000
+        return True
+
+    async def sadd(self, name: str, *values: str) -> int:
+        """Добавляет элементы в множество и возвращает количество новых."""
+        if not self._alive(name):
+            self.data[name] = set()
+        members: Set[str] = self.data[name]
+        added = len(set(values) - members)
+        members.update(values)
+        return added
+
+    async def srem(self, name: str, *values: str) -> int:
+        """Удаляет элементы из множества и возвращает количество удаленных."""
+        if not self._alive(name):
+            return 0
+        members: Set[str] = self.data[name]
+        removed = len(members & set(values))
+        members.difference_update(values)
+        if not members:
+            await self.delete(name)
+        return removed
+
+    async def smembers(self, name: str) -> Set[str]:
+        """Возвращает элементы множества."""
+        return set(self.data[name]) if self._alive(name) else set()
+
+    async def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Последовательно возвращает ключи, подходящие под шаблон (аналог SCAN).
+
+        Args:
+            match: Glob-шаблон ключей (None - все ключи)
+            count: Совместимость с redis-py, не используется
+        """
+        for name in list(self.data):
+            if (match is None or fnmatch.fnmatchcase(name, match)) and self._alive(name):
+                yield name
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        """Возвращает пайплайн, выполняющий накопленные команды одним вызовом execute."""
+        return InMemoryPipeline(self)
+
+    async def aclose(self) -> None:
+        """Совместимость с redis-py, освобождать нечего."""
+
+
+class InMemoryPipeline:
+    """
+    Пайплайн InMemoryKeyValueClient с API пайплайна redis-py.
+
+    Команды накапливаются без выполнения (pipe.set(...) возвращает сам
+    пайплайн) и применяются по порядку в execute. Между командами execute нет
+    переключения задач asyncio, поэтому, как MULTI/EXEC в Redis, команды
+    применяются все вместе или, если execute не вызван, не применяются вовсе.
+
+    Attributes:
+        client: Хранилище, к которому применяются команды
+        commands: Накопленные команды (имя, позиционные и именованные аргументы)
+    """
+
+    def __init__(self, client: InMemoryKeyValueClient):
+        self.client = client
+        self.commands: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_") or not hasattr(self.client, name):
+            raise AttributeError(name)
+
+        def queue(*args: Any, **kwargs: Any) -> "InMemoryPipeline":
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> List[Any]:
+        """Выполняет накопленные команды и возвращает их результаты."""
+        commands, self.commands = self.commands, []
+        return [await getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+    async def __aenter__(self) -> "InMemoryPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.commands = []
+
+
+def create_key_value_client(url: str) -> Any:
+    """
+    Создает клиент key-value хранилища по адресу.
+
+    Args:
+        url: "memory://" или адрес Redis-совместимого сервера ("redis://...", "rediss://...", "unix://...")
+
+    Returns:
+        Клиент с асинхронным API redis-py
+
+    Raises:
+        RuntimeError: Если для адреса сервера не установлен пакет redis
+    """
+    if url.partition("://")[0] == "memory":
+        return InMemoryKeyValueClient()
+    if redis_asyncio is None:
+        raise RuntimeError(f"Key-value store {url} requires the redis package")
+    return redis_asyncio.from_url(url, decode_responses=True)
@@ -0,0 +1,211 @@
+"""
+Модуль дедупликации исключений по отпечатку.
+
+Отпечаток исключения строится по типу, категории, функции и нормализованному
+стеку (файл и функция каждого кадра без номеров строк, включая цепочку
+__cause__/__context__). Для каждого отпечатка в пределах окна сохраняются
+только первые max_dumps полных записей, остальные вхождения лишь учитываются
+в счетчиках. Индекс index_<pid>.json хранит счетчики и расположение последних
+записей каждого отпечатка (сегмент и смещение), поэтому последние вхождения
+можно найти без просмотра директории.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def get_exception_fingerprint(exception: BaseException, function_category: str, function: str) -> str:
+    """
+    Вычисляет отпечаток исключения.
+
+    Args:
+        exception: Объект исключения
+        function_category: Категория функции
+        function: Имя функции
+
+    Returns:
+        Короткий хеш отпечатка
+    """
+    parts = [function_category, function]
+    seen = set()
+    current: Optional[BaseException] = exception
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        parts.append(f"{type(current).__module__}.{type(current).__qualname__}")
+        tb = current.__traceback__
+        while tb is not None:
+            code = tb.tb_frame.f_code
+            parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            tb = tb.tb_next
+        current = current.__cause__ or current.__context__
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+class ExceptionAggregator:
+    """
+    Счетчики исключений по отпечатку и индекс последних записей.
+
+    Используется из потока, перехватывающего исключение (register), и из
+    фонового потока записи (record_dumps, write_index), поэтому все изменения
+    выполняются под блокировкой.
+
+    Attributes:
+        directory: Директория сегментов и индексов
+        window: Длина окна дедупликации (секунды)
+        max_dumps: Количество полных записей отпечатка в одном окне
+        max_latest: Количество последних записей отпечатка в индексе
+        max_fingerprints: Количество отпечатков в индексе (вытесняются давно не встречавшиеся)
+        entries: Данные индекса по отпечатку
+    """
+
+    def __init__(self, directory: Path, window: float = 60.0, max_dumps: int = 5, max_latest: int = 10, max_fingerprints: int = 1000):
+        self.directory = directory
+        self.window = window
+        self.max_dumps = max_dumps
+        self.max_latest = max_latest
+        self.max_fingerprints = max_fingerprints
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.windows: Dict[str, List[float]] = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+
+    def register(self, fingerprint: str, exception: BaseException, function_category: str, function: str, timestamp: str) -> Tuple[bool, bool]:
+        """
+        Учитывает вхождение исключения.
+
+        Args:
+            fingerprint: Отпечаток исключения
+            exception: Объект исключения
+            function_category: Категория функции
+            function: Имя функции
+            timestamp: Время перехвата в формате ISO
+
+        Returns:
+            Кортеж (нужно ли сохранить полную запись - False, если лимит окна исчерпан;
+            встретился ли отпечаток впервые)
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(fingerprint)
+            if entry is None:
+                entry = self.entries[fingerprint] = dict(
+                    fingerprint=fingerprint,
+                    exception_type=exception.__class__.__name__,
+                    function_category=function_category,
+                    function=function,
+                    first_seen=timestamp,
+                    last_seen=timestamp,
+                    count=0,
+                    suppressed=0,
+                    latest=[],
+                )
+                if len(self.entries) > self.max_fingerprints:
+                    evicted, _ = self.entries.popitem(last=False)
+                    self.windows.pop(evicted, None)
+            else:
+                self.entries.move_to_end(fingerprint)
+            entry["count"] += 1
+            entry["last_seen"] = timestamp
+            self.dirty = True
+            first_seen = entry["count"] == 1
+
+            window = self.windows.get(fingerprint)
+            if window is None or now - window[0] >= self.window:
+                window = self.windows[fingerprint] = [now, 0]
+            if window[1] >= self.max_dumps:
+                entry["suppressed"] += 1
+                return False, first_seen
+            window[1] += 1
+            return True, first_seen
+
+    def record_dumps(self, dumps: List[Dict[str, Any]]) -> None:
+        """
+        Добавляет расположение записанных полных записей в индекс.
+
+        Args:
+            dumps: Словари с fingerprint, exception_id, timestamp, segment и offset
+        """
+        with self.lock:
+            for dump in dumps:
+                entry = self.entries.get(dump["fingerprint"])
+                if entry is None:
+                    continue
+                entry["latest"].append({key: dump[key] for key in ("exception_id", "timestamp", "segment", "offset")})
+                del entry["latest"][:-self.max_latest]
+            self.dirty = True
+
+    def get_index_path(self) -> Path:
+        """Возвращает путь к индексу текущего воркера."""
+        return Path(self.directory, f"index_{os.getpid()}.json")
+
+    def write_index(self) -> None:
+        """Атомарно сохраняет индекс, если он изменился после прошлой записи."""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = [dict(entry, latest=list(entry["latest"])) for entry in self.entries.values()]
+            self.dirty = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.get_index_path()
+        temporary_path = path.with_suffix(".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(temporary_path, path)
+
+
+def load_exception_index(directory: Path) -> List[Dict[str, Any]]:
+    """
+    Читает индексы всех воркеров и объединяет их по отпечатку.
+
+    Args:
+        directory: Директория сегментов и индексов
+
+    Returns:
+        Отпечатки, отсортированные по времени последнего вхождения (сначала новые),
+        у каждого - суммарные счетчики и последние записи всех воркеров
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for path in directory.glob("index_*.json"):
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for entry in entries:
+            current = merged.get(entry["fingerprint"])
+            if current is None:
+                merged[entry["fingerprint"]] = dict(entry, latest=list(entry["latest"]))
+                continue
+            current["count"] += entry["count"]
+            current["suppressed"] += entry["suppressed"]
+            current["first_seen"] = min(current["first_seen"], entry["first_seen"])
+            current["last_seen"] = max(current["last_seen"], entry["last_seen"])
+            current["latest"].extend(entry["latest"])
+    for entry in merged.values():
+        entry["latest"].sort(key=lambda dump: dump["timestamp"], reverse=True)
+    return sorted(merged.values(), key=lambda entry: entry["last_seen"], reverse=True)
+
+
+def read_exception_dump(directory: Path, segment: str, offset: int) -> Optional[Dict[str, Any]]:
+    """
+    Читает полную запись исключения по расположению из индекса.
+
+    Args:
+        directory: Директория сегментов
+        segment: Имя файла сегмента
+        offset: Смещение строки записи в байтах
+
+    Returns:
+        Запись исключения или None, если сегмент уже удален
+    """
+    try:
+        with open(Path(directory, segment), "rb") as file:
+            file.seek(offset)
+            return json.loads(file.readline())
+    except (OSError, ValueError):
+        return None
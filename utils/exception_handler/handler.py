@@ -1,22 +1,44 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 import traceback
-import json
 import uuid
+import random
 from contextlib import suppress, asynccontextmanager
-from traceback_with_variables import iter_exc_lines, default_format
-from pathlib import Path
+from traceback_with_variables import iter_exc_lines, Format
 from configuration.paths import PATH_TO_EXCEPTIONS
+from configuration.settings import (
+    EXCEPTIONS_QUEUE_SIZE,
+    EXCEPTIONS_BATCH_SIZE,
+    EXCEPTIONS_SEGMENT_MAX_BYTES,
+    EXCEPTIONS_MAX_SEGMENTS,
+    EXCEPTIONS_DEDUP_WINDOW,
+    EXCEPTIONS_DEDUP_MAX_DUMPS,
+    EXCEPTIONS_DETAIL_LEVEL,
+    EXCEPTIONS_FULL_SAMPLE_RATE,
+    EXCEPTIONS_CAPPED_VALUE_LENGTH
+)
+from utils.exception_handler.writer import ExceptionWriter
+from utils.exception_handler.aggregation import ExceptionAggregator, get_exception_fingerprint
+from utils.metrics import exceptions_suppressed_total
 from datetime import datetime
-import aiofiles
 import platform
 from contextlib import contextmanager
 
 
-default_format.max_exc_str_len = 1000000
-default_format.max_value_str_len = 1000000
+# Системная информация вычисляется один раз при импорте (platform.processor() на Linux может запускать внешний процесс)
+SYSTEM_INFO = {
+    "platform": platform.platform(),
+    "python_version": platform.python_version(),
+    "processor": platform.processor()
+}
 
+# Форматы расширенного трейсбека с переменными по уровню детализации ("standard" - без переменных)
+DETAIL_FORMATS = {
+    "capped": Format(max_value_str_len=EXCEPTIONS_CAPPED_VALUE_LENGTH, max_exc_str_len=EXCEPTIONS_CAPPED_VALUE_LENGTH * 10),
+    "full": Format(max_value_str_len=1000000, max_exc_str_len=1000000),
+}
 
-def get_traceback(exception: Exception, function_category: str = "", function: str = "") -> Dict[str, Any]:
+
+def get_traceback(exception: Exception, function_category: str = "", function: str = "", detail_level: str = "full") -> Dict[str, Any]:
     """
     Формирует подробную информацию об исключении.
     
@@ -24,6 +46,9 @@ def get_traceback(exception: Exception, function_category: str = "", function: s
         exception: Объект исключения
         function_category: Категория функции, где произошло исключение
         function: Имя функции, где произошло исключение
+        detail_level: "standard" - только стандартный трейсбек, "capped" - трейсбек
+                      с переменными, обрезанными до EXCEPTIONS_CAPPED_VALUE_LENGTH,
+                      "full" - трейсбек с переменными до 1000000 символов
         
     Returns:
         Dict с информацией об исключении, включая трейсбек и системную информацию
@@ -33,49 +58,123 @@ def get_traceback(exception: Exception, function_category: str = "", function: s
         "exception_message": str(exception),
         "function_category": function_category,
         "function": function,
+        "detail_level": detail_level,
         "standard_traceback": "\n",
         "detailed_traceback": "\n",
-        "system_info": {
-            "platform": platform.platform(),
-            "python_version": platform.python_version(),
-            "processor": platform.processor()
-        },
+        "system_info": SYSTEM_INFO,
         "timestamp": datetime.now().isoformat()
     }
     
     with suppress(Exception):
         result["standard_traceback"] += "".join(traceback.format_exception(type(exception), exception, exception.__traceback__, limit=None, chain=True))
     
-    with suppress(Exception):
-        result["detailed_traceback"] += "".join(f"{line}\n" for line in iter_exc_lines(exception))
+    detail_format = DETAIL_FORMATS.get(detail_level)
+    if detail_format is not None:
+        with suppress(Exception):
+            result["detailed_traceback"] += "".join(f"{line}\n" for line in iter_exc_lines(exception, fmt=detail_format))
     
     return result
 
 
+def select_detail_level(first_seen: bool) -> str:
+    """
+    Выбирает уровень детализации записи исключения.
+    
+    При EXCEPTIONS_DETAIL_LEVEL="full" полный дамп переменных формируется только
+    для первого вхождения отпечатка и для доли EXCEPTIONS_FULL_SAMPLE_RATE
+    остальных, другие записи формируются с обрезанными значениями.
+    
+    Args:
+        first_seen: Отпечаток исключения встретился впервые
+        
+    Returns:
+        "standard", "capped" или "full"
+    """
+    if EXCEPTIONS_DETAIL_LEVEL in ("standard", "capped"):
+        return EXCEPTIONS_DETAIL_LEVEL
+    if first_seen or random.random() < EXCEPTIONS_FULL_SAMPLE_RATE:
+        return "full"
+    return "capped"
+
+
 def generate_exception_id() -> str:
     """Генерирует уникальный UUID для исключения."""
     return str(uuid.uuid4())
 
 
-def create_exception_filename(exception_id: str, function_category: str, function: str) -> str:
+# Счетчики исключений по отпечатку и индекс последних записей воркера
+exception_aggregator = ExceptionAggregator(
+    directory=PATH_TO_EXCEPTIONS,
+    window=EXCEPTIONS_DEDUP_WINDOW,
+    max_dumps=EXCEPTIONS_DEDUP_MAX_DUMPS
+)
+
+def index_written_records(written: List[Tuple[Dict[str, Any], str, int]]) -> None:
     """
-    Создает имя файла для сохранения информации об исключении.
+    Добавляет расположение записанных исключений в индекс.
+    
+    Args:
+        written: Список (запись, сегмент, смещение в байтах) от фонового потока записи
+    """
+    exception_aggregator.record_dumps([
+        dict(fingerprint=record["fingerprint"], exception_id=record["exception_id"], timestamp=record["timestamp"], segment=segment, offset=offset)
+        for record, segment, offset in written
+    ])
+
+
+# Фоновая запись исключений воркера в NDJSON сегменты assets/exceptions
+exception_writer = ExceptionWriter(
+    directory=PATH_TO_EXCEPTIONS,
+    on_written=index_written_records,
+    on_idle=exception_aggregator.write_index,
+    queue_size=EXCEPTIONS_QUEUE_SIZE,
+    batch_size=EXCEPTIONS_BATCH_SIZE,
+    segment_max_bytes=EXCEPTIONS_SEGMENT_MAX_BYTES,
+    max_segments=EXCEPTIONS_MAX_SEGMENTS
+)
+
+
+def capture_exception(function_category: str, function: str, exception: Any) -> str:
+    """
+    Формирует запись исключения и помещает ее в очередь фоновой записи без ожидания.
+    
+    Трейсбек и значения переменных формируются сразу, в потоке, перехватившем
+    исключение: позже кадры стека уже изменены, а repr объектов цикла событий
+    (сессий, подключений, запросов) нельзя вызывать из другого потока. В очередь
+    попадает только готовый словарь, без ссылок на исключение и кадры стека,
+    фоновый поток выполняет сериализацию и запись на диск. Стоимость
+    формирования ограничена дедупликацией и уровнем детализации (см.
+    select_detail_level). При заполненной очереди запись отбрасывается
+    и учитывается в метрике exceptions_dropped_total. Если для отпечатка
+    исключения в текущем окне уже сохранено EXCEPTIONS_DEDUP_MAX_DUMPS записей,
+    исключение только учитывается в индексе и exceptions_suppressed_total.
     
     Args:
-        exception_id: UUID исключения
         function_category: Категория функции
         function: Имя функции
+        exception: Объект исключения
         
     Returns:
-        Форматированное имя файла с меткой времени
+        UUID исключения (поле exception_id записи, если запись сохраняется)
     """
-    current_date = datetime.now().strftime("%d.%m.%Y %H.%M.%S")
-    return f"[{exception_id} {current_date}] {function_category} {function}.json"
+    exception_id = generate_exception_id()
+    timestamp = datetime.now().isoformat()
+    fingerprint = get_exception_fingerprint(exception, function_category, function)
+    store, first_seen = exception_aggregator.register(fingerprint, exception, function_category, function, timestamp)
+    if not store:
+        exceptions_suppressed_total.inc(function_category=function_category)
+        return exception_id
+    exception_data = get_traceback(exception=exception, function_category=function_category, function=function, detail_level=select_detail_level(first_seen))
+    exception_data["exception_id"] = exception_id
+    exception_data["fingerprint"] = fingerprint
+    exception_data["timestamp"] = timestamp
+    exception_writer.submit(exception_data)
+    return exception_id
 
 
 def handle_sync(function_category: str, function: str, exception: Any) -> str:
     """
-    Синхронная обработка исключения с записью в файл.
+    Синхронная обработка исключения с фоновой записью в NDJSON сегмент.
     
     Args:
         function_category: Категория функции
@@ -83,22 +182,14 @@ def handle_sync(function_category: str, function: str, exception: Any) -> str:
         exception: Объект исключения
         
     Returns:
-        Имя созданного файла с логом исключения
+        UUID исключения
     """
-    exception_data = get_traceback(exception, function_category, function)
-    exception_id = generate_exception_id()
-    filename = create_exception_filename(exception_id, function_category, function)
-    file_path = Path(PATH_TO_EXCEPTIONS, filename)
-    
-    with open(file_path, "w", encoding="utf-8") as file:
-        json.dump(exception_data, file, ensure_ascii=False, indent=2)
-        
-    return filename
+    return capture_exception(function_category=function_category, function=function, exception=exception)
 
 
 async def handle_async(function_category: str, function: str, exception: Any) -> str:
     """
-    Асинхронная обработка исключения с записью в файл.
+    Асинхронная обработка исключения с фоновой записью в NDJSON сегмент.
     
     Args:
         function_category: Категория функции
@@ -106,17 +197,9 @@ async def handle_async(function_category: str, function: str, exception: Any) ->
         exception: Объект исключения
         
     Returns:
-        Имя созданного файла с логом исключения
+        UUID исключения
     """
-    exception_data = get_traceback(exception=exception, function_category=function_category, function=function)
-    exception_id = generate_exception_id()
-    filename = create_exception_filename(exception_id=exception_id, function_category=function_category, function=function)
-    file_path = Path(PATH_TO_EXCEPTIONS, filename)
-    
-    async with aiofiles.open(file_path, "w", encoding="utf-8") as file:
-        await file.write(json.dumps(exception_data, ensure_ascii=False, indent=2))
-    
-    return filename
+    return capture_exception(function_category=function_category, function=function, exception=exception)
 
 
 @asynccontextmanager
@@ -0,0 +1,202 @@
+"""
+Модуль фоновой записи исключений.
+
+Обработчики исключений помещают готовую запись (словарь с трейсбеком) в
+ограниченную очередь, фоновый поток сериализует и записывает записи пачками
+в NDJSON сегменты (одна строка JSON на исключение). При заполнении очереди записи отбрасываются
+и учитываются в счетчике, чтобы всплеск ошибок (например, при недоступности
+базы данных) не задерживал обработку запросов.
+"""
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+from datetime import datetime
+from pathlib import Path
+import atexit
+import json
+import os
+import queue
+import threading
+from utils.loggers import logger
+from utils.metrics import exceptions_captured_total, exceptions_dropped_total
+
+
+# Признак остановки фонового потока в очереди
+STOP = object()
+
+
+class ExceptionWriter:
+    """
+    Фоновый писатель исключений в NDJSON сегменты.
+
+    Сегмент - файл exceptions_<дата>_<pid>_<номер>.ndjson. При превышении
+    segment_max_bytes запись продолжается в новый сегмент, самые старые
+    сегменты сверх max_segments удаляются.
+
+    Attributes:
+        directory: Директория сегментов
+        on_written: Вызывается после записи пачки со списком (запись, сегмент, смещение в байтах)
+        on_idle: Вызывается после каждой пачки и раз в idle_interval без новых записей
+        idle_interval: Интервал вызова on_idle без новых записей (секунды)
+        batch_size: Максимальное количество записей в одной пачке
+        segment_max_bytes: Размер сегмента, после которого начинается новый
+        max_segments: Количество хранимых сегментов всех воркеров
+        dropped: Количество отброшенных записей воркера
+    """
+
+    def __init__(self, directory: Path, on_written: Optional[Callable[[List[Tuple[Dict[str, Any], str, int]]], None]] = None, on_idle: Optional[Callable[[], None]] = None, idle_interval: float = 1.0, queue_size: int = 1000, batch_size: int = 100, segment_max_bytes: int = 16 * 1024 * 1024, max_segments: int = 50):
+        self.directory = directory
+        self.on_written = on_written
+        self.on_idle = on_idle
+        self.idle_interval = idle_interval
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.thread: Optional[threading.Thread] = None
+        self.pid: Optional[int] = None
+        self.lock = threading.Lock()
+        self.file: Optional[TextIO] = None
+        self.segment_number = 0
+        atexit.register(self.stop)
+
+    def ensure_started(self) -> None:
+        """
+        Запускает фоновый поток при первом обращении.
+
+        После fork поток родительского процесса в дочернем не существует,
+        поэтому очередь и поток создаются заново для каждого процесса.
+        """
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=self.queue_size)
+            self.file = None
+            self.thread = threading.Thread(target=self.run, name="exception-writer", daemon=True)
+            self.thread.start()
+            self.pid = os.getpid()
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """
+        Помещает запись в очередь без ожидания.
+
+        Args:
+            record: Запись исключения
+
+        Returns:
+            True, если запись принята, False, если очередь заполнена и запись отброшена
+        """
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            exceptions_dropped_total.inc()
+            return False
+        exceptions_captured_total.inc(function_category=record["function_category"])
+        return True
+
+    def run(self) -> None:
+        """Цикл фонового потока: собирает пачку записей из очереди и записывает ее."""
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.idle_interval)]
+            except queue.Empty:
+                self.call_idle()
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(item is STOP for item in batch)
+            records = [item for item in batch if item is not STOP]
+            if records:
+                try:
+                    self.write_batch(records)
+                except Exception as ex_:
+                    logger.error(f"Exception writer failed to write {len(records)} records: {ex_}")
+            self.call_idle()
+            if stop:
+                self.close_segment()
+                return
+
+    def call_idle(self) -> None:
+        """Вызывает on_idle, ошибки записываются в лог."""
+        if self.on_idle is None:
+            return
+        try:
+            self.on_idle()
+        except Exception as ex_:
+            logger.error(f"Exception writer idle callback failed: {ex_}")
+
+    def render_line(self, record: Dict[str, Any]) -> str:
+        """Формирует строку NDJSON для записи, при ошибке формирования - сокращенную запись."""
+        try:
+            return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        except Exception as ex_:
+            data = {key: record.get(key) for key in ("exception_id", "exception_type", "exception_message", "function_category", "function", "timestamp")}
+            data["render_error"] = str(ex_)
+            return json.dumps(data, ensure_ascii=False, default=str) + "\n"
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Записывает пачку записей в текущий сегмент одним вызовом write.
+
+        Args:
+            records: Записи из очереди
+        """
+        lines = [self.render_line(record) for record in records]
+        if self.file is None:
+            self.open_segment()
+        segment = os.path.basename(self.file.name)
+        offset = self.file.tell()
+        written = []
+        for record, line in zip(records, lines):
+            written.append((record, segment, offset))
+            offset += len(line.encode("utf-8"))
+        self.file.write("".join(lines))
+        self.file.flush()
+        if self.on_written is not None:
+            self.on_written(written)
+        if self.file.tell() >= self.segment_max_bytes:
+            self.close_segment()
+            self.remove_old_segments()
+
+    def open_segment(self) -> None:
+        """Открывает новый сегмент."""
+        self.segment_number += 1
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filename = f"exceptions_{datetime.now().strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{self.segment_number}.ndjson"
+        self.file = open(Path(self.directory, filename), "a", encoding="utf-8")
+
+    def close_segment(self) -> None:
+        """Закрывает текущий сегмент."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove_old_segments(self) -> None:
+        """Удаляет самые старые сегменты сверх max_segments (имена упорядочены по дате)."""
+        segments = sorted(self.directory.glob("exceptions_*.ndjson"))
+        for path in segments[:max(len(segments) - self.max_segments, 0)]:
+            path.unlink(missing_ok=True)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Записывает оставшиеся записи и останавливает фоновый поток.
+
+        Args:
+            timeout: Максимальное время ожидания (секунды)
+        """
+        if self.pid != os.getpid() or self.thread is None or not self.thread.is_alive():
+            return
+        try:
+            self.queue.put(STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout=timeout)
+        self.pid = None
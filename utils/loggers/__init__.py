@@ -1,11 +1,38 @@
 """
 Модуль системы логирования.
 
-Предоставляет цветные логгеры для консоли и запись логов в файлы.
+Предоставляет цветные логгеры для консоли, запись логов в файлы и журнал
+HTTP запросов (access_logger) в формате JSON.
+Логгер только помещает запись в ограниченную очередь, форматирование и
+вывод в консоль и файлы выполняются фоновым потоком пачками, поэтому
+обработка запросов не ждет диск. Записи ниже LOG_LEVEL отбрасываются до
+постановки в очередь. При заполненной очереди записи отбрасываются и
+учитываются в счетчике dropped обработчика очереди (метрика logs_dropped_total).
 """
-from typing import Any
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
 from pathlib import Path
+from configuration.settings import (
+    LOG_LEVEL,
+    LOG_COLORS,
+    LOG_QUEUE_SIZE,
+    LOG_BATCH_SIZE,
+    LOG_MAX_OPEN_FILES,
+    LOG_FILE_MAX_BYTES,
+    LOG_FILE_ROTATE_INTERVAL,
+    LOG_FILE_BACKUP_COUNT
+)
 
 
 # ANSI коды цветов для форматирования логов в консоли
@@ -18,74 +45,410 @@ COLORS = {
     'RESET': '\033[0m',     # Сброс цвета
 }
 
+# Признак остановки фонового потока в очереди
+STOP = object()
+
+# Форматтер traceback исключений при постановке записи в очередь
+EXCEPTION_FORMATTER = logging.Formatter()
+
 
 class ColoredFormatter(logging.Formatter):
     """
     Форматтер для обработки логов с поддержкой цветов.
-    
+
     Добавляет цветовое форматирование к логам в зависимости от уровня.
     """
-    
+
     def format(self, record):
         message = super().format(record)
         return f"{COLORS.get(record.levelname, '')}{message}{COLORS['RESET']}"
 
 
+class JsonFormatter(logging.Formatter):
+    """
+    Форматтер записей со словарем в сообщении.
+
+    Сериализует словарь в одну строку JSON. Форматирование выполняется в
+    фоновом потоке, поэтому вызывающий код передает словарь без сериализации.
+    """
+
+    def format(self, record):
+        if isinstance(record.msg, dict):
+            return json.dumps(record.msg, ensure_ascii=False, default=str)
+        return super().format(record)
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """
+    Обработчик вывода в консоль в текущий sys.stderr.
+
+    Поток определяется при каждой записи, а не при создании обработчика (как
+    в logging.lastResort), поэтому подмена sys.stderr (например, перехват
+    вывода в pytest) не оставляет обработчик с закрытым потоком.
+    """
+
+    def __init__(self):
+        super().__init__(sys.stderr)
+
+    @property
+    def stream(self) -> TextIO:
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value: TextIO) -> None:
+        pass
+
+
+class LogFile:
+    """
+    Открытый файл лога и данные для его ротации.
+
+    Attributes:
+        path: Путь к файлу
+        file: Открытый файл (режим дозаписи)
+        inode: Inode открытого файла, чтобы заметить ротацию другим воркером
+        period: Номер периода LOG_FILE_ROTATE_INTERVAL, в котором файл начат
+    """
+
+    def __init__(self, path: Path, rotate_interval: float):
+        self.path = path
+        self.file: TextIO = open(path, "a", encoding="utf-8")
+        stat = os.fstat(self.file.fileno())
+        self.inode = stat.st_ino
+        started_at = stat.st_mtime if stat.st_size else time.time()
+        self.period = int(started_at // rotate_interval) if rotate_interval > 0 else 0
+
+    def close(self) -> None:
+        """Закрывает файл."""
+        self.file.close()
+
+
 class Handler(logging.Handler):
     """
     Кастомный обработчик логов для записи в файлы.
-    
+
     Создает текстовые файлы логов на основе атрибутов path и log_filename.
+    Записи накапливаются в буферах по файлу и записываются при flush (после
+    каждой пачки фонового потока). Файлы остаются открытыми, не более
+    max_open_files одновременно (давно не использованные закрываются).
+    Файл переименовывается в <log_filename>.<дата>.txt при превышении
+    max_bytes или смене периода rotate_interval, хранится не больше
+    backup_count переименованных файлов.
+
+    Attributes:
+        max_open_files: Количество одновременно открытых файлов
+        max_bytes: Размер файла для ротации (0 - без ротации по размеру)
+        rotate_interval: Период ротации по времени в секундах (0 - без ротации по времени)
+        backup_count: Количество хранимых переименованных файлов лога
     """
-    
+
+    def __init__(self, max_open_files: int = 32, max_bytes: int = 0, rotate_interval: float = 0, backup_count: int = 10):
+        super().__init__()
+        self.max_open_files = max_open_files
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.files: "OrderedDict[Tuple[str, str], LogFile]" = OrderedDict()
+        self.buffers: Dict[Tuple[str, str], List[str]] = {}
+
     def emit(self, record):
         path = getattr(record, "path", None)
         log_filename = getattr(record, "log_filename", None)
         if not path or not log_filename:
             return
 
-        with open(Path(path, f"{log_filename}.txt"), "a", encoding="utf-8") as log_file:
-            log_file.write(str(self.format(record=record)) + "\n")
+        self.buffers.setdefault((str(path), log_filename), []).append(str(self.format(record=record)) + "\n")
+
+    def flush(self):
+        buffers, self.buffers = self.buffers, {}
+        for key, lines in buffers.items():
+            try:
+                log_file = self.get_file(key)
+                log_file.file.write("".join(lines))
+                log_file.file.flush()
+            except Exception as ex_:
+                sys.stderr.write(f"Failed to write log file {key}: {ex_}\n")
+
+    def get_file(self, key: Tuple[str, str]) -> LogFile:
+        """
+        Возвращает открытый файл лога, при необходимости открывая или ротируя его.
+
+        Args:
+            key: (path, log_filename)
+
+        Returns:
+            Файл, готовый к дозаписи
+        """
+        path, log_filename = key
+        log_file = self.files.get(key)
+        if log_file is not None:
+            self.files.move_to_end(key)
+            try:
+                inode = os.stat(log_file.path).st_ino
+            except FileNotFoundError:
+                inode = None
+            if inode != log_file.inode:
+                # Файл ротирован или удален другим процессом
+                log_file.close()
+                log_file = None
+        if log_file is None:
+            log_file = self.open(key)
+
+        if self.should_rotate(log_file):
+            log_file.close()
+            self.rotate(log_file.path, path, log_filename)
+            log_file = self.open(key)
+        return log_file
+
+    def open(self, key: Tuple[str, str]) -> LogFile:
+        """Открывает файл лога и закрывает давно не использованные сверх max_open_files."""
+        path, log_filename = key
+        Path(path).mkdir(parents=True, exist_ok=True)
+        log_file = self.files[key] = LogFile(Path(path, f"{log_filename}.txt"), self.rotate_interval)
+        self.files.move_to_end(key)
+        while len(self.files) > self.max_open_files:
+            _, evicted = self.files.popitem(last=False)
+            evicted.close()
+        return log_file
+
+    def should_rotate(self, log_file: LogFile) -> bool:
+        """Проверяет, превышен ли размер файла или сменился ли период ротации."""
+        if self.max_bytes > 0 and log_file.file.tell() >= self.max_bytes:
+            return True
+        return self.rotate_interval > 0 and int(time.time() // self.rotate_interval) != log_file.period
+
+    def rotate(self, file_path: Path, path: str, log_filename: str) -> None:
+        """Переименовывает файл лога и удаляет самые старые переименованные файлы сверх backup_count."""
+        rotated_path = Path(path, f"{log_filename}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}.txt")
+        try:
+            os.replace(file_path, rotated_path)
+        except FileNotFoundError:
+            return
+        backups = sorted(Path(path).glob(f"{log_filename}.*.txt"))
+        for backup in backups[:max(len(backups) - self.backup_count, 0)]:
+            backup.unlink(missing_ok=True)
 
+    def close(self):
+        self.flush()
+        for log_file in self.files.values():
+            log_file.close()
+        self.files.clear()
+        super().close()
 
-def _create_logger(name: str, level: int, fmt: str = None, datefmt: str = None, handler: Any = None):
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Обработчик, помещающий записи в очередь без ожидания.
+
+    Как и в QueueHandler стандартной библиотеки, в вызывающем потоке
+    аргументы подставляются в сообщение, а traceback исключения переводится
+    в текст: в очередь попадает копия записи без ссылок на изменяемые объекты
+    и живые кадры стека. Формат строки (время, уровень, цвета) применяют
+    обработчики фонового потока. Сообщение-словарь (access_logger) передается
+    без изменений и сериализуется в фоновом потоке. При заполненной очереди
+    запись отбрасывается.
+
+    Attributes:
+        dropped: Количество отброшенных записей
+        on_drop: Вызывается для каждой отброшенной записи (учет в метриках)
+    """
+
+    def __init__(self, queue_: "queue.Queue[Any]", on_drop: Optional[Callable[[], None]] = None):
+        super().__init__(queue_)
+        self.dropped = 0
+        self.on_drop = on_drop
+
+    def prepare(self, record):
+        if isinstance(record.msg, dict) and not record.args and record.exc_info is None:
+            return record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.on_drop is not None:
+                self.on_drop()
+
+
+class BackgroundLogListener:
+    """
+    Фоновый поток, передающий записи из очереди обработчикам пачками.
+
+    После каждой пачки вызывается flush обработчиков, поэтому файловый
+    обработчик выполняет одну запись на файл за пачку.
+
+    Attributes:
+        queue: Очередь записей
+        handlers: Обработчики записей
+        batch_size: Максимальное количество записей в пачке
+    """
+
+    def __init__(self, queue_: "queue.Queue[Any]", handlers: List[logging.Handler], batch_size: int = 500):
+        self.queue = queue_
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.thread: Optional[threading.Thread] = None
+        self.pid: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def ensure_started(self) -> None:
+        """Запускает фоновый поток в текущем процессе, если он еще не запущен."""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+            self.thread.start()
+            self.pid = os.getpid()
+
+    def restart_after_fork(self, queue_handler: NonBlockingQueueHandler) -> None:
+        """
+        Запускает фоновый поток в дочернем процессе, созданном через fork.
+
+        Мьютекс очереди и блокировка родителя могли быть захвачены его фоновым
+        потоком в момент fork и в дочернем процессе не освободятся никогда,
+        поэтому очередь и блокировка создаются заново (как в
+        ExceptionWriter.ensure_started). Буферы файлового обработчика содержат
+        записи родителя, их запишет сам родитель.
+
+        Args:
+            queue_handler: Обработчик логгера, помещающий записи в очередь
+        """
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.lock = threading.Lock()
+        self.pid = None
+        for handler in self.handlers:
+            if isinstance(handler, Handler):
+                handler.buffers = {}
+        queue_handler.queue = self.queue
+        self.ensure_started()
+
+    def run(self) -> None:
+        """Цикл фонового потока."""
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for handler in self.handlers:
+                for record in batch:
+                    if record is not STOP and record.levelno >= handler.level:
+                        handler.handle(record)
+                try:
+                    handler.flush()
+                except Exception as ex_:
+                    # Ошибка одного обработчика (например, закрытый поток консоли) не останавливает фоновый поток
+                    self.report_error(handler, ex_)
+            if any(record is STOP for record in batch):
+                return
+
+    @staticmethod
+    def report_error(handler: logging.Handler, exception: Exception) -> None:
+        """Сообщает об ошибке обработчика в stderr, если он доступен."""
+        try:
+            sys.stderr.write(f"Failed to flush log handler {handler!r}: {exception}\n")
+        except Exception:
+            pass
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Записывает оставшиеся записи и останавливает фоновый поток.
+
+        Args:
+            timeout: Максимальное время ожидания (секунды)
+        """
+        if self.pid != os.getpid() or self.thread is None or not self.thread.is_alive():
+            return
+        try:
+            self.queue.put(STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout=timeout)
+        self.pid = None
+        for handler in self.handlers:
+            handler.close()
+
+
+def _use_colors() -> bool:
+    """Определяет, использовать ли ANSI цвета в консоли (LOG_COLORS: auto, true, false)."""
+    if LOG_COLORS in ("auto", ""):
+        return sys.stderr.isatty()
+    return LOG_COLORS in ("1", "true", "yes")
+
+
+def _create_logger(name: str, level: int, fmt: str = None, datefmt: str = None, handler: Any = None, console: bool = True, file_formatter_class: type = logging.Formatter):
     """
     Создает сконфигурированный логгер с цветным консольным выводом и опциональной записью в файл.
-    
+
+    Логгер получает только NonBlockingQueueHandler, консольный и файловый
+    обработчики работают в фоновом потоке BackgroundLogListener.
+
     Args:
         name: Имя логгера
-        level: Уровень логирования для консоли
+        level: Уровень логирования (записи ниже уровня не попадают в очередь)
         fmt: Формат сообщений лога
         datefmt: Формат даты/времени
         handler: Опциональный обработчик для записи в файл
-        
+        console: Выводить ли записи в консоль
+        file_formatter_class: Класс форматтера записей в файл
+
     Returns:
         Настроенный объект логгера
     """
     logger = logging.getLogger(name=name)
     logger.propagate = False
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(level)
 
-    console_formatter = ColoredFormatter(
+    console_formatter = (ColoredFormatter if _use_colors() else logging.Formatter)(
         fmt=fmt,
         datefmt=datefmt,
     )
-    
-    file_formatter = logging.Formatter(
+
+    file_formatter = file_formatter_class(
         fmt=fmt,
         datefmt=datefmt,
     )
 
-    console_handler = logging.StreamHandler()
+    console_handler = ConsoleHandler()
     console_handler.setLevel(level=level)
     console_handler.setFormatter(fmt=console_formatter)
-    logger.addHandler(hdlr=console_handler)
+    handlers = [console_handler] if console else []
 
     if handler:
-        file_handler = handler()
-        file_handler.setLevel(level=logging.DEBUG)
+        file_handler = handler(
+            max_open_files=LOG_MAX_OPEN_FILES,
+            max_bytes=LOG_FILE_MAX_BYTES,
+            rotate_interval=LOG_FILE_ROTATE_INTERVAL,
+            backup_count=LOG_FILE_BACKUP_COUNT
+        )
+        file_handler.setLevel(level=level)
         file_handler.setFormatter(fmt=file_formatter)
-        logger.addHandler(hdlr=file_handler)
+        handlers.append(file_handler)
+
+    records: "queue.Queue[Any]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = BackgroundLogListener(records, handlers, batch_size=LOG_BATCH_SIZE)
+    queue_handler = NonBlockingQueueHandler(records)
+    queue_handler.listener = listener
+    logger.addHandler(hdlr=queue_handler)
+    listener.ensure_started()
+    atexit.register(listener.stop)
+
+    # Очередь и поток создаются заново в дочерних процессах, созданных через fork
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=lambda: listener.restart_after_fork(queue_handler))
 
     return logger
 
@@ -93,8 +456,18 @@ def _create_logger(name: str, level: int, fmt: str = None, datefmt: str = None,
 # Основной логгер приложения с поддержкой цветов и записи в файлы
 logger = _create_logger(
     name="logger",
-    level=logging.DEBUG,
+    level=getattr(logging, LOG_LEVEL.upper(), logging.INFO),
     fmt="%(asctime)s | %(levelname)s:%(name)s - %(message)s",
     datefmt="%d-%m-%Y %H:%M:%S",
     handler=Handler
-)
\ No newline at end of file
+)
+
+# Журнал HTTP запросов: записи-словари пишутся в файлы строками JSON без вывода в консоль,
+# отдельная очередь не дает всплеску запросов вытеснить записи основного логгера
+access_logger = _create_logger(
+    name="access",
+    level=logging.INFO,
+    handler=Handler,
+    console=False,
+    file_formatter_class=JsonFormatter
+)
@@ -0,0 +1,546 @@
+"""
+Модуль метрик приложения в текстовом формате Prometheus.
+
+Счетчики, гистограммы и gauge хранятся в памяти воркера. Для агрегации между
+воркерами uvicorn каждый воркер периодически сохраняет снимок своих метрик
+в файл worker_<pid>.json в общей директории, а эндпоинт /metrics суммирует
+снимки всех воркеров (аналогично multiprocess режиму prometheus_client).
+Снимки завершенных воркеров сохраняются, чтобы счетчики не уменьшались,
+и удаляются при запуске сервера (clear_worker_snapshots). Gauge описывают
+текущее состояние, поэтому из снимков завершенных воркеров не учитываются.
+"""
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+import asyncio
+import bisect
+import json
+import os
+import time
+from configuration.paths import PATH_TO_METRICS
+from configuration.settings import METRICS_AGGREGATE_WORKERS, METRICS_SNAPSHOT_INTERVAL
+from utils.loggers import logger, access_logger
+
+
+# Границы гистограмм длительности по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Content-Type текстового формата Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_value(value: float) -> str:
+    """Форматирует число для текстового формата Prometheus."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def format_labels(labelnames: Sequence[str], labelvalues: Sequence[str]) -> str:
+    """
+    Форматирует метки в виде {name="value",...}.
+
+    Args:
+        labelnames: Имена меток
+        labelvalues: Значения меток в том же порядке
+
+    Returns:
+        Строка меток или пустая строка, если меток нет
+    """
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, labelvalues):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """
+    Монотонно растущий счетчик с метками.
+
+    Attributes:
+        name: Имя метрики (по соглашению Prometheus оканчивается на _total)
+        documentation: Описание метрики
+        labelnames: Имена меток
+        values: Значения по кортежу значений меток
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Увеличивает счетчик.
+
+        Args:
+            amount: Величина увеличения
+            **labels: Значения всех меток счетчика
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def snapshot(self) -> List[Any]:
+        """Возвращает значения в виде, пригодном для JSON."""
+        return [[list(key), value] for key, value in self.values.items()]
+
+    def merge(self, target: Dict[Tuple[str, ...], Any], snapshot: List[Any]) -> None:
+        """Прибавляет значения снимка к target."""
+        for key, value in snapshot:
+            key = tuple(key)
+            target[key] = target.get(key, 0.0) + value
+
+    def render(self, values: Dict[Tuple[str, ...], Any]) -> List[str]:
+        """Формирует строки значений метрики."""
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    """
+    Текущее значение с метками (например, количество занятых подключений).
+
+    Значения обновляют функции сбора реестра (MetricsRegistry.add_collector)
+    перед каждым снимком, значения воркеров суммируются.
+    """
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        """
+        Устанавливает значение.
+
+        Args:
+            value: Текущее значение
+            **labels: Значения всех меток
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self.values[key] = float(value)
+
+
+class Histogram:
+    """
+    Гистограмма распределения значений с метками.
+
+    Для каждого набора меток хранит количество наблюдений в каждом интервале
+    (не накопительно), сумму и количество наблюдений.
+
+    Attributes:
+        name: Имя метрики
+        documentation: Описание метрики
+        labelnames: Имена меток
+        buckets: Верхние границы интервалов по возрастанию (без +Inf)
+        values: [счетчики интервалов, сумма, количество] по кортежу значений меток
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Добавляет наблюдение.
+
+        Args:
+            value: Наблюдаемое значение (например, длительность в секундах)
+            **labels: Значения всех меток гистограммы
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        state = self.values.get(key)
+        if state is None:
+            # Последний интервал - наблюдения больше всех границ (+Inf)
+            state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Измеряет длительность блока кода в секундах, включая блоки, завершившиеся исключением.
+
+        Args:
+            **labels: Значения всех меток гистограммы
+        """
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def snapshot(self) -> List[Any]:
+        """Возвращает значения в виде, пригодном для JSON."""
+        return [[list(key), [list(bucket_counts), total, count]] for key, (bucket_counts, total, count) in self.values.items()]
+
+    def merge(self, target: Dict[Tuple[str, ...], Any], snapshot: List[Any]) -> None:
+        """Прибавляет значения снимка к target."""
+        for key, (bucket_counts, total, count) in snapshot:
+            key = tuple(key)
+            state = target.get(key)
+            if state is None:
+                target[key] = [list(bucket_counts), total, count]
+                continue
+            state[0] = [current + added for current, added in zip(state[0], bucket_counts)]
+            state[1] += total
+            state[2] += count
+
+    def render(self, values: Dict[Tuple[str, ...], Any]) -> List[str]:
+        """Формирует строки интервалов (накопительно), суммы и количества."""
+        lines = []
+        labelnames = self.labelnames + ("le",)
+        for key, (bucket_counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{format_labels(labelnames, key + (format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик воркера.
+
+    Attributes:
+        metrics: Метрики по имени
+        directory: Директория снимков воркеров (None - без агрегации между воркерами)
+        stale_after: Возраст снимка другого воркера (секунды), после которого его gauge
+            не учитываются (None - учитываются всегда)
+        collectors: Функции, обновляющие gauge перед каждым снимком
+    """
+
+    def __init__(self, directory: Optional[Path] = None, stale_after: Optional[float] = None):
+        self.metrics: Dict[str, Any] = {}
+        self.directory = directory
+        self.stale_after = stale_after
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Any) -> Any:
+        """
+        Добавляет метрику в реестр.
+
+        Args:
+            metric: Counter, Gauge или Histogram
+
+        Returns:
+            Та же метрика
+
+        Raises:
+            ValueError: Если метрика с таким именем уже зарегистрирована
+        """
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Создает и регистрирует счетчик."""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Создает и регистрирует gauge."""
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Создает и регистрирует гистограмму."""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Добавляет функцию, обновляющую gauge перед каждым снимком.
+
+        Args:
+            collector: Синхронная функция без аргументов
+        """
+        self.collectors.append(collector)
+
+    def snapshot(self, include_gauges: bool = True) -> Dict[str, List[Any]]:
+        """
+        Возвращает копию значений всех метрик воркера.
+
+        Вызывается в потоке event loop, после чего снимок можно сохранять
+        или объединять в другом потоке.
+
+        Args:
+            include_gauges: Включать ли gauge (False - итоговый снимок завершающегося воркера)
+        """
+        if include_gauges:
+            for collector in self.collectors:
+                try:
+                    collector()
+                except Exception as ex_:
+                    logger.error(f"Metrics collector {collector} failed: {ex_}")
+        return {
+            name: metric.snapshot()
+            for name, metric in self.metrics.items()
+            if include_gauges or metric.kind != "gauge"
+        }
+
+    def get_snapshot_path(self) -> Path:
+        """Возвращает путь к файлу снимка текущего воркера."""
+        return Path(self.directory, f"worker_{os.getpid()}.json")
+
+    def write_snapshot(self, snapshot: Dict[str, List[Any]]) -> None:
+        """
+        Атомарно сохраняет снимок метрик воркера в директорию снимков.
+
+        Args:
+            snapshot: Снимок, полученный из snapshot()
+        """
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.get_snapshot_path()
+        temporary_path = path.with_suffix(".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(snapshot, file)
+        os.replace(temporary_path, path)
+
+    def read_snapshots(self, snapshot: Dict[str, List[Any]]) -> Iterable[Dict[str, List[Any]]]:
+        """
+        Возвращает снимки всех воркеров.
+
+        Args:
+            snapshot: Актуальный снимок текущего воркера (вместо его файла)
+        """
+        yield snapshot
+        if self.directory is None:
+            return
+        own_path = self.get_snapshot_path()
+        for path in self.directory.glob("worker_*.json"):
+            if path == own_path:
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    worker_snapshot = json.load(file)
+                stale = self.stale_after is not None and time.time() - os.path.getmtime(path) > self.stale_after
+            except (OSError, ValueError) as ex_:
+                logger.warning(f"Skipping metrics snapshot {path}: {ex_}")
+                continue
+            if stale:
+                # Воркер завершен или завис: его счетчики сохраняются, текущее состояние - нет
+                worker_snapshot = {
+                    name: values for name, values in worker_snapshot.items()
+                    if getattr(self.metrics.get(name), "kind", None) != "gauge"
+                }
+            yield worker_snapshot
+
+    def render(self, snapshot: Dict[str, List[Any]]) -> str:
+        """
+        Формирует метрики всех воркеров в текстовом формате Prometheus.
+
+        Args:
+            snapshot: Актуальный снимок текущего воркера
+
+        Returns:
+            Текст для ответа эндпоинта /metrics
+        """
+        merged: Dict[str, Dict[Tuple[str, ...], Any]] = {name: {} for name in self.metrics}
+        for worker_snapshot in self.read_snapshots(snapshot):
+            for name, values in worker_snapshot.items():
+                if name in self.metrics:
+                    self.metrics[name].merge(merged[name], values)
+
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(merged[name]))
+        return "\n".join(lines) + "\n"
+
+    async def render_async(self) -> str:
+        """Формирует метрики в потоке, чтобы чтение снимков не блокировало event loop."""
+        if self.directory is None:
+            return self.render(self.snapshot())
+        return await asyncio.to_thread(self.render, self.snapshot())
+
+    async def run_snapshot_loop(self, interval: float) -> None:
+        """
+        Периодически сохраняет снимок метрик воркера.
+
+        Args:
+            interval: Интервал сохранения (секунды)
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.write_snapshot, self.snapshot())
+            except Exception as ex_:
+                logger.error(f"Metrics snapshot failed: {ex_}")
+
+    def clear_worker_snapshots(self) -> None:
+        """Удаляет снимки воркеров предыдущего запуска сервера."""
+        if self.directory is None:
+            return
+        for path in self.directory.glob("worker_*.*"):
+            path.unlink(missing_ok=True)
+
+
+# Реестр метрик воркера, gauge воркера без свежего снимка (пропущено три сохранения) не учитываются
+registry = MetricsRegistry(
+    directory=PATH_TO_METRICS if METRICS_AGGREGATE_WORKERS else None,
+    stale_after=3 * METRICS_SNAPSHOT_INTERVAL
+)
+
+# Количество HTTP запросов по роутеру, методу и коду ответа
+http_requests_total = registry.counter(
+    "http_requests_total",
+    "Total HTTP requests by router, method and status code.",
+    labelnames=("router", "method", "status"),
+)
+
+# Длительность обработки HTTP запросов по роутеру
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency in seconds by router and method.",
+    labelnames=("router", "method"),
+)
+
+# Отказы в аутентификации по причине (ответы 401 AuthMiddleware)
+auth_failures_total = registry.counter(
+    "auth_failures_total",
+    "Rejected authentications by reason.",
+    labelnames=("reason",),
+)
+
+# Длительность методов репозиториев
+db_query_duration_seconds = registry.histogram(
+    "db_query_duration_seconds",
+    "Repository method latency in seconds by tool and method.",
+    labelnames=("tool", "method"),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# Время выполнения bcrypt в пуле хеширования паролей
+password_hashing_duration_seconds = registry.histogram(
+    "password_hashing_duration_seconds",
+    "Time spent in bcrypt by operation.",
+    labelnames=("operation",),
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# Время ожидания в очереди пула хеширования паролей
+password_hashing_queue_wait_seconds = registry.histogram(
+    "password_hashing_queue_wait_seconds",
+    "Time bcrypt tasks waited for a free hashing worker.",
+    labelnames=("operation",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# Длительность SQL запросов по инструменту и отпечатку запроса (при SQL_INSTRUMENTATION)
+sql_query_duration_seconds = registry.histogram(
+    "sql_query_duration_seconds",
+    "SQL statement latency in seconds by tool and statement fingerprint.",
+    labelnames=("tool", "fingerprint"),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# Количество строк, возвращенных или измененных SQL запросами
+sql_query_rows_total = registry.counter(
+    "sql_query_rows_total",
+    "Rows returned or affected by SQL statements by tool and statement fingerprint.",
+    labelnames=("tool", "fingerprint"),
+)
+
+# Время получения подключения из пула по имени пула (primary, replica), включая ожидание и создание подключения
+db_pool_checkout_wait_seconds = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to check out a connection from the pool by pool name.",
+    labelnames=("pool",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+# Количество превышений DATABASE_POOL_TIMEOUT при получении подключения
+db_pool_timeouts_total = registry.counter(
+    "db_pool_timeouts_total",
+    "Connection checkouts that exceeded the pool timeout by pool name.",
+    labelnames=("pool",),
+)
+
+# Размер пула (постоянные подключения)
+db_pool_size = registry.gauge(
+    "db_pool_size",
+    "Configured pool size by pool name.",
+    labelnames=("pool",),
+)
+
+# Количество выданных (занятых) подключений
+db_pool_checked_out = registry.gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool by pool name.",
+    labelnames=("pool",),
+)
+
+# Количество свободных подключений в пуле
+db_pool_checked_in = registry.gauge(
+    "db_pool_checked_in",
+    "Idle connections currently in the pool by pool name.",
+    labelnames=("pool",),
+)
+
+# Количество дополнительных подключений сверх размера пула
+db_pool_overflow = registry.gauge(
+    "db_pool_overflow",
+    "Overflow connections currently open beyond the pool size by pool name.",
+    labelnames=("pool",),
+)
+
+# Количество запросов дольше SQL_SLOW_QUERY_THRESHOLD
+sql_slow_queries_total = registry.counter(
+    "sql_slow_queries_total",
+    "SQL statements slower than the slow query threshold by tool.",
+    labelnames=("tool",),
+)
+
+# Количество HTTP запросов, выполнивших больше SQL_N_PLUS_ONE_THRESHOLD SQL запросов
+sql_n_plus_one_requests_total = registry.counter(
+    "sql_n_plus_one_requests_total",
+    "HTTP requests that issued more SQL statements than the N+1 threshold by router.",
+    labelnames=("router",),
+)
+
+# Количество исключений, принятых в очередь фоновой записи
+exceptions_captured_total = registry.counter(
+    "exceptions_captured_total",
+    "Exceptions queued for writing by function category.",
+    labelnames=("function_category",),
+)
+
+# Количество исключений, отброшенных при заполненной очереди
+exceptions_dropped_total = registry.counter(
+    "exceptions_dropped_total",
+    "Exceptions dropped because the capture queue was full.",
+)
+
+# Количество исключений, не записанных полностью из-за дедупликации по отпечатку
+exceptions_suppressed_total = registry.counter(
+    "exceptions_suppressed_total",
+    "Exceptions counted without a full dump because their fingerprint reached the per-window limit.",
+    labelnames=("function_category",),
+)
+
+# Количество записей логов, отброшенных при заполненной очереди логгера
+logs_dropped_total = registry.counter(
+    "logs_dropped_total",
+    "Log records dropped because the logger queue was full by logger.",
+    labelnames=("logger",),
+)
+
+# Логгеры не импортируют метрики (utils.metrics сам использует логгер), поэтому счетчик подключается здесь
+for _queue_logger in (logger, access_logger):
+    for _queue_handler in _queue_logger.handlers:
+        if _queue_handler.dropped:
+            logs_dropped_total.inc(_queue_handler.dropped, logger=_queue_logger.name)
+        _queue_handler.on_drop = partial(logs_dropped_total.inc, logger=_queue_logger.name)
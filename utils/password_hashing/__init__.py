@@ -0,0 +1,161 @@
+"""
+Модуль асинхронного хеширования паролей.
+
+Выносит вызовы bcrypt из event loop в ограниченный пул потоков или процессов
+и собирает метрики времени ожидания в очереди и времени хеширования
+(также публикуются в /metrics через utils.metrics).
+"""
+from typing import Any, Callable, Dict, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+import asyncio
+import time
+import bcrypt
+from configuration.settings import (
+    PASSWORD_HASHING_EXECUTOR,
+    PASSWORD_HASHING_MAX_WORKERS,
+    PASSWORD_HASHING_MAX_QUEUE,
+    PASSWORD_HASHING_ROUNDS
+)
+from utils.metrics import password_hashing_duration_seconds, password_hashing_queue_wait_seconds
+
+
+class HashingQueueFullError(Exception):
+    """Очередь пула хеширования заполнена, новая задача отклонена."""
+
+
+def _timed_call(function: Callable, *args) -> tuple:
+    """
+    Выполняет функцию в воркере пула и замеряет время выполнения.
+
+    Использует time.monotonic, так как на Linux эти часы общие для всех процессов,
+    и время начала можно сравнивать с моментом постановки задачи в очередь.
+
+    Returns:
+        Кортеж (результат, время начала, время окончания)
+    """
+    started_at = time.monotonic()
+    result = function(*args)
+    return result, started_at, time.monotonic()
+
+
+def bcrypt_hash(password: str, rounds: int) -> str:
+    """Хеширует пароль с использованием bcrypt."""
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode(), salt).decode('utf-8')
+
+
+def bcrypt_check(provided_password: str, stored_password: str) -> bool:
+    """Проверяет пароль по bcrypt хешу, при неверном формате хеша возвращает False."""
+    try:
+        return bcrypt.checkpw(provided_password.encode(), stored_password.encode())
+    except Exception as ex_:
+        return False
+
+
+class PasswordHashingPool:
+    """
+    Ограниченный пул для выполнения bcrypt вне event loop.
+
+    Одновременно выполняется не более max_workers задач, еще не более max_queue
+    задач ожидают в очереди. Остальные задачи отклоняются с HashingQueueFullError,
+    чтобы всплеск входов не накапливал бесконечную очередь.
+
+    Attributes:
+        executor_type: Тип пула ("thread" или "process")
+        max_workers: Количество одновременно выполняемых задач
+        max_queue: Максимальное количество задач в ожидании
+        metrics: Счетчики и суммарные времена ожидания и хеширования
+    """
+
+    def __init__(self, executor_type: str = "thread", max_workers: int = 4, max_queue: int = 64):
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.executor: Optional[Executor] = None
+        self.pending = 0
+        self.metrics: Dict[str, Any] = dict(
+            submitted=0,
+            rejected=0,
+            completed=0,
+            failed=0,
+            queue_wait_seconds_total=0.0,
+            queue_wait_seconds_max=0.0,
+            hash_seconds_total=0.0,
+            hash_seconds_max=0.0
+        )
+
+    def get_executor(self) -> Executor:
+        """
+        Возвращает пул, создавая его при первом обращении.
+
+        Ленивое создание нужно, чтобы пул процессов создавался уже внутри
+        воркера uvicorn, а не в родительском процессе.
+        """
+        if self.executor is None:
+            if self.executor_type == "process":
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hashing")
+        return self.executor
+
+    async def run(self, function: Callable, *args) -> Any:
+        """
+        Выполняет функцию в пуле и обновляет метрики.
+
+        Args:
+            function: Функция уровня модуля (должна сериализоваться для пула процессов)
+            *args: Аргументы функции
+
+        Returns:
+            Результат функции
+
+        Raises:
+            HashingQueueFullError: Если в пуле уже max_workers + max_queue задач
+        """
+        if self.pending >= self.max_workers + self.max_queue:
+            self.metrics["rejected"] += 1
+            raise HashingQueueFullError("Password hashing queue is full")
+
+        self.pending += 1
+        self.metrics["submitted"] += 1
+        submitted_at = time.monotonic()
+        try:
+            result, started_at, finished_at = await asyncio.get_running_loop().run_in_executor(
+                self.get_executor(), _timed_call, function, *args
+            )
+        except Exception:
+            self.metrics["failed"] += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        queue_wait = max(started_at - submitted_at, 0.0)
+        hash_time = finished_at - started_at
+        self.metrics["completed"] += 1
+        self.metrics["queue_wait_seconds_total"] += queue_wait
+        self.metrics["queue_wait_seconds_max"] = max(self.metrics["queue_wait_seconds_max"], queue_wait)
+        self.metrics["hash_seconds_total"] += hash_time
+        self.metrics["hash_seconds_max"] = max(self.metrics["hash_seconds_max"], hash_time)
+        password_hashing_queue_wait_seconds.observe(queue_wait, operation=function.__name__)
+        password_hashing_duration_seconds.observe(hash_time, operation=function.__name__)
+        return result
+
+    async def hash_password(self, password: str) -> str:
+        """Хеширует пароль с использованием bcrypt в пуле."""
+        return await self.run(bcrypt_hash, password, PASSWORD_HASHING_ROUNDS)
+
+    async def check_password(self, provided_password: str, stored_password: str) -> bool:
+        """Проверяет пароль по bcrypt хешу в пуле."""
+        return await self.run(bcrypt_check, provided_password, stored_password)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Возвращает снимок метрик пула, включая текущее количество задач."""
+        return dict(self.metrics, pending=self.pending, max_workers=self.max_workers, max_queue=self.max_queue)
+
+
+# Пул хеширования паролей воркера
+password_hashing_pool = PasswordHashingPool(
+    executor_type=PASSWORD_HASHING_EXECUTOR,
+    max_workers=PASSWORD_HASHING_MAX_WORKERS,
+    max_queue=PASSWORD_HASHING_MAX_QUEUE
+)
@@ -4,9 +4,23 @@
 Конфигурирует веб-приложение с аутентификацией, CORS и эндпоинтами
 для управления пользователями и различных панелей доступа.
 """
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import asyncio
+from fastapi import Depends, FastAPI, Request, status
+from fastapi.responses import JSONResponse, Response
 from starlette.middleware.cors import CORSMiddleware
 from web_api.dependencies.auth_middleware import AuthMiddleware
+from web_api.dependencies.unit_of_work import UnitOfWorkMiddleware
+from web_api.dependencies.metrics import MetricsMiddleware
+from web_api.dependencies.access_log import AccessLogMiddleware
+from web_api.dependencies.metrics_auth import require_metrics_access
+from utils.password_hashing import HashingQueueFullError
+from utils.cache.channels import invalidation_channel
+from utils.metrics import registry, CONTENT_TYPE
+from utils.exception_handler.handler import exception_writer
+from configuration.settings import AUTH_STATELESS_MODE, REVOCATION_SYNC_INTERVAL, SESSION_REAPER_INTERVAL, SESSION_PARTITION_MAINTENANCE_INTERVAL, METRICS_SNAPSHOT_INTERVAL, ACCESS_LOG_ENABLED
+from database.tools.revoked_tokens import RevokedTokenTool
+from database.tools.sessions import SessionTool
 
 from web_api.endpoints import users
 from web_api.endpoints import user_panel
@@ -14,11 +28,44 @@ from web_api.endpoints import support_panel
 from web_api.endpoints import admin_panel
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запускает и останавливает фоновые компоненты воркера.
+    
+    Args:
+        app: FastAPI приложение
+    """
+    await invalidation_channel.start()
+    background_tasks = []
+    if AUTH_STATELESS_MODE:
+        background_tasks.append(asyncio.create_task(RevokedTokenTool.run_sync_loop(interval=REVOCATION_SYNC_INTERVAL)))
+    # Key-value хранилище удаляет истекшие сессии само, секции нужны только таблице sessions
+    if SESSION_REAPER_INTERVAL > 0 and not SessionTool.store.expires_sessions:
+        background_tasks.append(asyncio.create_task(SessionTool.run_reaper_loop(interval=SESSION_REAPER_INTERVAL)))
+    if SESSION_PARTITION_MAINTENANCE_INTERVAL > 0 and not SessionTool.store.expires_sessions:
+        background_tasks.append(asyncio.create_task(SessionTool.run_storage_loop(interval=SESSION_PARTITION_MAINTENANCE_INTERVAL)))
+    if registry.directory is not None:
+        background_tasks.append(asyncio.create_task(registry.run_snapshot_loop(interval=METRICS_SNAPSHOT_INTERVAL)))
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await SessionTool.store.close()
+        await invalidation_channel.stop()
+        await asyncio.to_thread(exception_writer.stop)
+        # Итоговый снимок, чтобы счетчики завершенного воркера сохранились в /metrics (без gauge текущего состояния)
+        registry.write_snapshot(registry.snapshot(include_gauges=False))
+
+
 # FastAPI приложение с конфигурацией API документации
 app = FastAPI(
     title="Test Task Effective Mobile",
     description="Backend API for Test Task Effective Mobile",
     version="1.0.0",
+    lifespan=lifespan,
 )
 app.add_middleware(
     CORSMiddleware,
@@ -30,8 +77,37 @@ app.add_middleware(
 app.add_middleware(
     AuthMiddleware
 )
+# Добавляется после AuthMiddleware, чтобы проверка сессии выполнялась в том же unit of work
+app.add_middleware(
+    UnitOfWorkMiddleware
+)
+# Добавляется снаружи AuthMiddleware, чтобы в журнал попадали и отклоненные запросы с причиной отказа
+if ACCESS_LOG_ENABLED:
+    app.add_middleware(
+        AccessLogMiddleware
+    )
+# Добавляется последним, чтобы длительность запроса включала все остальные middleware
+app.add_middleware(
+    MetricsMiddleware
+)
 
 app.include_router(users.router, prefix="/users")
 app.include_router(user_panel.router, prefix="/user-panel")
 app.include_router(support_panel.router, prefix="/support-panel")
-app.include_router(admin_panel.router, prefix="/admin-panel")
\ No newline at end of file
+app.include_router(admin_panel.router, prefix="/admin-panel")
+
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_access)])
+async def web_api_metrics():
+    """Возвращает метрики всех воркеров в текстовом формате Prometheus (доступ - METRICS_ALLOWED_IPS или METRICS_TOKEN)."""
+    return Response(content=await registry.render_async(), media_type=CONTENT_TYPE)
+
+
+@app.exception_handler(HashingQueueFullError)
+async def hashing_queue_full_handler(request: Request, exception: HashingQueueFullError):
+    """Отвечает 503, если пул хеширования паролей перегружен."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service temporarily overloaded"},
+        headers={"Retry-After": "1"}
+    )
@@ -0,0 +1,118 @@
+"""
+Middleware, записывающий журнал HTTP запросов (access log).
+
+Каждый запрос записывается одной строкой JSON в assets/access_logs/access.txt
+через access_logger: запрос только помещает словарь в очередь, сериализация и
+запись в файл выполняются фоновым потоком. Доля записываемых запросов задается
+по классу кода ответа настройкой ACCESS_LOG_SAMPLE_RATES.
+"""
+from datetime import datetime, timezone
+from typing import Dict
+import random
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from configuration.paths import PATH_TO_ACCESS_LOGS
+from configuration.settings import ACCESS_LOG_SAMPLE_RATES
+from utils.loggers import access_logger
+
+
+def parse_sample_rates(value: str) -> Dict[int, float]:
+    """
+    Разбирает доли записываемых запросов по классу кода ответа.
+
+    Некорректные элементы пропускаются, доли ограничиваются диапазоном [0, 1].
+
+    Args:
+        value: Строка вида "2xx=0.01,4xx=1"
+
+    Returns:
+        Доля по первой цифре кода ответа (2 - для 2xx)
+    """
+    rates = {}
+    for item in value.split(","):
+        status_class, _, rate = item.strip().partition("=")
+        status_class = status_class.strip().lower()
+        if len(status_class) != 3 or not status_class.endswith("xx") or not status_class[0].isdigit():
+            continue
+        try:
+            rates[int(status_class[0])] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+# Доли записываемых запросов по классу кода ответа, для остальных классов - 1
+SAMPLE_RATES = parse_sample_rates(ACCESS_LOG_SAMPLE_RATES)
+
+
+class AccessLogMiddleware:
+    """
+    ASGI middleware, записывающий метод, шаблон пути, код ответа и длительность каждого HTTP запроса.
+
+    Пользователь берется из поля sub проверенного JWT (request.state.auth),
+    причина отказа - из request.state.auth_failure_reason, который заполняет
+    AuthMiddleware. Запрос, завершившийся исключением до начала ответа,
+    записывается с кодом 500. В запись добавляется sample_rate, чтобы при
+    подсчете по журналу можно было восстановить полное количество запросов.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """
+        Обрабатывает HTTP запрос и записывает его в журнал.
+
+        Args:
+            scope: ASGI scope запроса
+            receive: ASGI канал получения сообщений
+            send: ASGI канал отправки сообщений
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started_at = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started_at
+            sample_rate = SAMPLE_RATES.get(status_code // 100, 1.0)
+            if sample_rate >= 1.0 or random.random() < sample_rate:
+                self.write(scope, status_code, duration, sample_rate)
+
+    @staticmethod
+    def write(scope: Scope, status_code: int, duration: float, sample_rate: float) -> None:
+        """
+        Помещает запись о запросе в очередь журнала.
+
+        Args:
+            scope: ASGI scope запроса
+            status_code: Код ответа
+            duration: Длительность обработки (секунды)
+            sample_rate: Доля записываемых запросов с таким кодом ответа
+        """
+        state = scope.get("state") or {}
+        auth = state.get("auth")
+        route = scope.get("route")
+        access_logger.info(
+            dict(
+                timestamp=datetime.now(timezone.utc).isoformat(),
+                method=scope["method"],
+                route=getattr(route, "path", None),
+                path=scope["path"],
+                status=status_code,
+                duration=round(duration, 6),
+                user_id=auth.payload.get("sub") if auth is not None else None,
+                auth_failure_reason=state.get("auth_failure_reason"),
+                sample_rate=sample_rate,
+            ),
+            extra=dict(path=PATH_TO_ACCESS_LOGS, log_filename="access")
+        )
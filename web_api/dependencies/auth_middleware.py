@@ -1,65 +1,133 @@
 """
 Middleware для аутентификации пользователей через JWT токены в cookies.
 """
-from fastapi import Request, status, HTTPException
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Optional
+from configuration.settings import AUTH_STATELESS_MODE
+from database.tools.revoked_tokens import RevokedTokenTool
 from web_api.dependencies.cookies_auth import get_jwt_payload
-from database.tools.sessions import SessionTool
+from web_api.dependencies.auth_resolver import resolve_auth_context, resolve_stateless_auth_context, is_stateless_token
+from utils.metrics import auth_failures_total
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
+# Эндпоинты, доступные без аутентификации (/users/refresh проверяет токен сам,
+# /metrics проверяет адрес клиента и токен METRICS_TOKEN в require_metrics_access)
+PUBLIC_PATHS = frozenset(["/docs", "/redoc", "/openapi.json", "/metrics", "/users/sign-up", "/users/sign-in", "/users/refresh"])
+
+
+def get_cookie_from_scope(scope: Scope, name: str) -> Optional[str]:
+    """
+    Получает значение cookie напрямую из заголовков ASGI scope.
+
+    Args:
+        scope: ASGI scope запроса
+        name: Имя cookie
+
+    Returns:
+        Значение cookie или None если cookie отсутствует
+    """
+    for header_name, header_value in scope["headers"]:
+        if header_name == b"cookie":
+            value = cookie_parser(header_value.decode("latin-1")).get(name)
+            if value:
+                return value
+    return None
+
+
+def unauthorized_response(scope: Scope, detail: str, reason: str, delete_cookie: bool = True) -> JSONResponse:
+    """
+    Формирует ответ 401, учитывает отказ в метрике auth_failures_total и при необходимости удаляет cookie с токеном.
+
+    Причина отказа сохраняется в scope["state"]["auth_failure_reason"] для журнала HTTP запросов.
+
+    Args:
+        scope: ASGI scope запроса
+        detail: Текст ошибки
+        reason: Причина отказа для метрики (missing_token, invalid_token, expired_token, revoked_token, session_not_found)
+        delete_cookie: Удалять ли cookie access_token
+
+    Returns:
+        JSON ответ с ошибкой аутентификации
+    """
+    auth_failures_total.inc(reason=reason)
+    scope.setdefault("state", {})["auth_failure_reason"] = reason
+    response = JSONResponse(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        content={"detail": detail}
+    )
+    if delete_cookie:
+        response.delete_cookie(
+            key="access_token",
+            path="/",
+            domain=None
+        )
+    return response
+
+
+class AuthMiddleware:
     """
-    Middleware для проверки аутентификации пользователей.
-    
+    ASGI middleware для проверки аутентификации пользователей.
+
     Проверяет наличие и валидность JWT токена в cookies для всех запросов,
     кроме публичных эндпоинтов (регистрация, вход, документация).
+    Сохраняет контекст аутентификации в request.state.auth.
+
+    Реализован без BaseHTTPMiddleware: не создает отдельных задач и не
+    оборачивает поток ответа, поэтому streaming ответы проходят без изменений.
+
+    В режиме AUTH_STATELESS_MODE короткоживущие токены принимаются по подписи
+    и списку отозванных jti, без обращения к базе данных. Истекший токен в этом
+    режиме не удаляется из cookies, чтобы клиент мог обновить его через /users/refresh.
     """
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """
         Обрабатывает каждый HTTP запрос для проверки аутентификации.
-        
+
         Args:
-            request: HTTP запрос
-            call_next: Следующий обработчик в цепочке middleware
-            
-        Returns:
-            HTTP ответ с проверкой токена или ошибкой аутентификации
+            scope: ASGI scope запроса
+            receive: ASGI канал получения сообщений
+            send: ASGI канал отправки сообщений
         """
-        if request.url.path in ["/docs", "/redoc", "/openapi.json", "/users/sign-up", "/users/sign-in"]:
-            return await call_next(request)
-            
-        access_token = request.cookies.get("access_token")
-        
+        if scope["type"] != "http" or scope["path"] in PUBLIC_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        access_token = get_cookie_from_scope(scope, "access_token")
+
         if not access_token:
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": "Access token required"}
-            )
-        
+            response = unauthorized_response(scope, "Access token required", reason="missing_token", delete_cookie=False)
+            await response(scope, receive, send)
+            return
+
         payload = get_jwt_payload(access_token)
         if payload is None:
-            response = JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": "Invalid or expired access token"}
-            )
-            response.delete_cookie(
-                key="access_token",
-                path="/",
-                domain=None
-            )
-            return response
-        elif not await SessionTool.get_by_user_id_and_access_token(user_id=payload.get("sub"), access_token=access_token):
-            response = JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": "Expired access token"}
-            )
-            response.delete_cookie(
-                key="access_token",
-                path="/",
-                domain=None
-            )
-            return response
-        
-        response = await call_next(request)
-        return response
+            if AUTH_STATELESS_MODE and get_jwt_payload(access_token, verify_exp=False) is not None:
+                response = unauthorized_response(scope, "Access token expired", reason="expired_token", delete_cookie=False)
+            else:
+                response = unauthorized_response(scope, "Invalid or expired access token", reason="invalid_token")
+            await response(scope, receive, send)
+            return
+
+        if AUTH_STATELESS_MODE and is_stateless_token(payload):
+            if RevokedTokenTool.is_revoked(payload["jti"]):
+                response = unauthorized_response(scope, "Revoked access token", reason="revoked_token")
+                await response(scope, receive, send)
+                return
+            auth_context = await resolve_stateless_auth_context(payload=payload, access_token=access_token)
+        else:
+            auth_context = await resolve_auth_context(payload=payload, access_token=access_token)
+
+        if auth_context is None:
+            response = unauthorized_response(scope, "Expired access token", reason="session_not_found")
+            await response(scope, receive, send)
+            return
+
+        # request.state использует scope["state"], поэтому контекст доступен в dependencies
+        scope.setdefault("state", {})["auth"] = auth_context
+        await self.app(scope, receive, send)
@@ -0,0 +1,112 @@
+"""
+Модуль единого разрешения аутентификации запроса.
+
+JWT декодируется один раз в AuthMiddleware, сессия, пользователь и права роли
+проверяются одним запросом (результат кешируется как SessionIdentity) и
+сохраняются в request.state.auth для dependencies. Пользователь из этого
+запроса передается в контекст без повторной загрузки, при попадании в кеш
+get_user загружает его в рамках текущего запроса.
+В режиме AUTH_STATELESS_MODE короткоживущие токены проверяются без базы данных.
+"""
+from fastapi import Request
+from typing import Any, Dict, FrozenSet, Optional
+import datetime
+from configuration.settings import STATELESS_ACCESS_TOKEN_LIFETIME
+from database.models.users import UserModel
+from database.tools.sessions import SessionTool, SessionIdentity
+from database.tools.role_rules import RoleRuleTool
+from database.tools.revoked_tokens import RevokedTokenTool
+
+
+class AuthContext:
+    """
+    Результат аутентификации запроса.
+
+    Attributes:
+        payload: Payload проверенного JWT токена
+        access_token: JWT токен из cookies
+        session: Данные сессии из кеша проверки (None при проверке без базы данных)
+        user: Пользователь, загруженный при проверке сессии (при попадании в кеш - get_user по требованию)
+        rules: Права роли пользователя
+    """
+    __slots__ = ("payload", "access_token", "session", "user", "rules")
+
+    def __init__(self, payload: Dict[str, Any], access_token: str, session: Optional[SessionIdentity], user: Optional[UserModel], rules: FrozenSet[str]):
+        self.payload = payload
+        self.access_token = access_token
+        self.session = session
+        self.user = user
+        self.rules = rules
+
+
+async def resolve_auth_context(payload: Dict[str, Any], access_token: str) -> Optional[AuthContext]:
+    """
+    Проверяет сессию и получает права по уже проверенному JWT токену.
+
+    Сессия отклоняется, если пользователь деактивирован или срок сессии
+    истек: данные могут быть взяты из кеша проверки, поэтому статус и срок
+    проверяются при каждом запросе.
+
+    Args:
+        payload: Payload проверенного JWT токена
+        access_token: JWT токен из cookies
+
+    Returns:
+        Контекст аутентификации или None если сессия не найдена, истекла или пользователь не активен
+    """
+    identity, dbUser = await SessionTool.get_session_identity(user_id=payload["sub"], access_token=access_token)
+    if identity is None or not identity.is_active or identity.expires_at <= datetime.datetime.now():
+        return None
+    return AuthContext(payload=payload, access_token=access_token, session=identity, user=dbUser, rules=identity.rules)
+
+
+def is_stateless_token(payload: Dict[str, Any]) -> bool:
+    """
+    Проверяет, можно ли принять токен только по подписи.
+
+    Подходят короткоживущие токены с ролью в payload и только после первой
+    загрузки списка отозванных токенов. Остальные токены (например, выданные
+    на полный срок до включения режима) проверяются по таблице sessions.
+
+    Args:
+        payload: Payload проверенного JWT токена
+
+    Returns:
+        True, если токен можно проверить без базы данных
+    """
+    return (
+        RevokedTokenTool.revoked_ready
+        and "role" in payload
+        and payload["exp"] - payload["iat"] <= STATELESS_ACCESS_TOKEN_LIFETIME
+    )
+
+
+async def resolve_stateless_auth_context(payload: Dict[str, Any], access_token: str) -> AuthContext:
+    """
+    Формирует контекст аутентификации по payload короткоживущего токена.
+
+    Права роли берутся из индекса RoleRuleTool в памяти, пользователь
+    загружается только если он нужен эндпоинту (см. get_user).
+
+    Args:
+        payload: Payload проверенного и не отозванного JWT токена
+        access_token: JWT токен из cookies
+
+    Returns:
+        Контекст аутентификации без сессии и пользователя
+    """
+    rules = await RoleRuleTool.get_rules_by_role_name(role_name=payload["role"])
+    return AuthContext(payload=payload, access_token=access_token, session=None, user=None, rules=rules)
+
+
+def get_auth_context(request: Request) -> Optional[AuthContext]:
+    """
+    Возвращает контекст аутентификации, сохраненный AuthMiddleware.
+
+    Args:
+        request: HTTP запрос
+
+    Returns:
+        Контекст аутентификации или None для публичных эндпоинтов
+    """
+    return getattr(request.state, "auth", None)
@@ -2,29 +2,47 @@
 Модуль для работы с JWT токенами в cookies.
 
 Предоставляет функции для создания, валидации и установки JWT токенов.
+Проверенные payload кешируются в памяти воркера до истечения токена.
 """
 import datetime
 from jose import jwt, JWTError, ExpiredSignatureError
 from fastapi import Response
 from typing import Optional, Dict, Any
+from configuration.settings import (
+    ACCESS_TOKEN_LIFETIME,
+    AUTH_STATELESS_MODE,
+    STATELESS_ACCESS_TOKEN_LIFETIME,
+    JWT_PAYLOAD_CACHE_MAX_SIZE,
+    JWT_PAYLOAD_CACHE_TTL
+)
+from utils.cache import LRUTTLCache, MISSING
 import random
 import string
 import time
 
 
-def create_jwt_token(user_id: int) -> str:
+# Обязательные поля payload токена
+REQUIRED_CLAIMS = ["exp", "iat", "nbf", "sub", "jti"]
+
+# Кеш проверенных payload по токену, запись живет не дольше самого токена
+jwt_payload_cache = LRUTTLCache(max_size=JWT_PAYLOAD_CACHE_MAX_SIZE, ttl=JWT_PAYLOAD_CACHE_TTL)
+
+
+def create_jwt_token(user_id: int, role: Optional[str] = None, lifetime: int = ACCESS_TOKEN_LIFETIME) -> str:
     """
     Создает JWT токен для пользователя.
     
     Args:
         user_id: Идентификатор пользователя
+        role: Роль пользователя, добавляется в payload для проверки прав без базы данных
+        lifetime: Срок действия токена в секундах
         
     Returns:
-        Подписанный JWT токен со сроком действия 7 дней
+        Подписанный JWT токен (по умолчанию со сроком действия 7 дней)
     """
     now = datetime.datetime.now(datetime.timezone.utc)
     now_timestamp = int(time.time())
-    expiration = now + datetime.timedelta(seconds=60 * 60 * 24 * 7)
+    expiration = now + datetime.timedelta(seconds=lifetime)
     expiration_timestamp = int(expiration.timestamp())
     session_id = "".join(random.choices(string.ascii_letters + string.digits, k=16))
     
@@ -35,6 +53,8 @@ def create_jwt_token(user_id: int) -> str:
         "nbf": now_timestamp,
         "exp": expiration_timestamp,
     }
+    if role is not None:
+        payload["role"] = role
     
     return jwt.encode(
         payload,
@@ -43,63 +63,103 @@ def create_jwt_token(user_id: int) -> str:
     )
 
 
-def set_auth_cookie(response: Response, user_id: int) -> str:
+def set_auth_cookie(response: Response, user_id: int, role: Optional[str] = None) -> str:
     """
     Создает JWT токен и устанавливает его в секюрную cookie.
     
+    В режиме AUTH_STATELESS_MODE токен выдается на STATELESS_ACCESS_TOKEN_LIFETIME
+    и содержит роль пользователя, а cookie живет весь срок сессии, чтобы
+    истекший токен можно было обменять на новый через /users/refresh.
+    
     Args:
         response: HTTP ответ для установки cookie
         user_id: Идентификатор пользователя
+        role: Роль пользователя
         
     Returns:
         Созданный токен
     """
-    token = create_jwt_token(user_id)
+    if AUTH_STATELESS_MODE:
+        token = create_jwt_token(user_id, role=role, lifetime=STATELESS_ACCESS_TOKEN_LIFETIME)
+    else:
+        token = create_jwt_token(user_id)
     response.set_cookie(
         key="access_token",
         value=token,
         httponly=True,
         secure=True,
         samesite="lax",
-        max_age=60 * 60 * 24 * 7,
+        max_age=ACCESS_TOKEN_LIFETIME,
         path="/"
     )
     return token
 
 
-def get_jwt_payload(token: str) -> Optional[Dict[str, Any]]:
+def decode_jwt(token: str, verify_exp: bool = True) -> Dict[str, Any]:
+    """
+    Проверяет и декодирует JWT токен.
+    
+    Args:
+        token: JWT токен
+        verify_exp: Проверять ли срок действия
+        
+    Returns:
+        Payload токена
+        
+    Raises:
+        JWTError: Если токен невалиден
+    """
+    return jwt.decode(
+        token, 
+        "secret", 
+        algorithms=["HS256"],
+        options={
+            "verify_signature": True,
+            "verify_exp": verify_exp,
+            "verify_nbf": True,
+            "verify_iat": True,
+            "verify_aud": False,
+            "require": REQUIRED_CLAIMS
+        }
+    )
+
+
+def get_jwt_payload(token: str, verify_exp: bool = True) -> Optional[Dict[str, Any]]:
     """
     Валидирует JWT токен и извлекает его payload.
     
+    Результат успешной проверки с verify_exp кешируется по токену
+    на JWT_PAYLOAD_CACHE_TTL, но не дольше срока действия токена.
+    
     Args:
         token: JWT токен для валидации
+        verify_exp: Проверять ли срок действия (False - только подпись, для обновления токена)
         
     Returns:
         Словарь с payload токена или None если токен невалиден
     """
+    if not token:
+        return None
+
+    if verify_exp:
+        cached = jwt_payload_cache.get(token)
+        if cached is not MISSING:
+            return dict(cached)
+
     try:
-        payload = jwt.decode(
-            token, 
-            "secret", 
-            algorithms=["HS256"],
-            options={
-                "verify_signature": True,
-                "verify_exp": True,
-                "verify_nbf": True,
-                "verify_iat": True,
-                "verify_aud": False,
-                "require": ["exp", "iat", "nbf", "sub", "jti"]
-            }
-        )
+        payload = decode_jwt(token, verify_exp=verify_exp)
         
         if "sub" not in payload or "jti" not in payload:
             return None
             
         payload["sub"] = int(payload["sub"])
-        return payload
     except ExpiredSignatureError as ex_:
         return None
     except JWTError as ex_:
         return None
     except Exception as ex_:
         return None
+
+    if verify_exp:
+        jwt_payload_cache.set(token, payload, ttl=min(JWT_PAYLOAD_CACHE_TTL, payload["exp"] - time.time()))
+    return dict(payload)
@@ -0,0 +1,77 @@
+"""
+Middleware, собирающий метрики HTTP запросов.
+"""
+from contextlib import nullcontext
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from configuration.settings import SQL_INSTRUMENTATION
+from database.instrumentation import track_request_queries
+from utils.metrics import http_requests_total, http_request_duration_seconds
+
+
+# Роутеры приложения по первому сегменту пути, остальные пути учитываются как "other"
+ROUTERS = frozenset(["users", "user-panel", "support-panel", "admin-panel"])
+
+# Стандартные HTTP методы, остальные учитываются как "other"
+METHODS = frozenset(["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+
+
+def get_router_label(path: str) -> str:
+    """
+    Возвращает метку роутера по пути запроса.
+
+    Метка ограничена известными роутерами, чтобы произвольные пути
+    не создавали неограниченное количество временных рядов.
+
+    Args:
+        path: Путь запроса
+
+    Returns:
+        Префикс роутера без "/" или "other"
+    """
+    prefix = path.lstrip("/").partition("/")[0]
+    return prefix if prefix in ROUTERS else "other"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware, учитывающий количество и длительность HTTP запросов по роутерам.
+
+    Длительность измеряется до завершения отправки ответа, включая
+    аутентификацию и фиксацию unit of work. Запрос, завершившийся исключением
+    до начала ответа, учитывается с кодом 500. При SQL_INSTRUMENTATION также
+    считает SQL запросы запроса для обнаружения N+1.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """
+        Обрабатывает HTTP запрос и записывает его метрики.
+
+        Args:
+            scope: ASGI scope запроса
+            receive: ASGI канал получения сообщений
+            send: ASGI канал отправки сообщений
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        router = get_router_label(scope["path"])
+        started_at = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            with track_request_queries(path=scope["path"], router=router) if SQL_INSTRUMENTATION else nullcontext():
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            method = scope["method"] if scope["method"] in METHODS else "other"
+            http_requests_total.inc(router=router, method=method, status=status_code)
+            http_request_duration_seconds.observe(time.perf_counter() - started_at, router=router, method=method)
@@ -0,0 +1,81 @@
+"""
+Модуль проверки доступа к эндпоинту /metrics.
+
+/metrics не требует cookie с JWT (Prometheus их не передает), доступ
+ограничивается списком адресов METRICS_ALLOWED_IPS и токеном METRICS_TOKEN.
+"""
+from typing import List, Optional, Union
+import hmac
+import ipaddress
+from fastapi import HTTPException, Request, status
+from configuration.settings import METRICS_ALLOWED_IPS, METRICS_TOKEN
+from utils.loggers import logger
+
+
+def parse_networks(value: str) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    """
+    Разбирает список адресов и подсетей.
+
+    Некорректные элементы пропускаются с предупреждением в логе.
+
+    Args:
+        value: Строка вида "127.0.0.1,::1,10.0.0.0/8"
+
+    Returns:
+        Список подсетей (адрес - подсеть из одного адреса)
+    """
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning(f"Invalid METRICS_ALLOWED_IPS entry: {item}")
+    return networks
+
+
+# Адреса, с которых /metrics доступен без токена
+ALLOWED_NETWORKS = parse_networks(METRICS_ALLOWED_IPS)
+
+
+def is_allowed_ip(host: Optional[str]) -> bool:
+    """Проверяет, входит ли адрес клиента в METRICS_ALLOWED_IPS."""
+    if not host:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in ALLOWED_NETWORKS)
+
+
+def has_valid_token(authorization: Optional[str]) -> bool:
+    """Проверяет заголовок Authorization: Bearer <METRICS_TOKEN>."""
+    if not METRICS_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+
+
+async def require_metrics_access(request: Request) -> None:
+    """
+    Dependency, разрешающая доступ к /metrics с адресов METRICS_ALLOWED_IPS или с токеном METRICS_TOKEN.
+
+    Адрес клиента берется из подключения (request.client), за обратным
+    прокси это адрес прокси.
+
+    Args:
+        request: HTTP запрос
+
+    Raises:
+        HTTPException: Если адрес не разрешен и токен не передан или неверен (403)
+    """
+    host = request.client.host if request.client else None
+    if is_allowed_ip(host) or has_valid_token(request.headers.get("authorization")):
+        return
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Forbidden"
+    )
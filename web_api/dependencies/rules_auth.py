@@ -1,11 +1,10 @@
 """
 Модуль для проверки прав пользователя на основе ролей.
 """
-from database.models.users import UserModel
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from web_api.dependencies.users_auth import get_user
+from web_api.dependencies.auth_resolver import get_auth_context
 from database.tools.role_rules import RoleRuleTool
-from database.models.role_rules import RoleRuleModel
 
 
 def require_rule(rule: str):
@@ -26,8 +25,16 @@ def require_rule(rule: str):
         async def admin_endpoint():
             return {"message": "Admin content"}
     """
-    async def rule_dependency(user: UserModel = Depends(get_user)):
-        if not user or rule not in [dbRoleRule.rule_name for dbRoleRule in await RoleRuleTool.get_all_with_filters(filters=[RoleRuleModel.role_name == user.role])]:
+    async def rule_dependency(request: Request):
+        # Права уже загружены AuthMiddleware, пользователь для проверки не нужен
+        if auth_context := get_auth_context(request):
+            rules = auth_context.rules
+        elif user := await get_user(request=request, access_token=request.cookies.get("access_token")):
+            rules = await RoleRuleTool.get_rules_by_role_name(role_name=user.role)
+        else:
+            rules = frozenset()
+
+        if rule not in rules:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, 
                 detail="Forbidden"
@@ -0,0 +1,53 @@
+"""
+Middleware, открывающий unit of work на каждый HTTP запрос.
+"""
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from database.unit_of_work import unit_of_work, commit_unit_of_work, rollback_unit_of_work
+
+
+class UnitOfWorkMiddleware:
+    """
+    ASGI middleware, выполняющий весь запрос в одном unit of work.
+
+    Все обращения к базе данных в запросе (включая проверку сессии в
+    AuthMiddleware) используют одно подключение и одну транзакцию.
+    Транзакция фиксируется перед отправкой ответа с кодом меньше 400 и
+    откатывается для ответов с ошибкой, поэтому клиент не получает успешный
+    ответ для незафиксированных изменений. Записи, которые должны сохраниться
+    и при ответе с ошибкой (например, миграция хеша пароля при входе
+    неактивного пользователя), выполняются в database.unit_of_work.standalone. Подключение берется из пула
+    только при первом обращении к базе данных и, пока в запросе не было
+    записи, возвращается в пул на время хеширования паролей
+    (release_idle_connection). Выгрузки NDJSON читают данные собственной
+    сессией вне unit of work.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """
+        Обрабатывает HTTP запрос внутри unit of work.
+
+        Args:
+            scope: ASGI scope запроса
+            receive: ASGI канал получения сообщений
+            send: ASGI канал отправки сообщений
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async with unit_of_work() as session:
+            response_started = False
+
+            async def send_wrapper(message: Message):
+                nonlocal response_started
+                if message["type"] == "http.response.start" and not response_started:
+                    response_started = True
+                    if message["status"] < 400:
+                        await commit_unit_of_work(session)
+                    else:
+                        await rollback_unit_of_work(session)
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
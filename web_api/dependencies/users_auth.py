@@ -1,20 +1,23 @@
 """
 Модуль для получения текущего пользователя из JWT токена.
 """
-from fastapi import Cookie
+from fastapi import Cookie, Request
 from typing import Annotated, Union
 from database.tools.users import UserTool
 from web_api.dependencies.cookies_auth import get_jwt_payload
+from web_api.dependencies.auth_resolver import get_auth_context
 from database.models.users import UserModel
 
 
 async def get_user(
+    request: Request,
     access_token: Annotated[str | None, Cookie(alias="access_token")] = None,
 ) -> Union[UserModel, None]:
     """
     Получает текущего аутентифицированного пользователя из JWT токена в cookies.
     
     Args:
+        request: HTTP запрос
         access_token: JWT токен из cookies браузера
         
     Returns:
@@ -23,7 +26,16 @@ async def get_user(
     Note:
         Используется как dependency в FastAPI эндпоинтах для получения
         текущего пользователя после прохождения middleware аутентификации.
+        Пользователь, загруженный AuthMiddleware при проверке сессии, не
+        загружается повторно. Если сессия взята из кеша проверки (он хранит
+        только неизменяемые данные, а не объекты моделей), пользователь
+        загружается один раз за запрос.
     """
+    if auth_context := get_auth_context(request):
+        if auth_context.user is None:
+            # Сессия взята из кеша: пользователь загружается по требованию, в рамках текущего запроса
+            auth_context.user = await UserTool(auth_context.payload["sub"]).get()
+        return auth_context.user
     if payload_temp := get_jwt_payload(access_token):
         return await UserTool(payload_temp["sub"]).get()
     return None
\ No newline at end of file
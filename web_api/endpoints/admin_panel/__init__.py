@@ -3,18 +3,29 @@
 
 Маршруты для административных операций. Все эндпоинты требуют право "admin_panel".
 """
-from fastapi import APIRouter, Request, Depends, HTTPException, status
+from fastapi import APIRouter, Request, Depends, HTTPException, Query, status
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from configuration.settings import ADMIN_PAGE_SIZE_DEFAULT, ADMIN_PAGE_SIZE_MAX, EXPORT_BATCH_SIZE
+import json
 from web_api.dependencies.rules_auth import require_rule
-from fastapi.responses import JSONResponse
-from web_api.endpoints.admin_panel.schematics import AdminPanelResponse, RolesAndRulesResponse, CreateRoleRequest, CreateRoleResponse, CreateRuleRequest, CreateRuleResponse, CreateRoleRuleRequest, CreateRoleRuleResponse, DeleteRoleRequest, DeleteRoleResponse, DeleteRuleRequest, DeleteRuleResponse, DeleteRoleRuleRequest, DeleteRoleRuleResponse, RulesResponse, RolesResponse, RuleItem, RoleItem
+from fastapi.responses import JSONResponse, StreamingResponse
+from web_api.endpoints.admin_panel.schematics import AdminPanelResponse, RolesAndRulesResponse, CreateRoleRequest, CreateRoleResponse, CreateRuleRequest, CreateRuleResponse, CreateRoleRuleRequest, CreateRoleRuleResponse, DeleteRoleRequest, DeleteRoleResponse, DeleteRuleRequest, DeleteRuleResponse, DeleteRoleRuleRequest, DeleteRoleRuleResponse, RulesResponse, RolesResponse, RuleItem, RoleItem, DatabasePoolResponse
 
 from database.tools.role_rules import RoleRuleTool
 from database.tools.roles import RoleTool
 from database.tools.rules import RuleTool
+from database.tools.users import UserTool
+from database.tools.sessions import SessionTool
 
 from database.models.roles import RoleModel
 from database.models.rules import RuleModel
 from database.models.role_rules import RoleRuleModel
+from database.models.users import UserModel
+from database.models.sessions import SessionModel
+from database.pagination import InvalidCursorError
+from database.base import engine, read_engine
+from database.pool import get_pool_status
+from database.unit_of_work import standalone
 
 # Router для административной панели с обязательной проверкой прав админа
 router = APIRouter(dependencies=[require_rule("admin_panel")])
@@ -52,6 +63,41 @@ async def web_api_admin_panel(
     )
 
 
+@router.get(
+    '/database-pool',
+    description="Состояние пула подключений к базе данных",
+    response_model=DatabasePoolResponse,
+    response_model_exclude_none=True
+)
+async def web_api_database_pool(
+    request: Request,
+):
+    """
+    Возвращает состояние и метрики пула подключений к базе данных.
+    
+    Показывает количество занятых, свободных и дополнительных подключений,
+    а также время получения подключений из пула основной базы данных и реплики
+    для чтения. Значения относятся к воркеру, обработавшему запрос; сумма по
+    всем воркерам публикуется в /metrics (db_pool_*).
+    
+    Args:
+        request: HTTP запрос
+        
+    Returns:
+        JSON ответ с состоянием и метриками пула подключений
+    """
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=dict(
+            success=True,
+            content=dict(
+                primary=get_pool_status(engine.pool),
+                replica=get_pool_status(read_engine.pool) if read_engine is not None else None
+            )
+        )
+    )
+
+
 @router.get(
     '/rules',
     description="Получить список правил",
@@ -60,21 +106,28 @@ async def web_api_admin_panel(
 )
 async def web_api_get_rules(
     request: Request,
+    limit: int = Query(ADMIN_PAGE_SIZE_DEFAULT, ge=1, le=ADMIN_PAGE_SIZE_MAX, description="Количество правил на странице"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из предыдущего ответа"),
 ):
     """
-    Получает полный список всех правил доступа в системе.
+    Получает страницу списка правил доступа в системе.
     
-    Возвращает все правила с их именами и комментариями для управления.
-    Используется для отображения доступных правил в административной панели.
+    Возвращает правила с их именами и комментариями для управления, отсортированные
+    по имени. Используется для отображения доступных правил в административной панели.
     Доступен только администраторам.
     
     Args:
         request: HTTP запрос
+        limit: Количество правил на странице
+        cursor: Курсор следующей страницы
         
     Returns:
-        JSON ответ со списком правил в формате [{name: str, comment: str}]
+        JSON ответ со списком правил в формате [{name: str, comment: str}] и курсором следующей страницы
     """
-    dbRules = await RuleTool.get_all()
+    try:
+        dbRules, next_cursor = await RuleTool.get_page(limit=limit, cursor=cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
     content = [
         dict(name=rule.name, comment=rule.comment)
         for rule in dbRules
@@ -83,7 +136,8 @@ async def web_api_get_rules(
         status_code=status.HTTP_200_OK,
         content=dict(
             success=True,
-            content=content
+            content=content,
+            next_cursor=next_cursor
         )
     )
 
@@ -96,21 +150,28 @@ async def web_api_get_rules(
 )
 async def web_api_get_roles(
     request: Request,
+    limit: int = Query(ADMIN_PAGE_SIZE_DEFAULT, ge=1, le=ADMIN_PAGE_SIZE_MAX, description="Количество ролей на странице"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из предыдущего ответа"),
 ):
     """
-    Получает полный список всех ролей в системе.
+    Получает страницу списка ролей в системе.
     
-    Возвращает все роли с их именами и комментариями для управления.
-    Используется для отображения доступных ролей в административной панели.
+    Возвращает роли с их именами и комментариями для управления, отсортированные
+    по имени. Используется для отображения доступных ролей в административной панели.
     Доступен только администраторам.
     
     Args:
         request: HTTP запрос
+        limit: Количество ролей на странице
+        cursor: Курсор следующей страницы
         
     Returns:
-        JSON ответ со списком ролей в формате [{name: str, comment: str}]
+        JSON ответ со списком ролей в формате [{name: str, comment: str}] и курсором следующей страницы
     """
-    dbRoles = await RoleTool.get_all()
+    try:
+        dbRoles, next_cursor = await RoleTool.get_page(limit=limit, cursor=cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
     content = [
         dict(name=role.name, comment=role.comment)
         for role in dbRoles
@@ -119,7 +180,8 @@ async def web_api_get_roles(
         status_code=status.HTTP_200_OK,
         content=dict(
             success=True,
-            content=content
+            content=content,
+            next_cursor=next_cursor
         )
     )
 
@@ -132,31 +194,40 @@ async def web_api_get_roles(
 )
 async def web_api_get_users(
     request: Request,
+    limit: int = Query(ADMIN_PAGE_SIZE_DEFAULT, ge=1, le=ADMIN_PAGE_SIZE_MAX, description="Количество ролей на странице (каждая роль - со всеми своими правами, связи роль-право не ограничиваются)"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы из предыдущего ответа"),
 ):
     """
-    Получает структурированный список всех ролей с их правами.
+    Получает страницу ролей с их правами.
     
-    Формирует словарь, где ключ - роль, значение - список связанных правил.
+    Пагинация выполняется по ролям (по имени), права загружаются одним запросом
+    для ролей страницы, поэтому права одной роли не разделяются между страницами.
+    Роли без прав возвращаются с пустым списком.
     Доступен только администраторам.
     
     Args:
         request: HTTP запрос
+        limit: Количество ролей на странице; ограничивает роли, а не связи роль-право,
+            поэтому страница может содержать больше limit связей
+        cursor: Курсор следующей страницы (по имени последней роли)
         
     Returns:
-        JSON ответ со списком ролей и их правами в формате [{role: str, rules: [str]}]
+        JSON ответ со списком ролей и их правами в формате [{role: str, rules: [str]}] и курсором следующей страницы
     """
-    dbRoleRules = await RoleRuleTool.get_all()
+    try:
+        dbRoles, next_cursor = await RoleTool.get_page(limit=limit, cursor=cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
     
-    roles_rules_dict = {}
-    for role_rule in dbRoleRules:
-        role_name = role_rule.role_name
-        rule_name = role_rule.rule_name
-        
-        if role_name not in roles_rules_dict:
-            roles_rules_dict[role_name] = []
-        
-        if rule_name not in roles_rules_dict[role_name]:
-            roles_rules_dict[role_name].append(rule_name)
+    roles_rules_dict = {role.name: [] for role in dbRoles}
+    if roles_rules_dict:
+        dbRoleRules = await RoleRuleTool.get_all_with_filters(
+            filters=[RoleRuleModel.role_name.in_(list(roles_rules_dict))],
+            sort_by="id"
+        )
+        for role_rule in dbRoleRules:
+            if role_rule.rule_name not in roles_rules_dict[role_rule.role_name]:
+                roles_rules_dict[role_rule.role_name].append(role_rule.rule_name)
     
     content = [
         dict(role=role, rules=rules) 
@@ -167,11 +238,90 @@ async def web_api_get_users(
         status_code=status.HTTP_200_OK,
         content=dict(
             success=True,
-            content=content
+            content=content,
+            next_cursor=next_cursor
         )
     )
 
 
+async def ndjson_lines(records: AsyncIterator[Any], serialize: Callable[[Any], Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """
+    Преобразует записи в строки NDJSON (одна JSON строка на запись).
+    
+    Записи читаются вне unit of work запроса собственной сессией (standalone),
+    поэтому курсор выгрузки не держит подключение и транзакцию запроса, а
+    подключение возвращается в пул сразу после выгрузки.
+    
+    Args:
+        records: Асинхронный итератор записей
+        serialize: Функция преобразования записи в словарь
+        
+    Returns:
+        AsyncIterator[bytes]: Строки NDJSON
+    """
+    async with standalone():
+        async for record in records:
+            yield json.dumps(serialize(record), ensure_ascii=False, default=str).encode() + b"\n"
+
+
+@router.get(
+    '/export/users',
+    description="Выгрузить пользователей в формате NDJSON"
+)
+async def web_api_export_users(
+    request: Request,
+):
+    """
+    Выгружает всех пользователей потоком NDJSON.
+    
+    Пользователи читаются из базы данных через серверный курсор и отправляются
+    клиенту по мере чтения, поэтому расход памяти не зависит от размера таблицы.
+    Хеши паролей не выгружаются.
+    
+    Args:
+        request: HTTP запрос
+        
+    Returns:
+        Потоковый ответ application/x-ndjson со строками {id, email, role, is_active, creating_date}
+    """
+    def serialize(user: UserModel) -> Dict[str, Any]:
+        return dict(id=user.id, email=user.email, role=user.role, is_active=user.is_active, creating_date=user.creating_date.isoformat())
+
+    return StreamingResponse(
+        ndjson_lines(UserTool.iter_all(batch_size=EXPORT_BATCH_SIZE), serialize),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get(
+    '/export/sessions',
+    description="Выгрузить сессии в формате NDJSON"
+)
+async def web_api_export_sessions(
+    request: Request,
+):
+    """
+    Выгружает действующие сессии пользователей потоком NDJSON.
+    
+    Сессии читаются из хранилища SESSION_STORE пачками (таблица sessions -
+    через серверный курсор, key-value хранилище - через SCAN) и отправляются
+    клиенту по мере чтения. Хеши access token не выгружаются.
+    
+    Args:
+        request: HTTP запрос
+        
+    Returns:
+        Потоковый ответ application/x-ndjson со строками {id, user_id, jti, creating_date}
+    """
+    def serialize(session: SessionModel) -> Dict[str, Any]:
+        return dict(id=session.id, user_id=session.user_id, jti=session.jti, creating_date=session.creating_date.isoformat())
+
+    return StreamingResponse(
+        ndjson_lines(SessionTool.iter_sessions(batch_size=EXPORT_BATCH_SIZE), serialize),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.post(
     '/create-role',
     description="Создать роль",
@@ -203,6 +353,7 @@ async def web_api_create_role(
         name=role_data.name,
         comment=role_data.comment
     ))
+    RoleRuleTool.invalidate_rules_index()
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -242,6 +393,7 @@ async def web_api_create_rule(
         name=rule_data.name,
         comment=rule_data.comment
     ))
+    RoleRuleTool.invalidate_rules_index()
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -288,6 +440,7 @@ async def web_api_create_role_rule(
         role_name=role_rule_data.role_name,
         rule_name=role_rule_data.rule_name
     ))
+    RoleRuleTool.invalidate_rules_index()
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -336,6 +489,7 @@ async def web_api_delete_role(
         )
 
     await RoleTool(role_data.name).delete()
+    RoleRuleTool.invalidate_rules_index()
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -377,6 +531,7 @@ async def web_api_delete_rule(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Rule not found")
 
     await RuleTool(rule_data.name).delete()
+    RoleRuleTool.invalidate_rules_index()
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -417,6 +572,7 @@ async def web_api_delete_role_rule(
 
 
     await RoleRuleTool(dbRoleRule.id).delete()
+    RoleRuleTool.invalidate_rules_index()
 
     return JSONResponse(
         status_code=status.HTTP_200_OK,
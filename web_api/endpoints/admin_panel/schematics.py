@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
 
 class AdminPanelResponse(BaseModel):
@@ -17,6 +17,7 @@ class RolesAndRulesResponse(BaseModel):
     """Модель ответа со списком ролей и правил"""
     success: bool = Field(description="Успешность операции")
     content: List[RoleRuleItem] = Field(description="Список ролей с правилами")
+    next_cursor: Optional[str] = Field(default=None, description="Курсор следующей страницы (отсутствует на последней странице)")
 
 
 class CreateRoleRequest(BaseModel):
@@ -93,6 +94,7 @@ class RulesResponse(BaseModel):
     """Модель ответа со списком правил"""
     success: bool = Field(description="Успешность операции")
     content: List[RuleItem] = Field(description="Список правил")
+    next_cursor: Optional[str] = Field(default=None, description="Курсор следующей страницы (отсутствует на последней странице)")
 
 
 class RoleItem(BaseModel):
@@ -104,4 +106,31 @@ class RoleItem(BaseModel):
 class RolesResponse(BaseModel):
     """Модель ответа со списком ролей"""
     success: bool = Field(description="Успешность операции")
-    content: List[RoleItem] = Field(description="Список ролей")
\ No newline at end of file
+    content: List[RoleItem] = Field(description="Список ролей")
+    next_cursor: Optional[str] = Field(default=None, description="Курсор следующей страницы (отсутствует на последней странице)")
+
+
+class DatabasePoolItem(BaseModel):
+    """Модель состояния пула подключений к базе данных"""
+    size: int = Field(description="Количество постоянных подключений пула")
+    checked_out: int = Field(description="Количество занятых подключений")
+    checked_in: int = Field(description="Количество свободных подключений")
+    overflow: int = Field(description="Количество дополнительных подключений сверх размера пула")
+    timeout: float = Field(description="Максимальное время ожидания подключения (секунды)")
+    checkouts: int = Field(description="Количество выданных подключений")
+    checkout_wait_total: float = Field(description="Суммарное время получения подключений (секунды)")
+    checkout_wait_avg: float = Field(description="Среднее время получения подключения (секунды)")
+    checkout_wait_max: float = Field(description="Максимальное время получения подключения (секунды)")
+    timeouts: int = Field(description="Количество превышений времени ожидания подключения")
+
+
+class DatabasePoolsItem(BaseModel):
+    """Модель состояния пулов подключений к основной базе данных и реплике"""
+    primary: DatabasePoolItem = Field(description="Пул подключений к основной базе данных")
+    replica: Optional[DatabasePoolItem] = Field(default=None, description="Пул подключений к реплике для чтения (если настроена)")
+
+
+class DatabasePoolResponse(BaseModel):
+    """Модель ответа с метриками пулов подключений воркера"""
+    success: bool = Field(description="Успешность операции")
+    content: DatabasePoolsItem = Field(description="Состояние и метрики пулов подключений")
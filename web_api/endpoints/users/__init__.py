@@ -8,7 +8,9 @@ from typing import Annotated, Literal
 from web_api.dependencies.cookies_auth import set_auth_cookie, get_jwt_payload
 from database.tools.users import UserTool
 from database.models.users import UserModel
-from web_api.endpoints.users.schematics import SignUpRequest, SignUpResponse, SignInRequest, SignInResponse, SignOutResponse, ChangePasswordRequest, ChangePasswordResponse, DeleteAccountResponse
+from web_api.endpoints.users.schematics import SignUpRequest, SignUpResponse, SignInRequest, SignInResponse, SignOutResponse, ChangePasswordRequest, ChangePasswordResponse, DeleteAccountResponse, RefreshResponse
+from sqlalchemy.exc import IntegrityError
+import datetime
 import string
 from fastapi.responses import JSONResponse
 from database.tools.sessions import SessionTool
@@ -47,16 +49,22 @@ async def web_api_sign_up(
     if await UserTool.get_by_email(user_data.email):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email already exists")
     
-    async with UserTool.lock:
-        user_id: int = await UserTool.generate_unique_field_id(string.digits, length=12, return_type=int)
-        dbUser: UserModel = await UserTool.create(data=dict(
-                id=user_id,
+    password_hash = await UserTool.hash_password_async(user_data.password)
+    try:
+        dbUser: UserModel = await UserTool.create_with_generated_id(
+            dict(
                 email=user_data.email,
-                password=UserTool.hash_password(user_data.password),
+                password=password_hash,
                 role="user",
                 is_active=True
-            )
+            ),
+            string.digits,
+            length=12,
+            return_type=int
         )
+    except IntegrityError:
+        # Email занят параллельной регистрацией после проверки выше
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email already exists")
     
     response = JSONResponse(
         status_code=status.HTTP_200_OK,
@@ -64,11 +72,8 @@ async def web_api_sign_up(
             success=True
         )
     )
-    access_token = set_auth_cookie(response=response, user_id=dbUser.id)
-    await SessionTool(dbUser.id).create(data=dict(
-        user_id=dbUser.id,
-        access_token=access_token
-    ))
+    access_token = set_auth_cookie(response=response, user_id=dbUser.id, role=dbUser.role)
+    await SessionTool.create_by_user_id_and_access_token(user_id=dbUser.id, access_token=access_token)
 
     return response
 
@@ -122,15 +127,66 @@ async def web_api_sign_in(
             success=True
         )
     )
-    access_token = set_auth_cookie(response=response, user_id=dbUser.id)
-    await SessionTool(dbUser.id).create(data=dict(
-        user_id=dbUser.id,
-        access_token=access_token
-    ))
+    access_token = set_auth_cookie(response=response, user_id=dbUser.id, role=dbUser.role)
+    await SessionTool.create_by_user_id_and_access_token(user_id=dbUser.id, access_token=access_token)
     
     return response
 
 
+@router.post(
+    '/refresh',
+    description="Обновить токен доступа",
+    response_model=RefreshResponse,
+    response_model_exclude_none=True
+)
+async def web_api_refresh(
+    request: Request
+):
+    """
+    Выдает новый токен доступа взамен текущего.
+    
+    Принимает токен с действительной подписью, в том числе истекший, если его
+    сессия существует и не старше срока жизни сессии. Сессия переводится
+    на новый токен, старый токен отзывается. В режиме AUTH_STATELESS_MODE
+    клиент вызывает этот эндпоинт после ответа 401 "Access token expired".
+    
+    Args:
+        request: HTTP запрос с токеном в cookies
+        
+    Returns:
+        JSON ответ с результатом операции и новым auth cookie
+        
+    Raises:
+        HTTPException: 401 если токен отсутствует, невалиден или сессия завершена
+    """
+    access_token = request.cookies.get("access_token")
+    if not access_token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Access token is required")
+
+    payload = get_jwt_payload(access_token, verify_exp=False)
+    if payload is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid access token")
+
+    dbSession = await SessionTool.get_by_user_id_and_access_token(user_id=payload["sub"], access_token=access_token)
+    if not dbSession or dbSession.expires_at < datetime.datetime.now():
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Expired session")
+
+    dbUser: UserModel = await UserTool(payload["sub"]).get()
+    if not dbUser or not dbUser.is_active:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User is not active")
+
+    response = JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=dict(
+            success=True
+        )
+    )
+    new_access_token = set_auth_cookie(response=response, user_id=dbUser.id, role=dbUser.role)
+    await SessionTool.rotate_access_token(dbSession=dbSession, old_access_token=access_token, new_access_token=new_access_token)
+
+    return response
+
+
 @router.post(
     '/sign-out',
     description="Выйти из системы",
@@ -206,7 +262,7 @@ async def web_api_change_password(
     if not await UserTool.verify_and_migrate_password(dbUser, user_data.old_password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid email, username or password")
     
-    await UserTool(dbUser.id).update(data={"password": UserTool.hash_password(user_data.new_password)})
+    await UserTool(dbUser.id).update(data={"password": await UserTool.hash_password_async(user_data.new_password)})
     await SessionTool.delete_all_instead_of_current_user_id_and_access_token(user_id=dbUser.id, access_token=access_token)
 
     return JSONResponse(
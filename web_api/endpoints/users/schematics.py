@@ -24,6 +24,11 @@ class SignInResponse(BaseModel):
     success: bool = Field(description="Успешность операции")
 
 
+class RefreshResponse(BaseModel):
+    """Модель ответа для обновления токена доступа"""
+    success: bool = Field(description="Успешность операции")
+
+
 class SignOutResponse(BaseModel):
     """Модель ответа для выхода из системы"""
     success: bool = Field(description="Успешность операции")